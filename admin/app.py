@@ -1,16 +1,34 @@
-from flask import Flask, jsonify
+import time
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
-import pymysql
-from config import MYSQL_CONFIG
+from config import SERVER_CONFIG
+from utils.instrumentation import metrics, request_duration
+from routes.flare_system_routes import flare_system_bp
 
 app = Flask(__name__)
 CORS(app)  # 启用CORS支持
+app.register_blueprint(flare_system_bp)
 
 def get_db_connection():
-    return pymysql.connect(**MYSQL_CONFIG)
+    """从连接池借出连接，close() 时归还（pymysql 延迟到首次使用时导入）"""
+    from utils.db_pool import get_pool
+    return get_pool().connection()
 
-# 注册蓝图 - 移到文件末尾避免循环导入
-# app.register_blueprint(flare_system_bp)
+@app.before_request
+def start_request_timer():
+    g.request_start_ns = time.perf_counter_ns()
+
+@app.after_request
+def record_request_duration(response):
+    """按路由模板、方法、状态码记录接口耗时"""
+    start = g.pop('request_start_ns', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        request_duration.observe((time.perf_counter_ns() - start) / 1e9,
+                                 route=route, method=request.method, status=response.status_code)
+        # 多进程部署时写入指标目录，由处理 /metrics 的进程汇总
+        metrics.flush()
+    return response
 
 @app.route('/api/test', methods=['GET'])
 def test():
@@ -18,6 +36,17 @@ def test():
         "message": "正常运行！"
     })
 
+@app.route('/api/db_pool', methods=['GET'])
+def db_pool_stats():
+    """数据库连接池指标"""
+    from utils.db_pool import get_pool
+    return jsonify(get_pool().stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus 指标（文本格式）：各接口与各计算阶段耗时直方图（gunicorn 部署时汇总各工作进程）"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.errorhandler(404)
 def not_found(e):
     return jsonify({
@@ -34,9 +63,6 @@ def server_error(e):
         "message": "服务器内部错误"
     }), 500
 
-# 避免循环导入
-from routes.flare_system_routes import flare_system_bp
-app.register_blueprint(flare_system_bp)
-
 if __name__ == '__main__':
-    app.run(host='127.0.0.1', port=5000, debug=True) 
\ No newline at end of file
+    # 开发服务器；生产部署见 wsgi.py
+    app.run(host='127.0.0.1', port=5000, debug=SERVER_CONFIG['debug']) 
\ No newline at end of file
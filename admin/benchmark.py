@@ -0,0 +1,478 @@
+"""火炬系统计算性能基准与正确性校验
+
+用法：
+    python benchmark.py --sizes 10 100 1000 10000 100000 --output bench.json
+    python benchmark.py --sizes 1000 10000 --repeat 5 --compare bench.json --output bench_new.json
+
+对每个规模生成合成管网（utils/network_generator.py），分别计时：
+    - 参照实现（冻结的原始递归计算模块 utils/reference_calculator.py，管道对象列表）各阶段；
+    - 列存储实现（FlareSystemService.evaluate_network）各阶段，及按子树分区多线程计算（--partition-workers，
+      不受 PARTITION_CONFIG['min_pipes'] 限制）；
+    - 批量矩阵引擎单工况、压比插值表；
+    - 一般管网求解器（utils/network_solver.py，树状管网上应与参照实现逐位相同）；
+    - 端到端 FlareSystemService.check_flare_system（清空结果缓存后计算及命中缓存）。
+正确性校验以参照实现为基准，逐管道比较各优化实现的计算结果与泄放点判定（压力允许参照实现二分法的误差上界）。
+--crossovers / --flares 生成含环路、多个火炬的管网，此时只计时管网求解器与端到端校验（无参照实现）。
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+import services.flare_system_service as flare_system_module
+from services.flare_system_service import FlareSystemService
+from utils.network_generator import generate_flare_network
+from utils.network_topology import compile_network_topology
+from utils.network_solver import compile_pipe_network, solve_pipe_network
+from utils.data_mapper import (map_request_to_pipe_params, map_request_to_discharge_params,
+                               map_request_to_pipe_store, map_request_to_discharge_store)
+from utils.pressure_calculator import calculate_pipe_inlet_pressures, check_flare_system_qualification
+import utils.reference_calculator as reference_calculator
+from utils.pressure_ratio_solver import get_default_ratio_table
+from utils.vectorized_solver import round_like_python
+from utils.network_evaluator import (ScenarioResults, compile_network, build_scenario_loads, evaluate_scenarios,
+                                     scenario_qualification)
+from models.network_store import PipeStore
+from utils.design_session import DesignSession, PIPE_RESULT_FIELDS
+from utils.instrumentation import StageTimer
+
+# 批量矩阵引擎与单工况校验的累加顺序与取整一致，只有压比求解不同：单工况同层管道较少时用标量牛顿，
+# 与向量化牛顿（对数函数实现不同）个别元素相差 1 ulp，压力相对偏差在 SOLVER_RTOL 内，入口压力取整后可能相差一个单位
+SOLVER_RTOL = 1e-12
+ROUNDED_PRESSURE_RESOLUTION = {"inlet_pressure": 0.01}
+PRESSURE_FIELDS = ("outlet_pressure", "inlet_pressure")
+# 参照实现的二分法在压比方程残差 |g(x)| < BISECTION_RESIDUAL 时停止，|g'(x)| = 2(1 - (xM)²)/(x³M²)，
+# 压比 x 的相对误差不超过 BISECTION_RESIDUAL·(xM)²/(2(1 - (xM)²))，压力的相对误差沿路径逐段累加
+BISECTION_RESIDUAL = 1e-6
+
+def collect_results(output):
+    """各实现的输出 -> (管道字段 -> 数组（未求得为 NaN）, 泄放点 -> 背压)"""
+    if isinstance(output[0], ScenarioResults):
+        results, network, backpressure = output
+        columns = {field: getattr(results, field)[0] for field in PIPE_RESULT_FIELDS}
+        # 与单工况校验一致，入口压力保留2位小数
+        columns["inlet_pressure"] = round_like_python(columns["inlet_pressure"], 2)
+        return columns, dict(zip(network.discharge_nodes, backpressure[0].tolist()))
+
+    pipes, satisfied, not_satisfied = output
+    if isinstance(pipes, PipeStore):
+        columns = {field: getattr(pipes, field).copy() for field in PIPE_RESULT_FIELDS}
+    else:
+        columns = {field: np.array([np.nan if getattr(pipe, field) is None else getattr(pipe, field)
+                                    for pipe in pipes], dtype=float)
+                   for field in PIPE_RESULT_FIELDS}
+    backpressure = {node: value for node, value, _ in satisfied}
+    backpressure.update({item[0]: item[1] if len(item) == 3 else np.nan for item in not_satisfied})
+    return columns, backpressure
+
+# ---------------------------------------------------------------- 各计算实现（返回未转换的结果，转换不计时）
+
+def run_reference(data, timer=None):
+    """参照实现：冻结的原始递归计算模块（utils/reference_calculator.py），管道对象列表逐个执行各计算阶段"""
+    timer = timer or StageTimer()
+    system_config = data['system_config']
+    connection_graph = system_config['connection_graph']
+    flare_node = system_config['flare_node']
+    with timer.stage("mapping"):
+        pipes = reference_calculator.create_pipe_objects(connection_graph, map_request_to_pipe_params(data['pipes'], flare_node))
+        discharge_objects = reference_calculator.create_discharge_objects(
+            system_config['discharge_nodes'], map_request_to_discharge_params(data['discharge_points']))
+    # 递归深度随管网深度增加
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(recursion_limit, 2 * len(pipes) + 1000))
+    try:
+        with timer.stage("flow"):
+            reference_calculator.calculate_pipe_flow_rates(pipes, discharge_objects, connection_graph, flare_node)
+        with timer.stage("temperature"):
+            reference_calculator.calculate_pipe_avg_temperatures(pipes, discharge_objects, connection_graph, flare_node)
+        with timer.stage("molecular_weight"):
+            reference_calculator.calculate_pipe_avg_molecular_weight(pipes, discharge_objects, connection_graph, flare_node)
+        with timer.stage("mach"):
+            reference_calculator.calculate_pipe_mach_numbers(pipes)
+        with timer.stage("friction"):
+            reference_calculator.calculate_pipe_friction_factors(pipes, discharge_objects, connection_graph, flare_node)
+        with timer.stage("pressure"):
+            reference_calculator.calculate_pipe_inlet_pressures(pipes, connection_graph, flare_node)
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+    with timer.stage("qualification"):
+        _, satisfied, not_satisfied = reference_calculator.check_flare_system_qualification(pipes, discharge_objects)
+    return pipes, satisfied, not_satisfied
+
+def run_column_store(data, timer=None, ratio_table=None, workers=1, min_pipes=None):
+    """列存储实现（单工况校验接口所用），传入 ratio_table 时压力改用插值表重算
+
+    workers > 1 且管道数不少于 min_pipes（默认取 PARTITION_CONFIG）时，累计量与压力阶段按子树分区多线程计算。
+    """
+    timer = timer or StageTimer()
+    system_config = data['system_config']
+    connection_graph = system_config['connection_graph']
+    flare_node = system_config['flare_node']
+    with timer.stage("topology"):
+        topology = compile_network_topology(connection_graph, flare_node)
+    with timer.stage("mapping"):
+        pipe_store = map_request_to_pipe_store(data['pipes'], topology)
+        discharge_store = map_request_to_discharge_store(data['discharge_points'], system_config['discharge_nodes'])
+    pipe_store, _, satisfied, not_satisfied = FlareSystemService.evaluate_network(
+        pipe_store, discharge_store, connection_graph, flare_node, topology, timer=timer, workers=workers,
+        min_pipes=min_pipes)
+    if ratio_table is not None:
+        pipe_store.inlet_pressure[:] = np.nan
+        with timer.stage("pressure_table"):
+            calculate_pipe_inlet_pressures(pipe_store, connection_graph, flare_node, topology=topology,
+                                           ratio_table=ratio_table)
+        with timer.stage("qualification_table"):
+            _, satisfied, not_satisfied = check_flare_system_qualification(pipe_store, discharge_store, topology=topology)
+    return pipe_store, satisfied, not_satisfied
+
+def run_pipe_network(data, timer=None, stats=None):
+    """一般管网求解器（含环路或多个火炬节点时单工况校验接口所用）"""
+    timer = timer or StageTimer()
+    system_config = data['system_config']
+    with timer.stage("topology"):
+        network = compile_pipe_network(system_config['connection_graph'], system_config['flare_node'],
+                                       system_config['discharge_nodes'])
+    with timer.stage("mapping"):
+        pipe_store = map_request_to_pipe_store(data['pipes'], network)
+        discharge_store = map_request_to_discharge_store(data['discharge_points'], system_config['discharge_nodes'])
+    pipe_store, _, satisfied, not_satisfied = solve_pipe_network(network, pipe_store, discharge_store, timer=timer,
+                                                                 stats=stats)
+    return pipe_store, satisfied, not_satisfied
+
+def run_batch_matrix(data, timer=None):
+    """批量矩阵引擎（批量工况校验接口所用），单个工况"""
+    timer = timer or StageTimer()
+    system_config = data['system_config']
+    with timer.stage("compile"):
+        network = compile_network(system_config['connection_graph'], system_config['flare_node'],
+                                  system_config['discharge_nodes'],
+                                  map_request_to_pipe_params(data['pipes'], system_config['flare_node']))
+        loads = build_scenario_loads(network, map_request_to_discharge_params(data['discharge_points']), [{}])
+    with timer.stage("evaluate"):
+        results = evaluate_scenarios(network, loads)
+        _, backpressure, _ = scenario_qualification(network, loads, results)
+    return results, network, backpressure
+
+def run_design_session(data, timer=None):
+    """交互式设计会话的初次全量计算"""
+    timer = timer or StageTimer()
+    system_config = data['system_config']
+    with timer.stage("session"):
+        session = DesignSession(system_config['connection_graph'], system_config['flare_node'],
+                                system_config['discharge_nodes'],
+                                map_request_to_pipe_params(data['pipes'], system_config['flare_node']),
+                                map_request_to_discharge_params(data['discharge_points']))
+    with timer.stage("qualification"):
+        _, satisfied, not_satisfied = check_flare_system_qualification(session.pipes, session.discharge_objects,
+                                                                       topology=session.topology)
+    return session.pipes, satisfied, not_satisfied
+
+# ---------------------------------------------------------------- 正确性校验
+
+def bisection_pressure_rtol(topology, reference):
+    """参照实现（二分法求压比）压力的相对误差上界，返回 (压力字段 -> 各管道数组, 泄放点 -> 背压的上界)"""
+    columns, backpressure = reference
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xm = columns["outlet_pressure"] / columns["inlet_pressure"] * columns["mach_number"]
+        pipe_rtol = np.nan_to_num(BISECTION_RESIDUAL * xm ** 2 / (2 * (1 - xm ** 2)), nan=0.0)
+    outlet_rtol = np.zeros(topology.pipe_count)
+    inlet_rtol = np.zeros(topology.pipe_count)
+    for level in topology.levels:
+        for pipe_id in level:
+            parent = topology.pipe_parent[pipe_id]
+            outlet_rtol[pipe_id] = inlet_rtol[parent] if parent != -1 else 0.0
+            inlet_rtol[pipe_id] = outlet_rtol[pipe_id] + pipe_rtol[pipe_id]
+    node_rtol = {node: float(inlet_rtol[topology.node_outlet_pipe[topology.node_index[node]]])
+                 for node in backpressure}
+    return {"outlet_pressure": outlet_rtol, "inlet_pressure": inlet_rtol}, node_rtol
+
+def compare_results(reference, candidate, rtol=0.0, resolution=None, pressure_rtol=None, node_rtol=None):
+    """逐管道、逐泄放点比较计算结果（均为 collect_results 的输出），返回差异报告
+
+    允许偏差 = resolution[字段] + rtol·|参照值|，压力字段另用 pressure_rtol（标量，或 字段 -> 各管道数组）。
+    泄放点背压（即判定所用的入口压力）按 0.01 Pa + node_rtol[泄放点]·|参照值| 比较，
+    未给出 node_rtol 时取标量 pressure_rtol 或 rtol。
+    """
+    ref_columns, ref_backpressure = reference
+    columns, backpressure = candidate
+    resolution = resolution or {}
+    fields = {}
+    passed = True
+    for field in PIPE_RESULT_FIELDS:
+        expected = ref_columns[field]
+        actual = columns[field]
+        field_rtol = rtol
+        if pressure_rtol is not None and field in PRESSURE_FIELDS:
+            field_rtol = pressure_rtol[field] if isinstance(pressure_rtol, dict) else pressure_rtol
+        missing = np.isnan(expected) != np.isnan(actual)
+        both = ~np.isnan(expected) & ~np.isnan(actual)
+        diff = np.abs(expected[both] - actual[both])
+        bad = diff > resolution.get(field, 0.0) + np.broadcast_to(field_rtol, expected.shape)[both] * \
+            np.abs(expected[both])
+        mismatches = int(missing.sum() + bad.sum())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative = diff / np.abs(expected[both])
+        fields[field] = {
+            "mismatches": mismatches,
+            "max_abs_diff": float(diff.max()) if diff.size else 0.0,
+            "max_rel_diff": float(np.nanmax(relative)) if diff.size and not np.all(np.isnan(relative)) else 0.0
+        }
+        passed &= mismatches == 0
+
+    # 泄放点背压
+    mismatched_nodes = []
+    if node_rtol is None:
+        default_rtol = pressure_rtol if pressure_rtol is not None and not isinstance(pressure_rtol, dict) else rtol
+        node_rtol = dict.fromkeys(ref_backpressure, default_rtol)
+    for node, expected in ref_backpressure.items():
+        actual = backpressure.get(node, np.nan)
+        tolerance = 0.01 + node_rtol[node] * abs(expected)
+        if (np.isnan(expected) and np.isnan(actual)) or (not np.isnan(expected) and not np.isnan(actual) and
+                                                           abs(expected - actual) <= tolerance):
+            continue
+        mismatched_nodes.append(node)
+    passed &= not mismatched_nodes
+
+    return {
+        "passed": bool(passed),
+        "pipes": len(ref_columns["flow_rate"]),
+        "fields": fields,
+        "backpressure_mismatches": len(mismatched_nodes),
+        "first_mismatched_nodes": mismatched_nodes[:10]
+    }
+
+def run_oracle(data, reference=None, partition_workers=4):
+    """以参照实现（冻结的原始递归计算模块）为基准校验各优化实现，返回 实现 -> 差异报告
+
+    流量、温度、分子量、马赫数、雷诺数、摩擦系数须完全一致；压力允许参照实现二分法的误差上界，
+    入口压力另允许取整的一个单位。分区计算强制切分（不受 PARTITION_CONFIG['min_pipes'] 限制）。
+    """
+    reference = collect_results(reference or run_reference(data))
+    ratio_table = get_default_ratio_table()
+    topology = compile_network_topology(data['system_config']['connection_graph'], data['system_config']['flare_node'])
+    pressure_rtol, node_rtol = bisection_pressure_rtol(topology, reference)
+
+    def with_rtol(extra_rtol):
+        """在二分法误差上界之上叠加的相对偏差"""
+        return ({field: value * 1.01 + extra_rtol for field, value in pressure_rtol.items()},
+                {node: value * 1.01 + extra_rtol for node, value in node_rtol.items()})
+
+    def compare(candidate, extra_rtol=0.0):
+        field_rtol, backpressure_rtol = with_rtol(extra_rtol)
+        return compare_results(reference, collect_results(candidate), resolution=ROUNDED_PRESSURE_RESOLUTION,
+                               pressure_rtol=field_rtol, node_rtol=backpressure_rtol)
+
+    # 插值表的相对误差沿路径逐段累积
+    table_rtol = (len(topology.levels) + 1) * ratio_table.max_error * 1.01
+    return {
+        "column_store": compare(run_column_store(data)),
+        "partitioned": compare(run_column_store(data, workers=partition_workers, min_pipes=1)),
+        "design_session": compare(run_design_session(data)),
+        "pipe_network": compare(run_pipe_network(data)),
+        "batch_matrix": compare(run_batch_matrix(data), SOLVER_RTOL),
+        "ratio_table": compare(run_column_store(data, ratio_table=ratio_table), table_rtol)
+    }
+
+# ---------------------------------------------------------------- 计时
+
+def _time_stages(func, data, repeat):
+    """重复执行 func(data, timer)，返回 阶段 -> 耗时统计（秒）"""
+    samples = {}
+    for _ in range(repeat):
+        timer = StageTimer()
+        start = time.perf_counter_ns()
+        func(data, timer)
+        timer.stages["total"] = time.perf_counter_ns() - start
+        for name, elapsed in timer.stages.items():
+            samples.setdefault(name, []).append(elapsed / 1e9)
+    return {name: _summarize(values) for name, values in samples.items()}
+
+def _summarize(values):
+    return {"min": round(min(values), 6), "median": round(statistics.median(values), 6),
+            "mean": round(statistics.fmean(values), 6)}
+
+def _time_check_flare_system(data, repeat):
+    """端到端单工况校验：每次清空结果缓存后计算，另计一次命中缓存的耗时"""
+    cache = flare_system_module._result_cache
+    cold, cached = [], []
+    for _ in range(repeat):
+        if cache is not None:
+            cache.clear()
+        start = time.perf_counter()
+        result = FlareSystemService.check_flare_system(data)
+        cold.append(time.perf_counter() - start)
+        if result.get('status') != 200:
+            raise RuntimeError(f"check_flare_system 返回 {result.get('status')}: {result.get('message')}")
+        if cache is not None:
+            start = time.perf_counter()
+            FlareSystemService.check_flare_system(data)
+            cached.append(time.perf_counter() - start)
+    timings = {"uncached": _summarize(cold)}
+    if cached:
+        timings["cached"] = _summarize(cached)
+    return timings, result['result']['qualified']
+
+def benchmark_size(discharge_count, args):
+    depth = args.depth or _auto_depth(discharge_count, args.branching, args.tie_ins_per_node)
+    start = time.perf_counter()
+    data = generate_flare_network(discharge_count, depth=depth, branching=args.branching,
+                                  header_segments=args.header_segments, tie_ins_per_node=args.tie_ins_per_node,
+                                  crossovers=args.crossovers, flares=args.flares, seed=args.seed,
+                                  columnar=args.columnar)
+    generation_cost = time.perf_counter() - start
+    generator = {"depth": depth, "branching": args.branching, "header_segments": args.header_segments,
+                 "tie_ins_per_node": args.tie_ins_per_node, "crossovers": args.crossovers, "flares": args.flares,
+                 "seed": args.seed, "columnar": args.columnar}
+
+    if args.crossovers or args.flares > 1:
+        solver_stats = {}
+        network = compile_pipe_network(data['system_config']['connection_graph'],
+                                       data['system_config']['flare_node'], data['system_config']['discharge_nodes'])
+        run_pipe_network(data, stats=solver_stats)
+        end_to_end, qualified = _time_check_flare_system(data, args.repeat)
+        return {
+            "discharge_count": discharge_count,
+            "pipe_count": network.pipe_count,
+            "loop_count": network.loop_count,
+            "generator": generator,
+            "generation_cost": round(generation_cost, 3),
+            "qualified": qualified,
+            "solver": solver_stats["network"],
+            "timings": {
+                "pipe_network": _time_stages(run_pipe_network, data, args.repeat),
+                "check_flare_system": end_to_end
+            }
+        }
+
+    topology = compile_network_topology(data['system_config']['connection_graph'], data['system_config']['flare_node'])
+    reference = run_reference(data)
+    get_default_ratio_table()  # 插值表在进程内首次使用时构建，不计入计时
+    end_to_end, qualified = _time_check_flare_system(data, args.repeat)
+    timings = {
+        "reference": _time_stages(run_reference, data, args.repeat),
+        "column_store": _time_stages(run_column_store, data, args.repeat),
+        "partitioned": _time_stages(
+            lambda d, timer: run_column_store(d, timer, workers=args.partition_workers, min_pipes=1),
+            data, args.repeat),
+        "batch_matrix": _time_stages(run_batch_matrix, data, args.repeat),
+        "ratio_table": _time_stages(
+            lambda d, timer: run_column_store(d, timer, ratio_table=get_default_ratio_table()), data, args.repeat),
+        "pipe_network": _time_stages(run_pipe_network, data, args.repeat),
+        "check_flare_system": end_to_end
+    }
+    entry = {
+        "discharge_count": discharge_count,
+        "pipe_count": topology.pipe_count,
+        "max_depth": len(topology.levels),
+        "generator": generator,
+        "generation_cost": round(generation_cost, 3),
+        "qualified": qualified,
+        "timings": timings
+    }
+    if not args.no_oracle:
+        entry["oracle"] = run_oracle(data, reference, args.partition_workers)
+    return entry
+
+def _auto_depth(discharge_count, branching, tie_ins_per_node, leaf_points=16):
+    """分支级数：末级分支管平均约 leaf_points 个泄放点"""
+    if branching < 2:
+        return 1
+    leaves = max(1.0, discharge_count / max(leaf_points, tie_ins_per_node))
+    return max(1, math.ceil(math.log(leaves, branching)))
+
+def compare_reports(previous, current):
+    """同规模、同阶段的中位耗时比值（当前 / 之前）"""
+    previous_by_size = {entry["discharge_count"]: entry for entry in previous.get("results", [])}
+    comparison = []
+    for entry in current["results"]:
+        old = previous_by_size.get(entry["discharge_count"])
+        if old is None:
+            continue
+        ratios = {}
+        for engine, stages in entry["timings"].items():
+            for stage, stats in stages.items():
+                old_stats = old["timings"].get(engine, {}).get(stage)
+                if old_stats and old_stats["median"] > 0:
+                    ratios[f"{engine}.{stage}"] = round(stats["median"] / old_stats["median"], 3)
+        comparison.append({"discharge_count": entry["discharge_count"], "median_ratio": ratios})
+    return {"baseline_commit": previous.get("environment", {}).get("commit"), "sizes": comparison}
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="火炬系统计算性能基准与正确性校验")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="泄放点数（可多个），建议 10 到 100000")
+    parser.add_argument("--repeat", type=int, default=3, help="每项计时重复次数")
+    parser.add_argument("--depth", type=int, default=None, help="分支级数，默认按规模使末级分支管约16个泄放点")
+    parser.add_argument("--branching", type=int, default=4, help="每级分支数")
+    parser.add_argument("--header-segments", type=int, default=3, help="主管管段数（装置总管依次接入）")
+    parser.add_argument("--tie-ins-per-node", type=int, default=2, help="末级分支管每个节点接入的安全阀出口管数")
+    parser.add_argument("--crossovers", type=int, default=0, help="总管节点间的跨接管数（形成环路）")
+    parser.add_argument("--flares", type=int, default=1, help="火炬数（大于1时主管远端另接火炬）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--columnar", action="store_true", help="生成列式格式的请求数据")
+    parser.add_argument("--partition-workers", type=int, default=4, help="分区并行计算的线程数")
+    parser.add_argument("--no-oracle", action="store_true", help="跳过正确性校验")
+    parser.add_argument("--compare", default=None, help="与之前的基准结果 JSON 比较")
+    parser.add_argument("--output", default=None, help="结果输出文件路径，默认输出到标准输出")
+    args = parser.parse_args(argv)
+    if args.repeat < 1 or args.flares < 1 or args.partition_workers < 1 or any(size < 1 for size in args.sizes):
+        parser.error("--repeat、--flares、--partition-workers 与 --sizes 需为正整数")
+    if args.crossovers < 0:
+        parser.error("--crossovers 不能为负数")
+
+    report = {
+        "environment": {
+            "commit": _git_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform()
+        },
+        "results": []
+    }
+    for size in args.sizes:
+        entry = benchmark_size(size, args)
+        report["results"].append(entry)
+        oracle = entry.get("oracle", {})
+        failed = [engine for engine, result in oracle.items() if not result["passed"]]
+        timings = entry['timings']
+        if "reference" in timings:
+            engines = (f"参照 {timings['reference']['total']['median']:.4f}s"
+                       f"  列存储 {timings['column_store']['total']['median']:.4f}s"
+                       f"  分区 {timings['partitioned']['total']['median']:.4f}s")
+        else:
+            engines = (f"{entry['loop_count']} 个回路  管网求解器 {timings['pipe_network']['total']['median']:.4f}s"
+                       f"（{entry['solver']['iterations']} 次牛顿迭代）")
+        print(f"[{size} 个泄放点 / {entry['pipe_count']} 段管道] {engines}"
+              f"  端到端 {timings['check_flare_system']['uncached']['median']:.4f}s"
+              f"  校验{'未通过: ' + ', '.join(failed) if failed else ('通过' if oracle else '跳过')}",
+              file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = compare_reports(json.load(f), report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+
+    oracle_passed = all(result["passed"] for entry in report["results"] for result in entry.get("oracle", {}).values())
+    return 0 if oracle_passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
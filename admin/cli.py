@@ -0,0 +1,41 @@
+"""火炬系统校验命令行工具
+
+用法：
+    python cli.py check request.json
+    python cli.py check_batch request.json --workers 8 --output result.json
+"""
+import argparse
+import json
+import sys
+from services.flare_system_service import FlareSystemService
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="火炬系统校验命令行工具")
+    parser.add_argument("command", choices=["check", "check_batch"], help="check 单工况校验，check_batch 批量工况校验")
+    parser.add_argument("input", help="请求 JSON 文件路径，格式同对应的 API 接口；- 表示标准输入")
+    parser.add_argument("--workers", type=int, default=None, help="批量工况并行进程数（默认取 CALCULATION_CONFIG）")
+    parser.add_argument("--output", default=None, help="结果输出文件路径，默认输出到标准输出")
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        data = json.load(sys.stdin)
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            data = json.load(f)
+
+    if args.command == "check":
+        result = FlareSystemService.check_flare_system(data)
+    else:
+        result = FlareSystemService.check_batch(data, workers=args.workers)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+
+    return 0 if result.get("status", 500) < 400 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,4 +6,131 @@ MYSQL_CONFIG = {
     'password': 'channel',
     'database': 'channel',
     'charset': 'utf8mb4'
-} 
\ No newline at end of file
+} 
+
+# MySQL连接池配置
+MYSQL_POOL_CONFIG = {
+    'max_size': 10,                  # 最大连接数
+    'checkout_timeout': 5.0,         # 连接池已满时借出的最长等待时间（秒）
+    'max_age_seconds': 3600,         # 连接最长存活时间，超过后归还时关闭
+    'ping_idle_seconds': 5.0         # 空闲超过该时间的连接借出前先 ping 检查存活
+}
+
+# 历史记录查询配置
+RECORD_QUERY_CONFIG = {
+    'default_limit': 100,            # 未指定 limit 时每页记录数
+    'max_limit': 1000,               # 单页最大记录数
+    'stream_batch_rows': 500         # 流式返回时每次写出的行数
+}
+
+# 批量保存记录配置
+RECORD_BATCH_CONFIG = {
+    'max_records': 10000,            # 单次请求最多保存的记录数
+    'chunk_size': 500                # 每条多行 INSERT 语句包含的记录数
+}
+
+# 计算配置
+CALCULATION_CONFIG = {
+    'workers': 1,                    # 批量工况并行进程数，1 为在请求进程内计算
+    'max_workers': 32,               # 单次请求允许的最大并行进程数
+    'parallel_min_scenarios': 256    # 工况数达到该值才启用进程池
+}
+
+# 单个大管网的分区并行计算配置（单工况校验的累计量与压力阶段）
+PARTITION_CONFIG = {
+    'workers': 1,                    # 并行线程数，1 为不分区（逐管道计算）
+    'min_pipes': 20000,              # 管道数达到该值才分区
+    'split_factor': 4                # 每个线程约分得的子树数，越大各组越均衡，主干管道越多
+}
+
+# 单工况校验结果缓存配置
+RESULT_CACHE_CONFIG = {
+    'enabled': True,
+    'max_entries': 256,              # 内存层最大条目数（LRU 淘汰）
+    'ttl_seconds': 600,              # 条目有效期，None 为不过期
+    'disk_path': None,               # SQLite 磁盘层文件路径，None 为不启用
+    'max_disk_entries': 10000        # 磁盘层最大条目数
+}
+
+# 交互式设计会话配置
+SESSION_CONFIG = {
+    'database_path': 'flare_sessions.db',  # 会话数据库文件（各 Web 工作进程共用）
+    'max_sessions': 64,              # 最多保留的会话数（按最近访问淘汰）
+    'ttl_seconds': 3600              # 会话闲置超过该时间后失效
+}
+
+# 管径优化配置
+SIZING_CONFIG = {
+    # 标准管径系列（mm），请求中可用 sizing.catalog 覆盖
+    'diameter_catalog': [25, 40, 50, 80, 100, 150, 200, 250, 300, 350, 400, 450, 500,
+                         600, 700, 800, 900, 1000, 1200, 1400, 1600, 1800, 2000],
+    'max_mach': 0.7,                 # 马赫数上限
+    'max_rounds': 10000              # 扩径搜索的最大轮数
+}
+
+# 蒙特卡洛不确定性分析配置
+MONTE_CARLO_CONFIG = {
+    'default_samples': 1000,         # 未指定 samples 时的样本数
+    'max_samples': 200000,           # 单次请求最大样本数
+    'max_sample_elements': 10000000,  # 样本数 × (不确定参数维数 + 泄放点数) 上限，限制抽样与结果矩阵的内存
+    # 默认相对不确定度：参数在 (1 ± u) 倍基准值内均匀分布，0 为不扰动
+    'uncertainty': {
+        'flow_rate': 0.1,
+        'temperature': 0.05,
+        'molecular_weight': 0.05,
+        'roughness': 0.5
+    },
+    'chunk_elements': 2000000,       # 每块计算的 样本数 × 管道数 上限，限制中间矩阵内存
+    'top_drivers': 3                 # 每个泄放点返回的主要影响参数个数
+}
+
+# 时间序列泄放回放配置
+TIME_SERIES_CONFIG = {
+    'max_steps': 100000,             # 单次请求最多时间步数
+    'chunk_elements': 2000000,       # 每块计算的 时间步数 × 管道数 上限，限制中间矩阵内存
+    'change_tolerance': 0.0          # 管道累计量相对变化不超过该值时沿用上次求解结果，0 为仅跳过完全相同的输入
+}
+
+# 性能指标配置（/metrics 接口与 profile=true 请求）
+METRICS_CONFIG = {
+    # 接口耗时直方图的桶上界（秒）
+    'request_buckets': [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30],
+    # 计算阶段耗时直方图的桶上界（秒）
+    'stage_buckets': [1e-5, 5e-5, 1e-4, 5e-4, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5],
+    'profile_top': 25,               # profile=true 时返回的函数数（按累计耗时）
+    # gunicorn 部署时各工作进程指标文件的目录（启动时清空），None 为每次启动新建临时目录
+    'multiprocess_dir': None
+}
+
+# 生产部署配置（gunicorn -c gunicorn.conf.py wsgi:app）
+SERVER_CONFIG = {
+    'bind': '0.0.0.0:5000',
+    'workers': 4,                    # 预派生的 Web 工作进程数
+    'threads': 8,                    # 每个 Web 工作进程的请求线程数
+    'calculation_processes': 2,      # 每个 Web 工作进程的计算进程数，0 为在请求线程内计算
+    'request_timeout': 120,          # 计算请求超时（秒），超时返回 504
+    'graceful_timeout': 30,          # 收到 SIGTERM 后等待在途请求完成的时间（秒）
+    'debug': False                   # 开发服务器（python app.py）是否启用调试模式
+}
+
+# 校验接口准入控制（各 Web 工作进程分别统计）
+ADMISSION_CONFIG = {
+    'enabled': True,
+    'max_pending_requests': 32,      # 已准入、未完成的校验请求数上限，超出返回 429
+    'max_pending_pipes': 1000000,    # 已准入、未完成请求的管道总数上限，超出返回 429
+    'initial_pipes_per_second': 20000,  # 尚无实测时每个计算进程的吞吐量估计（管道/秒）
+    'rate_smoothing': 0.2            # 吞吐量指数平滑系数
+}
+
+# 异步任务配置（/jobs 接口，SQLite 持久化队列，各 Web 工作进程共用）
+JOB_CONFIG = {
+    'database_path': 'flare_jobs.db',  # 任务队列数据库文件
+    'workers': 1,                    # 每个 Web 工作进程同时执行的任务数，0 为只提交与查询、不执行任务
+    'offload': True,                 # 任务在独立的计算进程中执行（每个任务线程一个），不占用同步接口的计算进程
+    'timeout': 3600,                 # 单个任务的计算超时（秒）
+    'lease_seconds': 60,             # 执行中任务的心跳超时（秒），超时后由其他进程重新执行
+    'max_attempts': 3,               # 心跳超时重新执行的最多次数
+    'max_queued': 100,               # 排队任务数上限，超出返回 429
+    'ttl_seconds': 86400,            # 已结束任务（含结果）的保留时间（秒）
+    'poll_interval': 0.5             # 空闲任务线程查询队列的间隔（秒）
+}
@@ -0,0 +1,52 @@
+"""gunicorn 配置（参数见 config.py 中的 SERVER_CONFIG）
+
+用法：
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+import shutil
+import tempfile
+from config import METRICS_CONFIG, SERVER_CONFIG
+
+bind = SERVER_CONFIG['bind']
+workers = SERVER_CONFIG['workers']
+# 多线程工作进程：历史记录、保存等 I/O 接口由请求线程并发处理，计算在计算进程中执行
+worker_class = 'gthread'
+threads = SERVER_CONFIG['threads']
+# 主进程导入 wsgi.py 并预热后再派生工作进程
+preload_app = True
+# 工作进程心跳超时，须大于计算超时（计算超时由计算进程池控制，超时返回 504）
+timeout = SERVER_CONFIG['request_timeout'] * 2 + 30
+# 收到 SIGTERM 后停止接受新连接，等待在途请求完成的时间
+graceful_timeout = SERVER_CONFIG['graceful_timeout']
+
+# 各工作进程的指标写入同一目录，/metrics 由任一工作进程汇总输出
+metrics_dir = METRICS_CONFIG['multiprocess_dir'] or tempfile.mkdtemp(prefix='flare_metrics_')
+
+def on_starting(server):
+    """主进程启动时清空指标目录，计数从本次启动开始累计"""
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+def on_exit(server):
+    if not METRICS_CONFIG['multiprocess_dir']:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+def post_worker_init(worker):
+    """工作进程开始处理请求前（请求线程尚未启动）派生计算进程，并启动异步任务线程与任务计算进程"""
+    from utils.calculation_executor import calculation_executor
+    from services.job_service import job_runner
+    from utils.instrumentation import metrics
+    metrics.use_directory(metrics_dir)
+    calculation_executor.start(SERVER_CONFIG['calculation_processes'], SERVER_CONFIG['request_timeout'])
+    job_runner.start()
+
+def worker_exit(server, worker):
+    """工作进程退出时等待在途计算完成并关闭计算进程
+
+    异步任务不等待：未完成的任务在心跳超时后由其他工作进程重新执行。
+    """
+    from utils.calculation_executor import calculation_executor
+    from services.job_service import job_runner
+    job_runner.shutdown(wait=False)
+    calculation_executor.shutdown()
@@ -0,0 +1,136 @@
+import numpy as np
+
+class _Column:
+    """视图属性：读写所属存储对应列的第 index 个元素，列中 NaN 对应 None"""
+
+    def __init__(self, integer=False):
+        self.integer = integer  # 取整字段（平均温度、平均分子量）读出为 int
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        value = getattr(view._store, self.name)[view._index]
+        if value != value:
+            return None
+        return int(value) if self.integer else float(value)
+
+    def __set__(self, view, value):
+        getattr(view._store, self.name)[view._index] = np.nan if value is None else value
+
+class PipeView:
+    """管道视图：与 Pipe 属性相同，数据保存在 PipeStore 的列中"""
+    __slots__ = ("_store", "_index")
+
+    equivalent_length = _Column()
+    diameter = _Column()
+    outlet_pressure = _Column()
+    roughness = _Column()
+    cross_area = _Column()
+    flow_rate = _Column()
+    avg_temperature = _Column(integer=True)
+    avg_molecular_weight = _Column(integer=True)
+    mach_number = _Column()
+    reynolds_number = _Column()
+    friction_factor = _Column()
+    inlet_pressure = _Column()
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def name(self):
+        return self._store.names[self._index]
+
+    def __repr__(self):
+        return f"Pipe({self.name}, L={self.equivalent_length}, D={self.diameter})"
+
+class DischargePointView:
+    """泄放点视图：与 DischargePoint 属性相同，数据保存在 DischargeStore 的列中"""
+    __slots__ = ("_store", "_index")
+
+    flow_rate = _Column()           # 单位: kg/h
+    pressure = _Column()            # 单位: Pa
+    temperature = _Column()         # 单位: K
+    molecular_weight = _Column()    # 单位: g/mol
+    max_backpressure = _Column()    # 单位: Pa
+    viscosity = _Column()           # 单位: Pa·s
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def node_id(self):
+        return self._store.node_ids[self._index]
+
+    def __repr__(self):
+        return f"DischargePoint({self.node_id}, flow={self.flow_rate}, p={self.pressure}, t={self.temperature})"
+
+class _ColumnStore:
+    """列存储基类：每个字段一个 float64 数组，缺失值为 NaN；按下标取得轻量视图"""
+    FIELDS = ()
+    VIEW = None
+
+    def __init__(self, keys, columns=None):
+        self._keys = keys
+        columns = columns or {}
+        count = len(keys)
+        for field in self.FIELDS:
+            values = columns.get(field)
+            if values is None:
+                values = np.full(count, np.nan)
+            else:
+                values = np.asarray(values, dtype=float)
+                if values.shape != (count,):
+                    raise ValueError(f"字段 {field} 长度为 {values.shape}，应为 {count}")
+            setattr(self, field, values)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self._keys)
+        if not 0 <= index < len(self._keys):
+            raise IndexError(index)
+        return self.VIEW(self, index)
+
+    def __iter__(self):
+        view = self.VIEW
+        for index in range(len(self._keys)):
+            yield view(self, index)
+
+    @property
+    def nbytes(self):
+        """数值列占用的字节数"""
+        return sum(getattr(self, field).nbytes for field in self.FIELDS)
+
+class PipeStore(_ColumnStore):
+    """管道列存储（按管道编号排列），可直接作为 pipe_list 传给各计算阶段"""
+    FIELDS = ("equivalent_length", "diameter", "outlet_pressure", "roughness", "cross_area",
+              "flow_rate", "avg_temperature", "avg_molecular_weight", "mach_number",
+              "reynolds_number", "friction_factor", "inlet_pressure")
+    VIEW = PipeView
+
+    @property
+    def names(self):
+        return self._keys
+
+    def __repr__(self):
+        return f"PipeStore(pipes={len(self)})"
+
+class DischargeStore(_ColumnStore):
+    """泄放点列存储，可直接作为 discharge_objects 传给各计算阶段"""
+    FIELDS = ("flow_rate", "pressure", "temperature", "molecular_weight", "max_backpressure", "viscosity")
+    VIEW = DischargePointView
+
+    @property
+    def node_ids(self):
+        return self._keys
+
+    def __repr__(self):
+        return f"DischargeStore(points={len(self)})"
@@ -1,9 +1,69 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from services.flare_system_service import FlareSystemService
 from services.record_service import RecordService
+from services.design_session_service import DesignSessionService
+from services.calculation_run_service import CalculationRunService
+from services.pipe_sizing_service import PipeSizingService
+from services.uncertainty_service import UncertaintyService
+from services.time_series_service import TimeSeriesService
+from services.job_service import JobService
+from config import ADMISSION_CONFIG, SERVER_CONFIG
+from utils.calculation_executor import (calculation_executor, CalculationTimeout, CalculationProcessFailed,
+                                       calculation_timeout_response, calculation_process_failed_response)
+from utils.admission import (AdmissionController, AdmissionRejected, SingleFlight, ADMISSION_ERROR_CODES,
+                             admission_rejected_response, estimate_request_cost)
+from utils.instrumentation import record_stage_durations
+from utils.result_cache import raw_body_hash
 
 flare_system_bp = Blueprint('flare_system', __name__, url_prefix='/api/v1/flare_system')
 
+# 校验接口：请求体相同的在途请求合并为一次计算；计算前按管道数准入
+check_flight = SingleFlight()
+check_admission = AdmissionController(
+    max_pending=ADMISSION_CONFIG['max_pending_requests'],
+    max_pending_cost=ADMISSION_CONFIG['max_pending_pipes'],
+    max_wait=SERVER_CONFIG['request_timeout'],
+    initial_rate=ADMISSION_CONFIG['initial_pipes_per_second'],
+    smoothing=ADMISSION_CONFIG['rate_smoothing']
+)
+
+def run_calculation(func, *args, **kwargs):
+    """CPU 密集的计算交给计算进程池（未启用时在请求线程内执行），超时返回 504，计算进程异常退出返回 503"""
+    try:
+        return calculation_executor.run(func, *args, **kwargs)
+    except CalculationTimeout:
+        return calculation_timeout_response(calculation_executor.timeout)
+    except CalculationProcessFailed:
+        return calculation_process_failed_response()
+
+def run_admitted_calculation(cost, func, *args, **kwargs):
+    """按成本准入后执行 run_calculation：队列已满返回 429，预计等待超过计算超时返回 503"""
+    if not ADMISSION_CONFIG['enabled']:
+        return run_calculation(func, *args, **kwargs)
+    concurrency = calculation_executor.processes if calculation_executor.offloading else 1
+    try:
+        cost = check_admission.admit(cost, concurrency)
+    except AdmissionRejected as rejection:
+        return admission_rejected_response(rejection)
+
+    elapsed = None
+    try:
+        result = run_calculation(func, *args, **kwargs)
+        # 只用实际完成的计算更新吞吐量估计，超时按超时时间计
+        if result.get('status') == 200:
+            elapsed = result['diagnostics'].get('calculation_cost')
+        elif result.get('error_code') == 'CALCULATION_TIMEOUT':
+            elapsed = calculation_executor.timeout
+    finally:
+        check_admission.release(cost, elapsed)
+    return result
+
+def retry_after_headers(result):
+    """准入控制拒绝与计算进程异常退出的响应附带 Retry-After 头"""
+    if result.get('error_code') in ADMISSION_ERROR_CODES + ('CALCULATION_PROCESS_FAILED',):
+        return {'Retry-After': str(result['retry_after'])}
+    return {}
+
 @flare_system_bp.route('/check', methods=['POST'])
 def check_flare_system():
     """判断装置是否符合规定接口"""
@@ -17,8 +77,57 @@ def check_flare_system():
             "message": "请求数据格式错误，需要JSON格式"
         }), 400
     
-    # 调用服务进行校验
-    result = FlareSystemService.check_flare_system(data)
+    # 调用服务进行校验（原始请求体用于结果缓存的快速命中；?persist=true 时保存逐管道结果，?profile=true 时返回性能剖析）
+    persist = request.args.get('persist', '').lower() in ('1', 'true', 'yes')
+    profile = request.args.get('profile', '').lower() in ('1', 'true', 'yes')
+    record_id = request.args.get('record_id', type=int)
+    raw_body = request.get_data(cache=True)
+    cost = estimate_request_cost(data)
+    def compute():
+        if persist or profile:
+            return run_admitted_calculation(cost, FlareSystemService.check_flare_system, data,
+                                            persist=persist, record_id=record_id, profile=profile)
+        # 结果缓存在本进程内查找，只有未命中的请求经准入后交给计算进程
+        return FlareSystemService.check_flare_system(
+            data, raw_body=raw_body,
+            calculate=lambda func, *args, **kwargs: run_admitted_calculation(cost, func, *args, **kwargs)
+        )
+
+    # 请求体相同的在途请求共享一次计算（保存结果与性能剖析请求各自计算）
+    shared = False
+    if persist or profile:
+        result = compute()
+    else:
+        result, shared = check_flight.do(raw_body_hash(raw_body), compute)
+    if shared:
+        if result.get('status') == 200:
+            result = dict(result, diagnostics=dict(result['diagnostics'], coalesced=True))
+    else:
+        record_stage_durations(result.get('diagnostics', {}).get('stages', {}))
+    
+    # 处理响应状态码
+    http_status = 200
+    if result.get('status') >= 400:
+        http_status = result.get('status')
+    
+    return jsonify(result), http_status, retry_after_headers(result)
+
+@flare_system_bp.route('/check_batch', methods=['POST'])
+def check_flare_system_batch():
+    """批量工况校验接口"""
+    # 获取JSON请求数据
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({
+            "status": 400,
+            "error_code": "INVALID_JSON",
+            "message": "请求数据格式错误，需要JSON格式"
+        }), 400
+    
+    # 调用服务进行批量校验（可通过 ?workers=N 指定并行进程数）
+    workers = request.args.get('workers', type=int)
+    result = run_calculation(FlareSystemService.check_batch, data, workers=workers)
     
     # 处理响应状态码
     http_status = 200
@@ -27,6 +136,150 @@ def check_flare_system():
     
     return jsonify(result), http_status
 
+@flare_system_bp.route('/monte_carlo', methods=['POST'])
+def analyze_flare_system_uncertainty():
+    """蒙特卡洛不确定性分析接口（请求格式同校验接口，可附加 monte_carlo 抽样参数）"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({
+            "status": 400,
+            "error_code": "INVALID_JSON",
+            "message": "请求数据格式错误，需要JSON格式"
+        }), 400
+    
+    # 可通过 ?workers=N 指定并行进程数
+    workers = request.args.get('workers', type=int)
+    result = run_calculation(UncertaintyService.analyze, data, workers=workers)
+    return jsonify(result), result.get('status')
+
+@flare_system_bp.route('/size', methods=['POST'])
+def size_flare_system_pipes():
+    """管径优化接口（请求格式同校验接口，可附加 sizing 选型参数）"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({
+            "status": 400,
+            "error_code": "INVALID_JSON",
+            "message": "请求数据格式错误，需要JSON格式"
+        }), 400
+    
+    result = run_calculation(PipeSizingService.size_pipes, data)
+    return jsonify(result), result.get('status')
+
+@flare_system_bp.route('/time_series', methods=['POST'])
+def replay_flare_system_time_series():
+    """时间序列泄放回放接口（请求格式同校验接口，附加 time_series 时刻与泄放点参数曲线）"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({
+            "status": 400,
+            "error_code": "INVALID_JSON",
+            "message": "请求数据格式错误，需要JSON格式"
+        }), 400
+    
+    result = run_calculation(TimeSeriesService.replay, data)
+    return jsonify(result), result.get('status')
+
+@flare_system_bp.route('/jobs', methods=['POST'])
+def submit_calculation_job():
+    """提交异步计算任务接口：?type=check|check_batch|monte_carlo|size|time_series（默认 check），请求体同对应的同步接口"""
+    data = request.get_json()
+
+    if not data:
+        return jsonify({
+            "status": 400,
+            "error_code": "INVALID_JSON",
+            "message": "请求数据格式错误，需要JSON格式"
+        }), 400
+
+    # 批量工况与蒙特卡洛任务可通过 ?workers=N 指定并行进程数
+    result = JobService.submit_job(request.args.get('type', 'check'), data,
+                                   workers=request.args.get('workers', type=int))
+    headers = {'Retry-After': str(result['retry_after'])} if result.get('error_code') == 'TOO_MANY_JOBS' else {}
+    return jsonify(result), result.get('status'), headers
+
+@flare_system_bp.route('/jobs', methods=['GET'])
+def get_job_queue_stats():
+    """异步任务队列各状态任务数"""
+    return jsonify({"status": 200, "result": JobService.queue_stats()}), 200
+
+@flare_system_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_calculation_job(job_id):
+    """查询异步任务状态、进度与结果接口"""
+    result = JobService.get_job(job_id)
+    return jsonify(result), result.get('status')
+
+@flare_system_bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_calculation_job(job_id):
+    """取消异步任务接口"""
+    result = JobService.cancel_job(job_id)
+    return jsonify(result), result.get('status')
+
+@flare_system_bp.route('/sessions', methods=['POST'])
+def create_design_session():
+    """创建交互式设计会话接口（请求格式同校验接口）"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({
+            "status": 400,
+            "error_code": "INVALID_JSON",
+            "message": "请求数据格式错误，需要JSON格式"
+        }), 400
+    
+    # 创建会话需全量计算，交给计算进程（会话保存在各进程共用的会话数据库中）
+    result = run_calculation(DesignSessionService.create_session, data)
+    return jsonify(result), result.get('status')
+
+@flare_system_bp.route('/sessions/<session_id>/patch', methods=['POST'])
+def patch_design_session(session_id):
+    """设计会话增量计算接口：只提交修改的管道/泄放点参数"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({
+            "status": 400,
+            "error_code": "INVALID_JSON",
+            "message": "请求数据格式错误，需要JSON格式"
+        }), 400
+    
+    result = DesignSessionService.patch_session(session_id, data)
+    return jsonify(result), result.get('status')
+
+@flare_system_bp.route('/sessions/<session_id>', methods=['DELETE'])
+def delete_design_session(session_id):
+    """删除设计会话接口"""
+    result = DesignSessionService.delete_session(session_id)
+    return jsonify(result), result.get('status')
+
+@flare_system_bp.route('/runs/compare', methods=['GET'])
+def compare_calculation_runs():
+    """比较两次保存的计算结果接口：?a=<run_id>&b=<run_id>[&tolerance=0][&limit=1000]"""
+    run_a = request.args.get('a', type=int)
+    run_b = request.args.get('b', type=int)
+    if run_a is None or run_b is None:
+        return jsonify({
+            "code": "PARAMETER.INVALID",
+            "message": "需要提供整数参数 a 与 b",
+            "invalid_field": "a" if run_a is None else "b"
+        }), 400
+
+    result, status_code = CalculationRunService.compare_runs(
+        run_a, run_b,
+        tolerance=request.args.get('tolerance', 0.0, type=float),
+        limit=request.args.get('limit', 1000, type=int)
+    )
+    return jsonify(result), status_code
+
+@flare_system_bp.route('/runs/<int:run_id>', methods=['GET'])
+def get_calculation_run(run_id):
+    """获取保存的逐管道计算结果接口（format=columns 时按列返回）"""
+    result, status_code = CalculationRunService.get_run(run_id, columnar=request.args.get('format') == 'columns')
+    return jsonify(result), status_code
+
 @flare_system_bp.route('/save', methods=['POST'])
 def save_record():
     """保存记录接口"""
@@ -45,10 +298,34 @@ def save_record():
     
     return jsonify(result), status_code
 
+@flare_system_bp.route('/save_batch', methods=['POST'])
+def save_records():
+    """批量保存记录接口：请求体为记录数组，或 {"records": [...]}"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({
+            "code": "PARAMETER.INVALID",
+            "message": "请求数据格式错误，需要JSON格式",
+            "invalid_field": "request"
+        }), 400
+    
+    records = data.get('records') if isinstance(data, dict) else data
+    result, status_code = RecordService.save_records(records)
+    
+    return jsonify(result), status_code
+
 @flare_system_bp.route('/info', methods=['GET'])
 def get_records():
-    """获取历史记录接口"""
-    # 调用服务获取所有记录
-    result, status_code = RecordService.get_records()
+    """获取历史记录接口（按记录时间倒序分页，stream=true 时以 NDJSON 流式返回）"""
+    query, error = RecordService.parse_record_query(request.args)
+    if error:
+        return jsonify(error), 400
+
+    if query['stream']:
+        return Response(RecordService.stream_records(query), mimetype='application/x-ndjson')
+
+    # 调用服务获取一页记录
+    result, status_code = RecordService.get_records(query)
     
     return jsonify(result), status_code 
\ No newline at end of file
@@ -0,0 +1,200 @@
+import numpy as np
+from utils.run_codec import RUN_RESULT_FIELDS, run_hashes, pack_run, unpack_run
+from utils.vectorized_solver import to_optional_list
+
+# pymysql 与连接池在用到的方法内导入，只做计算的进程（含单工况校验）启动时不加载
+
+class CalculationRunService:
+    @staticmethod
+    def save_run(data, pipe_store, satisfied, not_satisfied, record_id=None):
+        """保存一次单工况计算的逐管道结果，返回新建的 run_id
+
+        表结构见 sql/calc_run.sql；结果按列打包压缩后存为一条记录。
+        """
+        from utils.db_pool import get_db_connection
+        network_hash, scenario_hash = run_hashes(data)
+        qualification = {
+            "qualified": not not_satisfied,
+            "satisfied": [list(item) for item in satisfied],
+            "not_satisfied": [list(item) for item in not_satisfied]
+        }
+        columns = {field: getattr(pipe_store, field) for field in RUN_RESULT_FIELDS}
+        blob = pack_run(pipe_store.names, columns, qualification)
+        discharge_count = len(data.get('system_config', {}).get('discharge_nodes', []))
+
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO calc_run
+                    (record_id, network_hash, scenario_hash, qualified, pipe_count, discharge_point_count, result_blob)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (record_id, network_hash, scenario_hash, qualification["qualified"],
+                     len(pipe_store), discharge_count, blob)
+                )
+                run_id = cursor.lastrowid
+            conn.commit()
+            return run_id
+        finally:
+            conn.close()
+
+    @staticmethod
+    def load_run(run_id):
+        """读取计算结果，返回 (元数据, 头部, 字段 -> 数组)，不存在时返回 None"""
+        import pymysql
+        from utils.db_pool import get_db_connection
+        conn = get_db_connection()
+        try:
+            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                cursor.execute(
+                    """
+                    SELECT id, record_id, network_hash, scenario_hash, qualified, pipe_count,
+                           discharge_point_count, result_blob, created_at
+                    FROM calc_run WHERE id = %s
+                    """,
+                    (run_id,)
+                )
+                row = cursor.fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            return None
+        header, columns = unpack_run(row.pop('result_blob'))
+        row['qualified'] = bool(row['qualified'])
+        row['created_at'] = row['created_at'].isoformat() + 'Z'
+        return row, header, columns
+
+    @staticmethod
+    def get_run(run_id, columnar=False):
+        """获取计算结果：逐管道记录，或 columnar=True 时按列返回"""
+        import pymysql
+        try:
+            loaded = CalculationRunService.load_run(run_id)
+            if loaded is None:
+                return _run_not_found(run_id), 404
+            meta, header, columns = loaded
+
+            pipe_names = header["pipe_names"]
+            values = {field: to_optional_list(columns[field]) for field in header["fields"]}
+            if columnar:
+                pipes = dict({"pipe_id": pipe_names}, **values)
+            else:
+                fields = header["fields"]
+                pipes = [dict(zip(fields, row), pipe_id=name)
+                         for name, row in zip(pipe_names, zip(*(values[field] for field in fields)))]
+
+            return {
+                "code": "SUCCESS",
+                "data": dict(meta, qualification=header["qualification"], pipes=pipes)
+            }, 200
+
+        except pymysql.MySQLError as e:
+            return _database_error(e), 500
+        except Exception as e:
+            return _internal_error(e), 500
+
+    @staticmethod
+    def compare_runs(run_a, run_b, tolerance=0.0, limit=1000):
+        """比较两次计算结果：各字段差异统计、结果不同的管道（最多 limit 条）及校验结论的变化"""
+        import pymysql
+        try:
+            loaded_a = CalculationRunService.load_run(run_a)
+            if loaded_a is None:
+                return _run_not_found(run_a), 404
+            loaded_b = CalculationRunService.load_run(run_b)
+            if loaded_b is None:
+                return _run_not_found(run_b), 404
+            meta_a, header_a, columns_a = loaded_a
+            meta_b, header_b, columns_b = loaded_b
+
+            # 按管道名对齐，只比较两次都有的管道
+            names_a = header_a["pipe_names"]
+            index_b = {name: i for i, name in enumerate(header_b["pipe_names"])}
+            rows_a = np.array([i for i, name in enumerate(names_a) if name in index_b], dtype=int)
+            rows_b = np.array([index_b[names_a[i]] for i in rows_a], dtype=int)
+            fields = [field for field in header_a["fields"] if field in columns_b]
+
+            changed = np.zeros(len(rows_a), dtype=bool)
+            summary = {}
+            diffs = {}
+            for field in fields:
+                a = columns_a[field][rows_a]
+                b = columns_b[field][rows_b]
+                with np.errstate(invalid='ignore'):
+                    diff = np.abs(a - b)
+                    field_changed = (diff > tolerance) | (np.isnan(a) != np.isnan(b))
+                changed |= field_changed
+                diffs[field] = (a, b)
+                finite = diff[~np.isnan(diff)]
+                summary[field] = {
+                    "changed_count": int(field_changed.sum()),
+                    "max_abs_diff": float(finite.max()) if finite.size else None
+                }
+
+            changed_rows = np.flatnonzero(changed)[:limit]
+            pipes = []
+            for k in changed_rows.tolist():
+                pipe = {"pipe_id": names_a[rows_a[k]]}
+                for field in fields:
+                    a, b = diffs[field]
+                    pipe[field] = to_optional_list([a[k], b[k]])
+                pipes.append(pipe)
+
+            return {
+                "code": "SUCCESS",
+                "data": {
+                    "run_a": meta_a,
+                    "run_b": meta_b,
+                    "same_network": meta_a["network_hash"] == meta_b["network_hash"],
+                    "same_scenario": meta_a["scenario_hash"] == meta_b["scenario_hash"],
+                    "common_pipe_count": len(rows_a),
+                    "only_in_a": len(names_a) - len(rows_a),
+                    "only_in_b": len(header_b["pipe_names"]) - len(rows_a),
+                    "changed_pipe_count": int(changed.sum()),
+                    "summary": summary,
+                    "qualification": _compare_qualification(header_a["qualification"], header_b["qualification"]),
+                    "pipes": pipes
+                }
+            }, 200
+
+        except pymysql.MySQLError as e:
+            return _database_error(e), 500
+        except Exception as e:
+            return _internal_error(e), 500
+
+def _compare_qualification(qualification_a, qualification_b):
+    """两次结果中是否满足背压要求发生变化的泄放点"""
+    def status(qualification):
+        result = {item[0]: True for item in qualification["satisfied"]}
+        result.update({item[0]: False for item in qualification["not_satisfied"]})
+        return result
+
+    status_a = status(qualification_a)
+    status_b = status(qualification_b)
+    return {
+        "qualified": [qualification_a["qualified"], qualification_b["qualified"]],
+        "changed_nodes": {node: [status_a.get(node), status_b.get(node)]
+                          for node in dict.fromkeys(list(status_a) + list(status_b))
+                          if status_a.get(node) != status_b.get(node)}
+    }
+
+def _run_not_found(run_id):
+    return {
+        "code": "NOT_FOUND",
+        "message": f"计算结果 {run_id} 不存在"
+    }
+
+def _database_error(e):
+    return {
+        "code": "DATABASE_ERROR",
+        "message": f"数据库查询失败: {str(e)}"
+    }
+
+def _internal_error(e):
+    return {
+        "code": "INTERNAL_ERROR",
+        "message": f"服务器内部错误: {str(e)}"
+    }
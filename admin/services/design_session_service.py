@@ -0,0 +1,142 @@
+import time
+from config import SESSION_CONFIG
+from utils.data_mapper import InvalidInputError, map_request_to_pipe_params, map_request_to_discharge_params
+from utils.design_session import DesignSession, SessionStore
+from utils.network_solver import LOOPED_NETWORK_UNSUPPORTED, is_looped_network
+
+_session_store = SessionStore(
+    SESSION_CONFIG['database_path'],
+    max_sessions=SESSION_CONFIG['max_sessions'],
+    ttl_seconds=SESSION_CONFIG['ttl_seconds']
+)
+
+def _session_not_found(session_id):
+    return {
+        "status": 404,
+        "error_code": "SESSION_NOT_FOUND",
+        "message": f"会话 {session_id} 不存在或已过期"
+    }
+
+class DesignSessionService:
+    @staticmethod
+    def create_session(data):
+        """创建设计会话：全量计算一次并保存管道状态，返回全部管道结果"""
+        start_time = time.time()
+
+        try:
+            # 1. 提取系统配置
+            system_config = data.get('system_config', {})
+            connection_graph = system_config.get('connection_graph', {})
+            discharge_nodes = system_config.get('discharge_nodes', [])
+            flare_node = system_config.get('flare_node')
+
+            # 检查必要参数
+            if not connection_graph or not discharge_nodes or not flare_node:
+                return {
+                    "status": 400,
+                    "error_code": "INVALID_INPUT",
+                    "message": "系统配置缺少必要参数"
+                }
+            if is_looped_network(connection_graph, flare_node):
+                return {
+                    "status": 400,
+                    "error_code": "INVALID_INPUT",
+                    "message": LOOPED_NETWORK_UNSUPPORTED
+                }
+
+            # 2. 映射参数并全量计算
+            pipe_params = map_request_to_pipe_params(data.get('pipes', []), flare_node)
+            discharge_params = map_request_to_discharge_params(data.get('discharge_points', []))
+            session = DesignSession(connection_graph, flare_node, discharge_nodes, pipe_params, discharge_params)
+            _session_store.add(session)
+
+            return {
+                "status": 200,
+                "message": "设计会话已创建",
+                "result": {
+                    "session_id": session.session_id,
+                    "qualified": session.qualified,
+                    "unsatisfied_nodes": list(session.unsatisfied),
+                    "pipes": [session.pipe_result(pipe_id) for pipe_id in range(session.topology.pipe_count)]
+                },
+                "diagnostics": {
+                    "api_version": "天哥基础版",
+                    "calculation_cost": round(time.time() - start_time, 3)
+                }
+            }
+
+        except InvalidInputError as e:
+            return {
+                "status": 400,
+                "error_code": "INVALID_INPUT",
+                "message": str(e)
+            }
+        except Exception as e:
+            # 异常情况返回
+            return {
+                "status": 503,
+                "error_code": "PRESSURE_CALCULATION_FAILED",
+                "message": f"压力计算引擎异常: {str(e)}",
+                "retry_after": 5
+            }
+
+    @staticmethod
+    def patch_session(session_id, data):
+        """对会话应用管道/泄放点参数修改，只重算受影响的管道并返回结果有变化的管道"""
+        start_time = time.time()
+
+        pipe_patches = data.get('pipes', [])
+        discharge_patches = data.get('discharge_points', [])
+        if not isinstance(pipe_patches, list) or not isinstance(discharge_patches, list):
+            return {
+                "status": 400,
+                "error_code": "INVALID_INPUT",
+                "message": "pipes 与 discharge_points 需为列表"
+            }
+
+        def patch(session):
+            changed, stats = session.apply_patch(pipe_patches, discharge_patches)
+            return {
+                "status": 200,
+                "message": "增量计算完成",
+                "result": {
+                    "session_id": session_id,
+                    "qualified": session.qualified,
+                    "unsatisfied_nodes": list(session.unsatisfied),
+                    "changed_pipes": [session.pipe_result(pipe_id) for pipe_id in changed]
+                },
+                "diagnostics": dict(stats, api_version="天哥基础版",
+                                    calculation_cost=round(time.time() - start_time, 3))
+            }
+
+        try:
+            # 会话状态的读取、增量计算与保存在同一数据库写事务内，各工作进程对同一会话的补丁依次执行
+            session, result = _session_store.update(session_id, patch)
+        except InvalidInputError as e:
+            # 补丁校验在修改状态前完成，会话仍可继续使用
+            return {
+                "status": 400,
+                "error_code": "INVALID_INPUT",
+                "message": str(e)
+            }
+        except Exception as e:
+            # 计算中途失败时事务已回滚、内存中的会话已丢弃，会话保持补丁前的状态
+            return {
+                "status": 503,
+                "error_code": "PRESSURE_CALCULATION_FAILED",
+                "message": f"压力计算引擎异常: {str(e)}，本次修改未生效",
+                "retry_after": 5
+            }
+        if session is None:
+            return _session_not_found(session_id)
+        return result
+
+    @staticmethod
+    def delete_session(session_id):
+        """删除会话"""
+        if not _session_store.remove(session_id):
+            return _session_not_found(session_id)
+        return {
+            "status": 200,
+            "message": "设计会话已删除"
+        }
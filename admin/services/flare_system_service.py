@@ -1,15 +1,181 @@
 import time
 import datetime
-from utils.flow_calculator import create_pipe_objects, create_discharge_objects, calculate_pipe_flow_rates
+from config import CALCULATION_CONFIG, PARTITION_CONFIG, RESULT_CACHE_CONFIG
+from utils.flow_calculator import calculate_pipe_flow_rates
 from utils.temperature_molecular_calculator import calculate_pipe_avg_temperatures, calculate_pipe_avg_molecular_weight
 from utils.mach_number_calculator import calculate_pipe_mach_numbers, calculate_pipe_friction_factors
-from utils.pressure_calculator import calculate_pipe_inlet_pressures, check_flare_system_qualification
-from utils.data_mapper import map_request_to_pipe_params, map_request_to_discharge_params
+from utils.pressure_calculator import (calculate_pipe_inlet_pressures, calculate_partitioned_inlet_pressures,
+                                      check_flare_system_qualification)
+from utils.data_mapper import (InvalidInputError, map_request_to_discharge_params, map_request_to_pipe_store,
+                               map_request_to_discharge_store)
+from utils.network_topology import compile_network_topology
+from utils.network_solver import (LOOPED_NETWORK_UNSUPPORTED, is_looped_network, compile_pipe_network,
+                                  solve_pipe_network)
+from utils.load_aggregator import aggregate_pipe_loads, aggregate_partitioned_loads
+from utils.network_partition import partition_network
+from models.network_store import PipeStore, DischargeStore
+from utils.network_evaluator import compile_network, build_scenario_loads, idle_discharge_points
+from utils.parallel_executor import iter_scenario_chunks
+from utils.result_cache import ResultCache, canonical_request_hash, raw_body_hash
+from utils.vectorized_solver import round_like_python, to_optional_list
+from utils.instrumentation import StageTimer, profile_call
+from services.calculation_run_service import CalculationRunService
+
+# 单工况校验结果缓存（未启用时为 None）
+_result_cache = ResultCache(
+    max_entries=RESULT_CACHE_CONFIG['max_entries'],
+    ttl_seconds=RESULT_CACHE_CONFIG['ttl_seconds'],
+    disk_path=RESULT_CACHE_CONFIG['disk_path'],
+    max_disk_entries=RESULT_CACHE_CONFIG['max_disk_entries']
+) if RESULT_CACHE_CONFIG['enabled'] else None
 
 class FlareSystemService:
     @staticmethod
-    def check_flare_system(data):
+    def check_flare_system(data, raw_body=None, persist=False, record_id=None, profile=False, progress=None,
+                           calculate=None):
+        """判断装置是否符合规定；system_config、pipes、discharge_points 相同的请求直接返回缓存结果
+
+        raw_body 为原始请求体，原样重复提交时按其哈希直接命中，省去规范化序列化。
+        persist=True 时总是重新计算，并将逐管道结果保存到 calc_run 表，返回 run_id。
+        profile=True 时总是重新计算，在 cProfile 下执行并在 diagnostics.profile 中返回耗时最多的函数。
+        progress 为异步任务的进度记录（JobProgress），各计算阶段完成时回调。
+        calculate(func, *args, **kwargs) 执行未命中缓存时的计算（如交给计算进程池），默认在调用线程内执行；
+        查找与写入缓存在调用进程内完成。
+        """
+        calculate = calculate or (lambda func, *args, **kwargs: func(*args, **kwargs))
+        if persist or profile:
+            if persist:
+                def compute():
+                    return FlareSystemService._check_and_persist(data, record_id)
+            else:
+                def compute():
+                    return FlareSystemService._check_flare_system(data, progress=progress)
+            if not profile:
+                return compute()
+            result, summary = profile_call(compute)
+            if result.get('status') != 200:
+                return result
+            return dict(result, diagnostics=dict(result['diagnostics'], profile=summary))
+
+        if _result_cache is None:
+            return calculate(FlareSystemService._check_flare_system, data, progress=progress)
+
         start_time = time.time()
+        raw_key = raw_body_hash(raw_body) if raw_body else None
+        cached = _result_cache.get(raw_key, count_miss=False) if raw_key else None
+        cache_key = None
+        if cached is None:
+            cache_key = canonical_request_hash(data)
+            cached = _result_cache.get(cache_key)
+            if cached is not None and raw_key:
+                _result_cache.set(raw_key, cached, persist=False)
+
+        if cached is not None:
+            # 校验时间取本次请求时间；分阶段耗时属于首次计算，命中缓存时不返回
+            diagnostics = {key: value for key, value in cached['diagnostics'].items() if key != 'stages'}
+            check_time = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+            return dict(cached, result=dict(cached['result'], check_time=check_time), diagnostics=dict(
+                diagnostics,
+                calculation_cost=round(time.time() - start_time, 3),
+                cache=dict(_result_cache.stats(), hit=True)
+            ))
+
+        result = calculate(FlareSystemService._check_flare_system, data, progress=progress)
+        if result.get('status') == 200:
+            _result_cache.set(cache_key, result)
+            if raw_key:
+                _result_cache.set(raw_key, result, persist=False)
+            result = dict(result, diagnostics=dict(result['diagnostics'], cache=dict(_result_cache.stats(), hit=False)))
+        return result
+
+    @staticmethod
+    def evaluate_network(pipe_objects, discharge_objects, connection_graph, flare_node, topology, loads=None,
+                         timer=None, solver_stats=None, workers=None, min_pipes=None):
+        """依次执行各计算阶段并校验，返回 (管道列表, 是否合格, 满足的泄放点, 不满足的泄放点)
+
+        传入 timer（StageTimer）时记录各阶段耗时，传入 solver_stats（dict）时写入各迭代求解器的迭代次数统计。
+        workers 为累计量与压力阶段的分区并行线程数，min_pipes 为分区的最少管道数（默认均取 PARTITION_CONFIG），
+        结果与逐管道计算逐位相同。
+        """
+        timer = timer or StageTimer()
+        workers = PARTITION_CONFIG['workers'] if workers is None else workers
+        partition = FlareSystemService.resolve_partition(pipe_objects, discharge_objects, topology, workers,
+                                                         solver_stats, timer, min_pipes)
+        # 泄放量累计只做一次后序遍历（未传入时现场计算）
+        if loads is None:
+            with timer.stage("loads"):
+                if partition is not None:
+                    loads = aggregate_partitioned_loads(topology, discharge_objects, partition, workers)
+                else:
+                    loads = aggregate_pipe_loads(topology, discharge_objects)
+        with timer.stage("flow"):
+            pipe_objects = calculate_pipe_flow_rates(pipe_objects, discharge_objects, connection_graph, flare_node, topology=topology, loads=loads)
+        with timer.stage("temperature"):
+            pipe_objects = calculate_pipe_avg_temperatures(pipe_objects, discharge_objects, connection_graph, topology=topology, loads=loads)
+        with timer.stage("molecular_weight"):
+            pipe_objects = calculate_pipe_avg_molecular_weight(pipe_objects, discharge_objects, connection_graph, topology=topology, loads=loads)
+        with timer.stage("mach"):
+            pipe_objects = calculate_pipe_mach_numbers(pipe_objects, topology=topology, loads=loads)
+        with timer.stage("friction"):
+            pipe_objects = calculate_pipe_friction_factors(pipe_objects, discharge_objects, connection_graph, flare_node,
+                                                           topology=topology, loads=loads, stats=solver_stats)
+        with timer.stage("pressure"):
+            if partition is not None:
+                pipe_objects = calculate_partitioned_inlet_pressures(pipe_objects, topology, partition, workers,
+                                                                     stats=solver_stats)
+            else:
+                pipe_objects = calculate_pipe_inlet_pressures(pipe_objects, connection_graph, flare_node, topology=topology,
+                                                              stats=solver_stats)
+
+        with timer.stage("qualification"):
+            is_qualified, satisfied, not_satisfied = check_flare_system_qualification(pipe_objects, discharge_objects, topology=topology)
+        return pipe_objects, is_qualified, satisfied, not_satisfied
+
+    @staticmethod
+    def resolve_partition(pipe_objects, discharge_objects, topology, workers, solver_stats=None, timer=None,
+                          min_pipes=None):
+        """大管网（列存储，管道数不少于 min_pipes，默认取 PARTITION_CONFIG）且使用多个线程时切分子树组，
+        否则返回 None（逐管道计算）
+
+        传入 solver_stats 时写入分区概况 solver_stats["partition"]。
+        """
+        min_pipes = PARTITION_CONFIG['min_pipes'] if min_pipes is None else min_pipes
+        if workers <= 1 or topology.pipe_count < min_pipes or \
+                not isinstance(pipe_objects, PipeStore) or not isinstance(discharge_objects, DischargeStore) or \
+                topology.align(pipe_objects) is not pipe_objects:
+            return None
+        with (timer or StageTimer()).stage("partition"):
+            partition = partition_network(topology, workers, PARTITION_CONFIG['split_factor'])
+        if solver_stats is not None:
+            sizes = partition.group_sizes()
+            solver_stats["partition"] = {
+                "groups": partition.group_count,
+                "trunk_pipes": partition.trunk_pipe_count,
+                "largest_group_pipes": int(sizes.max()),
+                "smallest_group_pipes": int(sizes.min())
+            }
+        return partition
+
+    @staticmethod
+    def _check_and_persist(data, record_id=None):
+        """计算并保存逐管道结果；保存失败不影响校验结论，错误写入 diagnostics"""
+        artifacts = {}
+        result = FlareSystemService._check_flare_system(data, artifacts)
+        if result.get('status') != 200:
+            return result
+
+        try:
+            run_id = CalculationRunService.save_run(data, artifacts['pipe_store'], artifacts['satisfied'],
+                                                    artifacts['not_satisfied'], record_id=record_id)
+        except Exception as e:
+            return dict(result, diagnostics=dict(result['diagnostics'], persist_error=f"计算结果保存失败: {str(e)}"))
+        return dict(result, result=dict(result['result'], run_id=run_id))
+
+    @staticmethod
+    def _check_flare_system(data, artifacts=None, progress=None):
+        """单工况校验；传入 artifacts 字典时写入管道结果存储与各泄放点校验明细，传入 progress 时各阶段完成后回调"""
+        start_time = time.time()
+        timer = StageTimer(progress.stage_completed if progress is not None else None)
         
         try:
             # 1. 提取系统配置
@@ -26,28 +192,34 @@ class FlareSystemService:
                     "message": "系统配置缺少必要参数"
                 }
             
-            # 2. 提取管道参数
+            # 编译管网拓扑，各计算阶段共用；含分流、环路或多个火炬节点时编译为一般管网
+            looped = is_looped_network(connection_graph, flare_node)
+            with timer.stage("topology"):
+                if looped:
+                    topology = compile_pipe_network(connection_graph, flare_node, discharge_nodes)
+                else:
+                    topology = compile_network_topology(connection_graph, flare_node)
+
+            # 2. 提取管道参数（逐条记录或列式数据）
             pipes_data = data.get('pipes', [])
             discharge_points_data = data.get('discharge_points', [])
             
-            # 3. 映射到内部数据结构
-            pipe_params = map_request_to_pipe_params(pipes_data)
-            discharge_params = map_request_to_discharge_params(discharge_points_data)
-            
-            # 4. 创建管道和泄放点对象
-            pipe_objects = create_pipe_objects(connection_graph, pipe_params)
-            discharge_objects = create_discharge_objects(discharge_nodes, discharge_params)
+            # 3-4. 直接装入管道和泄放点列存储（属性接口同对象列表，计算阶段直接使用数组列）
+            with timer.stage("mapping"):
+                pipe_objects = map_request_to_pipe_store(pipes_data, topology)
+                discharge_objects = map_request_to_discharge_store(discharge_points_data, discharge_nodes)
             
-            # 5. 执行计算流程
-            pipe_objects = calculate_pipe_flow_rates(pipe_objects, discharge_objects, connection_graph, flare_node)
-            pipe_objects = calculate_pipe_avg_temperatures(pipe_objects, discharge_objects, connection_graph)
-            pipe_objects = calculate_pipe_avg_molecular_weight(pipe_objects, discharge_objects, connection_graph)
-            pipe_objects = calculate_pipe_mach_numbers(pipe_objects)
-            pipe_objects = calculate_pipe_friction_factors(pipe_objects, discharge_objects, connection_graph, flare_node)
-            pipe_objects = calculate_pipe_inlet_pressures(pipe_objects, connection_graph, flare_node)
-            
-            # 6. 进行校验判断
-            is_qualified, satisfied, not_satisfied = check_flare_system_qualification(pipe_objects, discharge_objects)
+            # 5-6. 执行计算流程并进行校验判断
+            solver_stats = {}
+            if looped:
+                pipe_objects, is_qualified, satisfied, not_satisfied = solve_pipe_network(
+                    topology, pipe_objects, discharge_objects, timer=timer, stats=solver_stats)
+            else:
+                pipe_objects, is_qualified, satisfied, not_satisfied = FlareSystemService.evaluate_network(
+                    pipe_objects, discharge_objects, connection_graph, flare_node, topology,
+                    timer=timer, solver_stats=solver_stats)
+            if artifacts is not None:
+                artifacts.update(pipe_store=pipe_objects, satisfied=satisfied, not_satisfied=not_satisfied)
             
             # 7. 构建返回结果
             end_time = time.time()
@@ -64,10 +236,126 @@ class FlareSystemService:
                 },
                 "diagnostics": {
                     "api_version": "天哥基础版",
-                    "calculation_cost": calculation_cost
+                    "calculation_cost": calculation_cost,
+                    "stages": timer.as_milliseconds(),
+                    "solver": solver_stats
                 }
             }
             
+        except InvalidInputError as e:
+            return {
+                "status": 400,
+                "error_code": "INVALID_INPUT",
+                "message": str(e)
+            }
+        except Exception as e:
+            # 异常情况返回
+            return {
+                "status": 503,
+                "error_code": "PRESSURE_CALCULATION_FAILED",
+                "message": f"压力计算引擎异常: {str(e)}",
+                "retry_after": 5
+            } 
+
+    @staticmethod
+    def check_batch(data, workers=None, progress=None):
+        """批量工况校验：管网只编译一次，所有工况按矩阵一次计算
+
+        workers 为并行进程数（默认取 CALCULATION_CONFIG），工况数较多时分块交给进程池。
+        progress 为异步任务的进度记录，每块工况完成后更新已完成工况数。
+        """
+        start_time = time.time()
+
+        try:
+            # 1. 提取系统配置
+            system_config = data.get('system_config', {})
+            connection_graph = system_config.get('connection_graph', {})
+            discharge_nodes = system_config.get('discharge_nodes', [])
+            flare_node = system_config.get('flare_node')
+
+            # 检查必要参数
+            if not connection_graph or not discharge_nodes or not flare_node:
+                return {
+                    "status": 400,
+                    "error_code": "INVALID_INPUT",
+                    "message": "系统配置缺少必要参数"
+                }
+            if is_looped_network(connection_graph, flare_node):
+                return {
+                    "status": 400,
+                    "error_code": "INVALID_INPUT",
+                    "message": LOOPED_NETWORK_UNSUPPORTED
+                }
+
+            scenarios = data.get('scenarios')
+            if not scenarios or not isinstance(scenarios, list):
+                return {
+                    "status": 400,
+                    "error_code": "INVALID_INPUT",
+                    "message": "工况列表不能为空"
+                }
+
+            # 2. 编译管网（拓扑 + 管道参数），所有工况共用
+            topology = compile_network_topology(connection_graph, flare_node)
+            pipe_store = map_request_to_pipe_store(data.get('pipes', []), topology)
+            network = compile_network(connection_graph, flare_node, discharge_nodes, pipe_store, topology=topology)
+
+            # 3. 构建工况矩阵：各工况的泄放点参数覆盖公共的 discharge_points
+            base_params = map_request_to_discharge_params(data.get('discharge_points', []))
+            scenario_params = [map_request_to_discharge_params(scenario.get('discharge_points', []))
+                               for scenario in scenarios]
+            loads = build_scenario_loads(network, base_params, scenario_params)
+
+            # 4. 矩阵计算与校验，按块顺序返回并构建结果
+            workers = FlareSystemService.resolve_workers(workers, len(scenarios))
+            qualified_count = 0
+            scenario_results = []
+            idle = idle_discharge_points(loads)
+            if progress is not None:
+                progress.update(scenarios_done=0, scenarios_total=len(scenarios))
+            for start, stop, qualified, backpressure, margin in iter_scenario_chunks(network, loads, workers):
+                qualified_count += int(qualified.sum())
+                backpressure_rows = to_optional_list(backpressure)
+                margin_rows = to_optional_list(round_like_python(margin, 2))
+                for offset, row in enumerate(range(start, stop)):
+                    nodes = {node: {"backpressure": bp, "margin": mg}
+                             for node, bp, mg in zip(network.discharge_nodes,
+                                                     backpressure_rows[offset], margin_rows[offset])}
+                    scenario_results.append({
+                        "scenario_id": scenarios[row].get('scenario_id', row),
+                        "qualified": bool(qualified[offset]),
+                        "idle_nodes": [node for node, is_idle in zip(network.discharge_nodes, idle[row]) if is_idle],
+                        "nodes": nodes
+                    })
+                if progress is not None:
+                    progress.update(scenarios_done=stop)
+
+            calculation_cost = round(time.time() - start_time, 3)
+
+            return {
+                "status": 200,
+                "message": "批量安全检查完成",
+                "result": {
+                    "qualified": qualified_count == len(scenarios),
+                    "check_time": datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "scenario_count": len(scenarios),
+                    "qualified_count": qualified_count,
+                    "discharge_point_count": network.discharge_count,
+                    "scenarios": scenario_results
+                },
+                "diagnostics": {
+                    "api_version": "天哥基础版",
+                    "calculation_cost": calculation_cost,
+                    "workers": workers
+                }
+            }
+
+        except InvalidInputError as e:
+            return {
+                "status": 400,
+                "error_code": "INVALID_INPUT",
+                "message": str(e)
+            }
         except Exception as e:
             # 异常情况返回
             return {
@@ -75,4 +363,13 @@ class FlareSystemService:
                 "error_code": "PRESSURE_CALCULATION_FAILED",
                 "message": f"压力计算引擎异常: {str(e)}",
                 "retry_after": 5
-            } 
\ No newline at end of file
+            }
+
+    @staticmethod
+    def resolve_workers(workers, scenario_count):
+        """确定实际并行进程数：工况数较少时不启用进程池，且不超过配置上限"""
+        if workers is None:
+            workers = CALCULATION_CONFIG['workers']
+        if scenario_count < CALCULATION_CONFIG['parallel_min_scenarios']:
+            return 1
+        return max(1, min(int(workers), CALCULATION_CONFIG['max_workers']))
@@ -0,0 +1,112 @@
+from config import JOB_CONFIG
+from utils.job_queue import FINISHED_STATES, JobQueue, JobRunner
+from services.flare_system_service import FlareSystemService
+from services.pipe_sizing_service import PipeSizingService
+from services.uncertainty_service import UncertaintyService
+from services.time_series_service import TimeSeriesService
+
+# 任务类型 -> (计算接口, 是否接受 workers 参数)；计算接口均接受 progress 关键字参数
+JOB_TYPES = {
+    "check": (FlareSystemService.check_flare_system, False),
+    "check_batch": (FlareSystemService.check_batch, True),
+    "monte_carlo": (UncertaintyService.analyze, True),
+    "size": (PipeSizingService.size_pipes, False),
+    "time_series": (TimeSeriesService.replay, False)
+}
+
+_job_queue = JobQueue(
+    JOB_CONFIG['database_path'],
+    lease_seconds=JOB_CONFIG['lease_seconds'],
+    max_attempts=JOB_CONFIG['max_attempts'],
+    ttl_seconds=JOB_CONFIG['ttl_seconds'],
+    max_queued=JOB_CONFIG['max_queued']
+)
+
+def _resolve_job(job_type, request, options):
+    func, accepts_workers = JOB_TYPES[job_type]
+    return func, (request, options.get('workers')) if accepts_workers else (request,)
+
+# 任务执行器：生产部署时由 gunicorn post_worker_init 启动，否则在首次提交任务时启动
+job_runner = JobRunner(
+    _job_queue, _resolve_job,
+    workers=JOB_CONFIG['workers'],
+    processes=JOB_CONFIG['workers'] if JOB_CONFIG['offload'] else 0,
+    timeout=JOB_CONFIG['timeout'],
+    poll_interval=JOB_CONFIG['poll_interval']
+)
+
+def _job_not_found(job_id):
+    return {
+        "status": 404,
+        "error_code": "JOB_NOT_FOUND",
+        "message": f"任务 {job_id} 不存在或已过期"
+    }
+
+class JobService:
+    @staticmethod
+    def submit_job(job_type, data, workers=None):
+        """提交异步任务并立即返回任务编号，计算由后台任务线程执行（请求格式同对应的同步接口）"""
+        if job_type not in JOB_TYPES:
+            return {
+                "status": 400,
+                "error_code": "INVALID_INPUT",
+                "message": f"不支持的任务类型: {job_type}，可选 {', '.join(JOB_TYPES)}"
+            }
+
+        job_id = _job_queue.submit(job_type, data, {"workers": workers})
+        if job_id is None:
+            return {
+                "status": 429,
+                "error_code": "TOO_MANY_JOBS",
+                "message": f"排队任务数已达上限 {_job_queue.max_queued}",
+                "retry_after": 30
+            }
+
+        # 未由部署入口启动时（开发服务器等）在本进程的任务线程内执行，此时已有请求线程，不再派生计算进程
+        if not job_runner.started:
+            job_runner.start(processes=0)
+
+        return {
+            "status": 202,
+            "message": "任务已提交",
+            "result": {
+                "job_id": job_id,
+                "type": job_type,
+                "state": "queued"
+            }
+        }
+
+    @staticmethod
+    def get_job(job_id):
+        """任务状态、进度，结束后附带计算结果（同对应同步接口的响应）"""
+        job = _job_queue.get(job_id)
+        if job is None:
+            return _job_not_found(job_id)
+        return {
+            "status": 200,
+            "message": "任务查询成功",
+            "result": job
+        }
+
+    @staticmethod
+    def cancel_job(job_id):
+        """取消任务：排队中的直接取消；执行中的在当前计算阶段（或工况块）结束后停止"""
+        previous = _job_queue.cancel(job_id)
+        if previous is None:
+            return _job_not_found(job_id)
+        if previous in FINISHED_STATES:
+            return {
+                "status": 409,
+                "error_code": "JOB_FINISHED",
+                "message": f"任务 {job_id} 已结束（{previous}），无法取消"
+            }
+        return {
+            "status": 200,
+            "message": "任务已取消" if previous == "queued" else "已请求取消，任务将在当前计算阶段结束后停止",
+            "result": _job_queue.get(job_id)
+        }
+
+    @staticmethod
+    def queue_stats():
+        """各状态任务数"""
+        return _job_queue.stats()
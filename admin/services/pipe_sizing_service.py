@@ -0,0 +1,127 @@
+import time
+import numbers
+import numpy as np
+from config import SIZING_CONFIG
+from utils.data_mapper import InvalidInputError, map_request_to_pipe_store, map_request_to_discharge_store
+from utils.network_topology import compile_network_topology
+from utils.network_solver import LOOPED_NETWORK_UNSUPPORTED, is_looped_network
+from utils.load_aggregator import aggregate_pipe_loads
+from utils.pipe_sizer import PipeSizer
+from utils.mixture_properties import pipe_mixture_properties
+from services.flare_system_service import FlareSystemService
+
+def _invalid_input(message):
+    return {
+        "status": 400,
+        "error_code": "INVALID_INPUT",
+        "message": message
+    }
+
+def _is_positive_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool) and value > 0
+
+class PipeSizingService:
+    @staticmethod
+    def size_pipes(data, progress=None):
+        """管径优化：从标准管径系列中选取满足背压与马赫数要求、管材量最小的管径，并全量复核
+
+        progress 为异步任务的进度记录，进入管径搜索、全量复核时更新当前步骤。
+        """
+        start_time = time.time()
+
+        # 1. 提取系统配置与选型参数
+        system_config = data.get('system_config', {})
+        connection_graph = system_config.get('connection_graph', {})
+        discharge_nodes = system_config.get('discharge_nodes', [])
+        flare_node = system_config.get('flare_node')
+        if not connection_graph or not discharge_nodes or not flare_node:
+            return _invalid_input("系统配置缺少必要参数")
+
+        sizing = data.get('sizing') or {}
+        catalog = sizing.get('catalog', SIZING_CONFIG['diameter_catalog'])
+        max_mach = sizing.get('max_mach', SIZING_CONFIG['max_mach'])
+        fixed_pipes = sizing.get('fixed_pipes', [])
+        if not isinstance(catalog, list) or not catalog or not all(_is_positive_number(d) for d in catalog):
+            return _invalid_input("sizing.catalog 需为正数管径列表")
+        if not _is_positive_number(max_mach):
+            return _invalid_input("sizing.max_mach 需为正数")
+        if not isinstance(fixed_pipes, list):
+            return _invalid_input("sizing.fixed_pipes 需为管道编号列表")
+
+        try:
+            if is_looped_network(connection_graph, flare_node):
+                return _invalid_input(LOOPED_NETWORK_UNSUPPORTED)
+
+            # 2. 按原管径计算一次，得到与管径无关的流量、平均温度、平均分子量
+            topology = compile_network_topology(connection_graph, flare_node)
+            pipe_store = map_request_to_pipe_store(data.get('pipes', []), topology)
+            discharge_store = map_request_to_discharge_store(data.get('discharge_points', []), discharge_nodes)
+            loads = aggregate_pipe_loads(topology, discharge_store)
+            pipe_store, original_qualified, _, _ = FlareSystemService.evaluate_network(
+                pipe_store, discharge_store, connection_graph, flare_node, topology, loads=loads)
+            original_diameter = pipe_store.diameter.copy()
+
+            # 3. 搜索管径
+            if progress is not None:
+                progress.update(phase="sizing")
+            properties = pipe_mixture_properties(loads)
+            sizer = PipeSizer(topology, pipe_store, discharge_store, properties, catalog, max_mach, fixed_pipes)
+            feasible, infeasible_nodes, stats = sizer.solve(max_rounds=SIZING_CONFIG['max_rounds'])
+
+            result = {
+                "feasible": feasible,
+                "original_qualified": original_qualified,
+                "infeasible_nodes": infeasible_nodes,
+                "mach_limited_pipes": [topology.pipe_names[pipe_id] for pipe_id in sizer.mach_limited.tolist()]
+            }
+
+            # 4. 写入选定管径并全量复核
+            if feasible:
+                if progress is not None:
+                    progress.update(phase="verification")
+                sizer.apply(pipe_store)
+                pipe_store, qualified, _, not_satisfied = FlareSystemService.evaluate_network(
+                    pipe_store, discharge_store, connection_graph, flare_node, topology, loads=loads)
+
+                sized_ids = np.flatnonzero(sizer.sized)
+                length = sizer.length[sized_ids]
+                changed = sized_ids[pipe_store.diameter[sized_ids] != original_diameter[sized_ids]]
+                result.update({
+                    "qualified": qualified,
+                    "unsatisfied_nodes": [item[0] for item in not_satisfied],
+                    "material_before": round(float(np.nansum(length * original_diameter[sized_ids])), 2),
+                    "material_after": round(float(np.sum(length * pipe_store.diameter[sized_ids])), 2),
+                    "changed_pipe_count": len(changed),
+                    "pipes": [
+                        {
+                            "pipe_id": pipe.name,
+                            "diameter": pipe.diameter,
+                            "cross_area": pipe.cross_area,
+                            "original_diameter": float(original_diameter[pipe_id]),
+                            "mach_number": pipe.mach_number,
+                            "inlet_pressure": pipe.inlet_pressure
+                        }
+                        for pipe_id, pipe in ((pipe_id, pipe_store[pipe_id]) for pipe_id in sized_ids.tolist())
+                    ]
+                })
+
+            return {
+                "status": 200,
+                "message": "管径优化完成" if feasible else "管径系列内无满足要求的方案",
+                "result": result,
+                "diagnostics": dict(stats, api_version="天哥基础版",
+                                    calculation_cost=round(time.time() - start_time, 3))
+            }
+
+        except KeyError as e:
+            return _invalid_input(str(e.args[0]))
+        except InvalidInputError as e:
+            return _invalid_input(str(e))
+        except Exception as e:
+            # 异常情况返回
+            return {
+                "status": 503,
+                "error_code": "PRESSURE_CALCULATION_FAILED",
+                "message": f"压力计算引擎异常: {str(e)}",
+                "retry_after": 5
+            }
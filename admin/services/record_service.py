@@ -1,17 +1,22 @@
+import base64
 import datetime
-import pymysql
-from config import MYSQL_CONFIG
-import iso8601
+import json
+from config import RECORD_QUERY_CONFIG, RECORD_BATCH_CONFIG
+
+# pymysql、iso8601 与连接池在用到的方法内导入，只做计算的进程启动时不加载
 
 class RecordService:
     @staticmethod
     def get_db_connection():
-        """获取数据库连接"""
-        return pymysql.connect(**MYSQL_CONFIG)
+        """从连接池获取数据库连接，close() 时归还连接池"""
+        from utils.db_pool import get_db_connection
+        return get_db_connection()
         
     @staticmethod
     def save_record(data):
         """保存记录到数据库"""
+        import iso8601
+        import pymysql
         try:
             # 验证记录时间格式
             record_time = data.get('record_time')
@@ -83,28 +88,168 @@ class RecordService:
             }, 500
     
     @staticmethod
-    def get_records():
-        """获取所有历史记录"""
+    def save_records(records):
+        """批量保存记录：一次校验全部记录，分块多行插入，全部在同一事务中提交
+
+        返回的 record_ids 与请求中的记录一一对应。
+        """
+        import iso8601
+        import pymysql
+
+        def invalid(field, message):
+            return {
+                "code": "PARAMETER.INVALID",
+                "message": message,
+                "invalid_field": field
+            }, 400
+
+        try:
+            if not isinstance(records, list) or not records:
+                return invalid("records", "记录列表不能为空")
+            if len(records) > RECORD_BATCH_CONFIG['max_records']:
+                return invalid("records", f"单次最多保存 {RECORD_BATCH_CONFIG['max_records']} 条记录")
+
+            # 一次遍历完成全部校验与时间解析
+            rows = []
+            for index, record in enumerate(records):
+                if not isinstance(record, dict):
+                    return invalid(f"records[{index}]", "记录格式错误")
+                record_time = record.get('record_time')
+                if not record_time:
+                    return invalid(f"records[{index}].record_time", "记录时间不能为空")
+                try:
+                    parsed_time = iso8601.parse_date(record_time)
+                except ValueError:
+                    return invalid(f"records[{index}].record_time", "记录时间格式错误，需符合ISO8601标准")
+                local_path = record.get('local_path')
+                if not local_path:
+                    return invalid(f"records[{index}].local_path", "本地路径不能为空")
+                rows.append((parsed_time, local_path, record.get('remark', '')))
+
+            chunk_size = RECORD_BATCH_CONFIG['chunk_size']
+            record_ids = []
+            conn = RecordService.get_db_connection()
+            try:
+                with conn.cursor() as cursor:
+                    # 单条多行 INSERT 语句分配的自增主键连续（间隔为 auto_increment_increment）
+                    cursor.execute("SELECT @@auto_increment_increment")
+                    increment = cursor.fetchone()[0]
+                    for start in range(0, len(rows), chunk_size):
+                        chunk = rows[start:start + chunk_size]
+                        sql = ("INSERT INTO sys_record (record_time, local_path, remark) VALUES " +
+                               ", ".join(["(%s, %s, %s)"] * len(chunk)))
+                        cursor.execute(sql, [value for row in chunk for value in row])
+                        first_id = cursor.lastrowid
+                        record_ids.extend(first_id + k * increment for k in range(len(chunk)))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+            return {
+                "code": "SUCCESS",
+                "message": "记录批量保存成功",
+                "data": {
+                    "count": len(record_ids),
+                    "record_ids": record_ids,
+                    "created_at": datetime.datetime.now().isoformat() + 'Z'
+                }
+            }, 200
+
+        except pymysql.MySQLError as e:
+            # 数据库错误（整批回滚）
+            return {
+                "code": "DATABASE_ERROR",
+                "message": f"数据库操作失败: {str(e)}"
+            }, 500
+        except Exception as e:
+            # 其他错误
+            return {
+                "code": "INTERNAL_ERROR",
+                "message": f"服务器内部错误: {str(e)}"
+            }, 500
+
+    @staticmethod
+    def parse_record_query(args):
+        """解析历史记录查询参数，返回 (查询条件, 错误)，错误为 None 表示参数合法
+
+        支持 limit、cursor（上一页返回的 next_cursor）、start_time/end_time（ISO8601）与 stream。
+        """
+        import iso8601
+
+        def invalid(field, message):
+            return None, {
+                "error": "PARAMETER.INVALID",
+                "message": message,
+                "invalid_field": field
+            }
+
+        stream = args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+        limit = args.get('limit')
+        if limit is None:
+            # 流式返回默认不限条数
+            limit = None if stream else RECORD_QUERY_CONFIG['default_limit']
+        else:
+            try:
+                limit = int(limit)
+            except ValueError:
+                return invalid('limit', "limit 必须为正整数")
+            if limit <= 0:
+                return invalid('limit', "limit 必须为正整数")
+            if not stream:
+                limit = min(limit, RECORD_QUERY_CONFIG['max_limit'])
+
+        query = {"limit": limit, "stream": stream, "cursor": None, "start_time": None, "end_time": None}
+        for field in ('start_time', 'end_time'):
+            value = args.get(field)
+            if value:
+                try:
+                    query[field] = iso8601.parse_date(value)
+                except ValueError:
+                    return invalid(field, f"{field} 格式错误，需符合ISO8601标准")
+
+        cursor = args.get('cursor')
+        if cursor:
+            try:
+                query['cursor'] = decode_record_cursor(cursor)
+            except (ValueError, TypeError):
+                return invalid('cursor', "cursor 无效")
+
+        return query, None
+
+    @staticmethod
+    def get_records(query=None):
+        """按记录时间倒序分页获取历史记录（键集分页，使用 idx_record_time 索引）"""
+        import pymysql
+        if query is None:
+            query, _ = RecordService.parse_record_query({})
+        limit = query['limit']
+
         try:
             conn = RecordService.get_db_connection()
             try:
                 with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-                    sql = """
-                    SELECT id, record_time, local_path, remark
-                    FROM sys_record
-                    ORDER BY record_time DESC
-                    """
-                    cursor.execute(sql)
+                    # 多取一条判断是否还有下一页
+                    sql, params = build_record_query(query, limit + 1)
+                    cursor.execute(sql, params)
                     records = cursor.fetchall()
-                    
-                    # 处理日期格式转为ISO8601
-                    for record in records:
-                        if isinstance(record['record_time'], datetime.datetime):
-                            record['record_time'] = record['record_time'].isoformat() + 'Z'
+
+                has_more = len(records) > limit
+                records = records[:limit]
+                next_cursor = encode_record_cursor(records[-1]) if has_more else None
+
+                # 处理日期格式转为ISO8601
+                for record in records:
+                    format_record(record)
                 
                 # 返回记录列表
                 return {
-                    "data": records
+                    "data": records,
+                    "has_more": has_more,
+                    "next_cursor": next_cursor
                 }, 200
             finally:
                 conn.close()
@@ -120,4 +265,85 @@ class RecordService:
             return {
                 "error": "INTERNAL_ERROR",
                 "message": f"服务器内部错误: {str(e)}"
-            }, 500 
\ No newline at end of file
+            }, 500
+
+    @staticmethod
+    def stream_records(query):
+        """以 NDJSON 逐行生成历史记录，使用非缓冲服务端游标，内存占用与表大小无关
+
+        连接在生成器结束时归还；客户端中途断开时直接关闭连接，不读取剩余结果。
+        """
+        import pymysql
+        batch_rows = RECORD_QUERY_CONFIG['stream_batch_rows']
+        finished = False
+        try:
+            conn = RecordService.get_db_connection()
+        except pymysql.MySQLError as e:
+            yield json.dumps({"error": "DATABASE_ERROR", "message": f"数据库查询失败: {str(e)}"}, ensure_ascii=False) + "\n"
+            return
+
+        try:
+            cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+            sql, params = build_record_query(query, query['limit'])
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                yield "".join(json.dumps(format_record(row), ensure_ascii=False) + "\n" for row in rows)
+            cursor.close()
+            finished = True
+        except pymysql.MySQLError as e:
+            # 响应头已发出，错误作为最后一行返回
+            yield json.dumps({"error": "DATABASE_ERROR", "message": f"数据库查询失败: {str(e)}"}, ensure_ascii=False) + "\n"
+        finally:
+            if finished:
+                conn.close()
+            else:
+                conn.discard()
+
+def build_record_query(query, limit=None):
+    """构建历史记录查询 SQL：时间范围过滤 + (record_time, id) 键集分页，按时间倒序
+
+    InnoDB 二级索引 idx_record_time 隐含主键 id，排序与分页条件均可直接走索引。
+    """
+    conditions = []
+    params = []
+    if query.get('start_time') is not None:
+        conditions.append("record_time >= %s")
+        params.append(query['start_time'])
+    if query.get('end_time') is not None:
+        conditions.append("record_time <= %s")
+        params.append(query['end_time'])
+    if query.get('cursor') is not None:
+        cursor_time, cursor_id = query['cursor']
+        conditions.append("(record_time < %s OR (record_time = %s AND id < %s))")
+        params.extend([cursor_time, cursor_time, cursor_id])
+
+    sql = "SELECT id, record_time, local_path, remark FROM sys_record"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY record_time DESC, id DESC"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql, params
+
+def format_record(record):
+    """记录时间转为 ISO8601 字符串"""
+    if isinstance(record['record_time'], datetime.datetime):
+        record['record_time'] = record['record_time'].isoformat() + 'Z'
+    return record
+
+def encode_record_cursor(record):
+    """分页游标：最后一条记录的 (record_time, id)，URL 安全的 base64 编码"""
+    record_time = record['record_time']
+    if isinstance(record_time, datetime.datetime):
+        record_time = record_time.isoformat()
+    payload = json.dumps([record_time, record['id']], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_record_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    record_time, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    return datetime.datetime.fromisoformat(record_time), int(record_id)
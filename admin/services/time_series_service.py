@@ -0,0 +1,129 @@
+import time
+import numbers
+import numpy as np
+from config import TIME_SERIES_CONFIG
+from utils.data_mapper import InvalidInputError, map_request_to_discharge_params, map_request_to_pipe_store
+from utils.network_topology import compile_network_topology
+from utils.network_solver import LOOPED_NETWORK_UNSUPPORTED, is_looped_network
+from utils.network_evaluator import compile_network, idle_discharge_points
+from utils.time_series import (PROFILE_FIELDS, ExceedanceTracker, build_time_series_loads,
+                               evaluate_time_steps, time_series_backpressure)
+
+def _invalid_input(message):
+    return {
+        "status": 400,
+        "error_code": "INVALID_INPUT",
+        "message": message
+    }
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+class TimeSeriesService:
+    @staticmethod
+    def replay(data, progress=None):
+        """时间序列泄放回放：按时间步依次计算背压，返回各泄放点峰值背压及超限时间
+
+        输入未变化的管道沿用最近一次求解的摩擦系数与压比；其余管道按块求解（时间步数 × 管道数不超过 chunk_elements 时只有一块）。
+        progress 为异步任务的进度记录，每块时间步完成后更新已完成时间步数。
+        """
+        start_time = time.time()
+
+        # 1. 提取系统配置与时间序列
+        system_config = data.get('system_config', {})
+        connection_graph = system_config.get('connection_graph', {})
+        discharge_nodes = system_config.get('discharge_nodes', [])
+        flare_node = system_config.get('flare_node')
+        if not connection_graph or not discharge_nodes or not flare_node:
+            return _invalid_input("系统配置缺少必要参数")
+
+        options = data.get('time_series') or {}
+        times = options.get('times')
+        profiles = options.get('profiles') or {}
+        tolerance = options.get('tolerance', TIME_SERIES_CONFIG['change_tolerance'])
+        max_steps = TIME_SERIES_CONFIG['max_steps']
+        if not isinstance(times, list) or not 1 <= len(times) <= max_steps \
+                or not all(_is_number(t) and np.isfinite(t) for t in times):
+            return _invalid_input(f"time_series.times 需为 1 到 {max_steps} 个时刻组成的数值列表")
+        if any(later <= earlier for earlier, later in zip(times, times[1:])):
+            return _invalid_input("time_series.times 需严格递增")
+        if not _is_number(tolerance) or not 0 <= tolerance < 1:
+            return _invalid_input("time_series.tolerance 需在 [0, 1) 内")
+        if not isinstance(profiles, dict):
+            return _invalid_input("time_series.profiles 需为 节点 -> 参数曲线 的映射")
+        for node, profile in profiles.items():
+            if not isinstance(profile, dict):
+                return _invalid_input(f"节点 {node} 的参数曲线需为 参数 -> 各时刻取值 的映射")
+            for field, values in profile.items():
+                if field not in PROFILE_FIELDS:
+                    return _invalid_input(f"不支持的时间序列参数: {field}，可选 {', '.join(PROFILE_FIELDS)}")
+                if not isinstance(values, list) or len(values) != len(times) \
+                        or not all(_is_number(value) for value in values):
+                    return _invalid_input(f"节点 {node} 的 {field} 需为与 times 等长的数值列表")
+
+        try:
+            if is_looped_network(connection_graph, flare_node):
+                return _invalid_input(LOOPED_NETWORK_UNSUPPORTED)
+
+            # 2. 编译管网，构建时间步矩阵
+            topology = compile_network_topology(connection_graph, flare_node)
+            pipe_store = map_request_to_pipe_store(data.get('pipes', []), topology)
+            network = compile_network(connection_graph, flare_node, discharge_nodes, pipe_store, topology=topology)
+            base_params = map_request_to_discharge_params(data.get('discharge_points', []))
+            step_count = len(times)
+            loads = build_time_series_loads(network, base_params, profiles, step_count)
+
+            # 3. 按时间顺序分块计算，块间传递各管道状态（块大小受 时间步数 × 管道数 限制）
+            chunk_size = max(1, TIME_SERIES_CONFIG['chunk_elements'] // max(1, network.pipe_count))
+            tracker = ExceedanceTracker(times, network.discharge_count)
+            state = None
+            stats = {"pipe_steps": 0, "solved_pipe_steps": 0, "colebrook_iterations": 0,
+                     "pressure_ratio_iterations": 0}
+            if progress is not None:
+                progress.update(steps_done=0, steps_total=step_count)
+            for start in range(0, step_count, chunk_size):
+                stop = min(start + chunk_size, step_count)
+                chunk = loads.rows(start, stop)
+                inlet_pressure, state, chunk_stats = evaluate_time_steps(network, chunk, state, tolerance)
+                tracker.add(start, *time_series_backpressure(network, chunk, inlet_pressure), idle_discharge_points(chunk))
+                for key, value in chunk_stats.items():
+                    stats[key] += value
+                if progress is not None:
+                    progress.update(steps_done=stop)
+
+            nodes = tracker.summary(network.discharge_nodes, loads.max_backpressure[0])
+            exceeded_nodes = [node for node, result in nodes.items() if result["exceeded"]]
+
+            return {
+                "status": 200,
+                "message": "时间序列回放完成",
+                "result": {
+                    "qualified": not exceeded_nodes,
+                    "step_count": step_count,
+                    "start_time": float(times[0]),
+                    "end_time": float(times[-1]),
+                    "discharge_point_count": network.discharge_count,
+                    "exceeded_nodes": exceeded_nodes,
+                    "nodes": nodes
+                },
+                "diagnostics": {
+                    "api_version": "天哥基础版",
+                    "calculation_cost": round(time.time() - start_time, 3),
+                    "tolerance": tolerance,
+                    "pipe_steps": stats["pipe_steps"],
+                    "solved_pipe_steps": stats["solved_pipe_steps"],
+                    "colebrook_iterations": stats["colebrook_iterations"],
+                    "pressure_ratio_iterations": stats["pressure_ratio_iterations"]
+                }
+            }
+
+        except InvalidInputError as e:
+            return _invalid_input(str(e))
+        except Exception as e:
+            # 异常情况返回
+            return {
+                "status": 503,
+                "error_code": "PRESSURE_CALCULATION_FAILED",
+                "message": f"压力计算引擎异常: {str(e)}",
+                "retry_after": 5
+            }
@@ -0,0 +1,172 @@
+import time
+import numbers
+import numpy as np
+from config import MONTE_CARLO_CONFIG
+from utils.data_mapper import InvalidInputError, map_request_to_discharge_params, map_request_to_pipe_store
+from utils.network_topology import compile_network_topology
+from utils.network_solver import LOOPED_NETWORK_UNSUPPORTED, is_looped_network
+from utils.network_evaluator import compile_network, build_scenario_loads, idle_discharge_points
+from utils.parallel_executor import iter_scenario_chunks
+from utils.uncertainty import UNCERTAIN_FIELDS, sampling_dimensions, build_sampled_loads, rank_correlations
+from utils.vectorized_solver import to_optional_list
+from services.flare_system_service import FlareSystemService
+
+def _invalid_input(message):
+    return {
+        "status": 400,
+        "error_code": "INVALID_INPUT",
+        "message": message
+    }
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+class UncertaintyService:
+    @staticmethod
+    def analyze(data, workers=None, progress=None):
+        """蒙特卡洛不确定性分析：拉丁超立方抽样扰动泄放点参数与管道粗糙度，全部样本按矩阵批量计算
+
+        返回各泄放点超过允许背压的概率、背压分位数及 Spearman 秩相关敏感性排序。
+        progress 为异步任务的进度记录，每块样本完成后更新已完成样本数。
+        """
+        start_time = time.time()
+
+        # 1. 提取系统配置与抽样参数
+        system_config = data.get('system_config', {})
+        connection_graph = system_config.get('connection_graph', {})
+        discharge_nodes = system_config.get('discharge_nodes', [])
+        flare_node = system_config.get('flare_node')
+        if not connection_graph or not discharge_nodes or not flare_node:
+            return _invalid_input("系统配置缺少必要参数")
+
+        options = data.get('monte_carlo') or {}
+        sample_count = options.get('samples', MONTE_CARLO_CONFIG['default_samples'])
+        seed = options.get('seed')
+        uncertainty = dict(MONTE_CARLO_CONFIG['uncertainty'], **(options.get('uncertainty') or {}))
+        if not isinstance(sample_count, int) or not 2 <= sample_count <= MONTE_CARLO_CONFIG['max_samples']:
+            return _invalid_input(f"monte_carlo.samples 需为 2 到 {MONTE_CARLO_CONFIG['max_samples']} 之间的整数")
+        if seed is not None and (not isinstance(seed, int) or seed < 0):
+            return _invalid_input("monte_carlo.seed 需为非负整数")
+        for field, value in uncertainty.items():
+            if field not in UNCERTAIN_FIELDS:
+                return _invalid_input(f"不支持的不确定参数: {field}")
+            if not _is_number(value) or not 0 <= value < 1:
+                return _invalid_input(f"参数 {field} 的相对不确定度需在 [0, 1) 内")
+        if seed is None:
+            # 未指定时随机生成并在结果中返回，便于复现
+            seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+
+        try:
+            if is_looped_network(connection_graph, flare_node):
+                return _invalid_input(LOOPED_NETWORK_UNSUPPORTED)
+
+            # 2. 编译管网，构建基准工况并抽样
+            topology = compile_network_topology(connection_graph, flare_node)
+            pipe_store = map_request_to_pipe_store(data.get('pipes', []), topology)
+            network = compile_network(connection_graph, flare_node, discharge_nodes, pipe_store, topology=topology)
+            base_params = map_request_to_discharge_params(data.get('discharge_points', []))
+            base_loads = build_scenario_loads(network, base_params, [{}])
+
+            # 抽样矩阵、工况矩阵与全部样本的结果均随 样本数 ×（维数 + 泄放点数）增长，超过上限时拒绝
+            per_sample = len(sampling_dimensions(network, base_loads, uncertainty)[0]) + network.discharge_count
+            max_elements = MONTE_CARLO_CONFIG['max_sample_elements']
+            if sample_count * per_sample > max_elements:
+                return _invalid_input(
+                    f"样本数 × (不确定参数维数 + 泄放点数) = {sample_count * per_sample}，超过上限 {max_elements}，"
+                    f"当前管网最多 {max(max_elements // per_sample, 0)} 个样本")
+            loads, dimensions, input_ranks = build_sampled_loads(network, base_loads, uncertainty, sample_count, seed)
+
+            # 3. 分块矩阵计算（块大小受 样本数 × 管道数 限制）
+            workers = FlareSystemService.resolve_workers(workers, sample_count)
+            chunk_size = max(1, MONTE_CARLO_CONFIG['chunk_elements'] // max(1, network.pipe_count))
+            if workers > 1:
+                chunk_size = min(chunk_size, -(-sample_count // (workers * 4)))
+            evaluation_start = time.time()
+            qualified = np.zeros(sample_count, dtype=bool)
+            backpressure = np.empty(loads.flow_rate.shape)
+            margin = np.empty(loads.flow_rate.shape)
+            if progress is not None:
+                progress.update(samples_done=0, samples_total=sample_count)
+            for start, stop, chunk_qualified, chunk_backpressure, chunk_margin in \
+                    iter_scenario_chunks(network, loads, workers, chunk_size):
+                qualified[start:stop] = chunk_qualified
+                backpressure[start:stop] = chunk_backpressure
+                margin[start:stop] = chunk_margin
+                if progress is not None:
+                    progress.update(samples_done=stop)
+            evaluation_cost = time.time() - evaluation_start
+
+            # 4. 各泄放点统计：超限概率（含未求得入口压力）与背压分位数
+            exceeded = ~(margin >= 0)
+            with np.errstate(invalid='ignore'):
+                relative_margin = margin / loads.max_backpressure
+            solved = ~np.isnan(backpressure)
+            ever_solved = solved.any(axis=0)
+            percentiles = np.full((3, network.discharge_count), np.nan)
+            for col in np.flatnonzero(ever_solved):
+                values = backpressure[solved[:, col], col]
+                percentiles[:, col] = np.percentile(values, [50, 95, 100])
+            p50, p95, p_max = (to_optional_list(row, 2) for row in percentiles)
+
+            # 5. 敏感性：各输入与各泄放点相对裕量（及全系统最小相对裕量）的秩相关
+            # 全系统取各泄放点最小相对裕量，始终求不出入口压力的泄放点不参与
+            system_margin = np.full(sample_count, np.nan)
+            if ever_solved.any():
+                system_margin = np.where(np.isnan(relative_margin[:, ever_solved]), -np.inf,
+                                         relative_margin[:, ever_solved]).min(axis=1)
+            outputs = np.column_stack([relative_margin, system_margin])
+            correlations = rank_correlations(input_ranks, outputs) if dimensions else np.empty((0, outputs.shape[1]))
+
+            def drivers(column, limit=None):
+                ranked = [k for k in np.argsort(-np.abs(np.nan_to_num(correlations[:, column])), kind="stable")
+                          if not np.isnan(correlations[k, column])]
+                return [{"parameter": dimensions[k][0], "node_id": dimensions[k][1],
+                         "correlation": round(float(correlations[k, column]), 4)}
+                        for k in ranked[:limit]]
+
+            top_drivers = MONTE_CARLO_CONFIG['top_drivers']
+            exceedance = exceeded.mean(axis=0)
+            idle_probability = idle_discharge_points(loads).mean(axis=0)
+            nodes = {
+                node: {
+                    "exceedance_probability": round(float(exceedance[col]), 6),
+                    "idle_probability": round(float(idle_probability[col]), 6),
+                    "backpressure_p50": p50[col],
+                    "backpressure_p95": p95[col],
+                    "backpressure_max": p_max[col],
+                    "drivers": drivers(col, top_drivers)
+                }
+                for col, node in enumerate(network.discharge_nodes)
+            }
+
+            return {
+                "status": 200,
+                "message": "不确定性分析完成",
+                "result": {
+                    "sample_count": sample_count,
+                    "seed": seed,
+                    "uncertainty": uncertainty,
+                    "failure_probability": round(float(1 - qualified.mean()), 6),
+                    "discharge_point_count": network.discharge_count,
+                    "nodes": nodes,
+                    "sensitivity": drivers(network.discharge_count)
+                },
+                "diagnostics": {
+                    "api_version": "天哥基础版",
+                    "calculation_cost": round(time.time() - start_time, 3),
+                    "evaluation_cost": round(evaluation_cost, 3),
+                    "dimensions": len(dimensions),
+                    "workers": workers
+                }
+            }
+
+        except InvalidInputError as e:
+            return _invalid_input(str(e))
+        except Exception as e:
+            # 异常情况返回
+            return {
+                "status": 503,
+                "error_code": "PRESSURE_CALCULATION_FAILED",
+                "message": f"压力计算引擎异常: {str(e)}",
+                "retry_after": 5
+            }
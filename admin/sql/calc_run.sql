@@ -0,0 +1,15 @@
+-- 计算结果表：逐管道结果以压缩列式二进制保存，按管网哈希与工况哈希索引
+CREATE TABLE IF NOT EXISTS `calc_run` (
+  `id` bigint(20) unsigned NOT NULL AUTO_INCREMENT COMMENT '主键',
+  `record_id` bigint(20) unsigned DEFAULT NULL COMMENT '关联的 sys_record 记录',
+  `network_hash` char(64) NOT NULL COMMENT '管网（system_config + pipes）哈希',
+  `scenario_hash` char(64) NOT NULL COMMENT '泄放工况（discharge_points）哈希',
+  `qualified` tinyint(1) NOT NULL COMMENT '是否满足背压要求',
+  `pipe_count` int(10) unsigned NOT NULL COMMENT '管道数',
+  `discharge_point_count` int(10) unsigned NOT NULL COMMENT '泄放点数',
+  `result_blob` longblob NOT NULL COMMENT '压缩的逐管道计算结果（列式）',
+  `created_at` datetime(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+  PRIMARY KEY (`id`),
+  KEY `idx_run_hash` (`network_hash`, `scenario_hash`, `created_at`),
+  KEY `idx_record_id` (`record_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='计算结果表';
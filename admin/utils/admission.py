@@ -0,0 +1,147 @@
+import math
+import threading
+from utils.data_mapper import is_columnar
+
+# 准入控制拒绝请求时的错误码（响应附带 Retry-After）
+ADMISSION_ERROR_CODES = ("TOO_MANY_REQUESTS", "SERVICE_OVERLOADED")
+
+def estimate_request_cost(data):
+    """按管道数估算单工况校验的计算成本（至少为1）"""
+    pipes = data.get('pipes') if isinstance(data, dict) else None
+    if is_columnar(pipes):
+        pipe_ids = pipes.get('pipe_id')
+        count = len(pipe_ids) if isinstance(pipe_ids, list) else 0
+    else:
+        count = len(pipes) if isinstance(pipes, list) else 0
+    return max(1, count)
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """相同键的并发调用合并为一次执行，等待中的调用共享其结果（或异常）"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, func, *args, **kwargs):
+        """执行 func(*args, **kwargs)，返回 (结果, 是否共享了其他调用的结果)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+class AdmissionRejected(Exception):
+    """准入控制拒绝：status 为 429（队列已满）或 503（预计等待超过计算超时），retry_after 为建议重试间隔（秒）"""
+
+    def __init__(self, status, error_code, message, retry_after, queue):
+        super().__init__(message)
+        self.status = status
+        self.error_code = error_code
+        self.message = message
+        self.retry_after = retry_after
+        self.queue = queue
+
+class AdmissionController:
+    """有界计算队列：按成本（管道数）记录已准入、未完成的请求，以实测吞吐量估算排队时间
+
+    吞吐量为单个计算进程每秒处理的管道数，按已完成计算的 管道数 / 计算耗时 指数平滑。
+    队列为空时总是准入（单个请求超过上限时交由计算超时处理）。
+    """
+
+    def __init__(self, max_pending, max_pending_cost, max_wait, initial_rate, smoothing=0.2):
+        self.max_pending = max_pending
+        self.max_pending_cost = max_pending_cost
+        self.max_wait = max_wait
+        self.rate = float(initial_rate)
+        self.smoothing = smoothing
+        self.pending = 0
+        self.pending_cost = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _queue_state(self):
+        return {
+            "pending": self.pending,
+            "pending_pipes": self.pending_cost,
+            "pipes_per_second": round(self.rate, 1)
+        }
+
+    def admit(self, cost, concurrency=1):
+        """准入一个成本为 cost 的请求并返回 cost（完成后传给 release）；拒绝时抛出 AdmissionRejected"""
+        concurrency = max(1, concurrency)
+        with self._lock:
+            if self.pending > 0:
+                throughput = self.rate * concurrency
+                # 队列已满：等待排在前面的计算完成到足以容纳本请求
+                if self.pending >= self.max_pending or self.pending_cost + cost > self.max_pending_cost:
+                    drain = self.pending_cost + cost - self.max_pending_cost
+                    if self.pending >= self.max_pending:
+                        drain = max(drain, self.pending_cost / self.pending)
+                    self.rejected += 1
+                    raise AdmissionRejected(
+                        429, "TOO_MANY_REQUESTS",
+                        f"计算队列已满（{self.pending} 个请求，共 {self.pending_cost} 根管道）",
+                        max(1, math.ceil(drain / throughput)), self._queue_state())
+
+                # 排队 + 自身计算的预计耗时超过计算超时：准入后也只会超时
+                estimated = self.pending_cost / throughput + cost / self.rate
+                if self.max_wait and estimated > self.max_wait:
+                    self.rejected += 1
+                    raise AdmissionRejected(
+                        503, "SERVICE_OVERLOADED",
+                        f"预计排队与计算耗时 {estimated:.1f} 秒，超过计算超时 {self.max_wait} 秒",
+                        max(1, math.ceil(estimated - self.max_wait)), self._queue_state())
+
+            self.pending += 1
+            self.pending_cost += cost
+            self.admitted += 1
+        return cost
+
+    def release(self, cost, elapsed=None):
+        """请求完成；elapsed 为实际计算耗时（秒），用于更新吞吐量估计（None 时不更新）"""
+        with self._lock:
+            self.pending -= 1
+            self.pending_cost -= cost
+            if elapsed and elapsed > 0:
+                self.rate += self.smoothing * (cost / elapsed - self.rate)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._queue_state(), admitted=self.admitted, rejected=self.rejected)
+
+def admission_rejected_response(rejection):
+    return {
+        "status": rejection.status,
+        "error_code": rejection.error_code,
+        "message": rejection.message,
+        "retry_after": rejection.retry_after,
+        "queue": rejection.queue
+    }
@@ -0,0 +1,131 @@
+import atexit
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+class CalculationTimeout(BaseException):
+    """计算超时
+
+    继承 BaseException：各服务以 except Exception 把计算异常转为 503，超时需穿过这些处理直达调用方。
+    """
+
+class CalculationProcessFailed(Exception):
+    """计算进程异常退出（如被系统终止），进程池已重建，在途计算需重新提交"""
+
+def _raise_timeout(signum, frame):
+    raise CalculationTimeout()
+
+def _run_with_deadline(timeout, func, args, kwargs):
+    """计算进程内执行 func，超过 timeout 秒由 SIGALRM 中断（计算进程只在主线程执行任务）
+
+    信号在 Python 字节码之间处理，单次耗时较长的 NumPy 调用需执行完才会中断。
+    """
+    if not timeout or not hasattr(signal, 'setitimer'):
+        return func(*args, **kwargs)
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _init_calculation_process():
+    """计算进程忽略 SIGINT（终端 Ctrl+C 会发给整个进程组），由所在 Web 进程统一关闭"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _ready():
+    return True
+
+class CalculationExecutor:
+    """计算进程池：CPU 密集的计算接口在独立进程中执行，Web 进程的请求线程只等待结果，
+    历史记录等 I/O 接口不会排在长时间计算之后（也不与计算争用 GIL）
+
+    未启动时 run() 直接在调用线程内执行（开发服务器、命令行工具）。
+    """
+
+    def __init__(self):
+        self.processes = 0
+        self.timeout = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def offloading(self):
+        return self._pool is not None
+
+    def start(self, processes, timeout=None):
+        """创建进程池并立即派生全部计算进程
+
+        应在 Web 工作进程开始处理请求之前调用（如 gunicorn post_worker_init），
+        此时进程内还没有请求线程，fork 出的计算进程直接继承已预热的计算模块。
+        """
+        with self._lock:
+            if self._pool is not None or processes <= 0:
+                return
+            context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+            self._pool = ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                             initializer=_init_calculation_process)
+            self.processes = processes
+            self.timeout = timeout
+            # fork 方式在首次提交任务时一次派生全部进程
+            self._pool.submit(_ready).result()
+        atexit.register(self.shutdown)
+
+    def run(self, func, *args, **kwargs):
+        """执行 func(*args, **kwargs) 并返回结果；超过 timeout 秒抛出 CalculationTimeout，
+        计算进程异常退出时重建进程池并抛出 CalculationProcessFailed
+
+        func 与参数、返回值需可序列化（模块级函数或类的静态方法）。
+        """
+        pool = self._pool
+        if pool is None:
+            return func(*args, **kwargs)
+        try:
+            future = pool.submit(_run_with_deadline, self.timeout, func, args, kwargs)
+            # 计算进程内已按 timeout 中断，这里多等待一段时间兜底（如排队、不支持 SIGALRM 的平台）
+            return future.result(timeout=None if self.timeout is None else self.timeout * 2 + 5)
+        except FutureTimeoutError:
+            future.cancel()
+            raise CalculationTimeout()
+        except BrokenProcessPool:
+            self._restart(pool)
+            raise CalculationProcessFailed()
+
+    def _restart(self, broken):
+        """以新进程池替换已损坏的进程池（其他线程已替换或已关闭时跳过）
+
+        此时 Web 进程内已有请求线程，fork 可能继承其他线程持有的锁，新进程池改用 spawn 方式派生。
+        """
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_calculation_process)
+        broken.shutdown(wait=False)
+
+    def shutdown(self, wait=True):
+        """关闭进程池：不再接受新任务，wait=True 时等待在途计算完成"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+calculation_executor = CalculationExecutor()
+
+def calculation_timeout_response(timeout):
+    return {
+        "status": 504,
+        "error_code": "CALCULATION_TIMEOUT",
+        "message": f"计算超时（超过 {timeout} 秒）"
+    }
+
+def calculation_process_failed_response():
+    return {
+        "status": 503,
+        "error_code": "CALCULATION_PROCESS_FAILED",
+        "message": "计算进程异常退出，已重新启动计算进程，请稍后重试",
+        "retry_after": 5
+    }
@@ -1,14 +1,30 @@
-def map_request_to_pipe_params(pipes_data):
-    """将请求中的管道数据映射到内部管道参数格式"""
+import numbers
+import numpy as np
+from models.network_store import PipeStore, DischargeStore
+
+# 火炬装置出口压力，100kPa，固定值
+FLARE_OUTLET_PRESSURE = 100000
+
+# 请求中给出的管道参数字段
+PIPE_INPUT_FIELDS = ("equivalent_length", "diameter", "roughness", "cross_area")
+
+class InvalidInputError(ValueError):
+    """请求数据格式错误（列缺失、列长度不一致、参数非数值等），各服务返回 400 INVALID_INPUT"""
+
+def map_request_to_pipe_params(pipes_data, flare_node=None):
+    """将请求中的管道数据映射到内部管道参数格式
+
+    火炬出口压力设置在首段接入火炬节点的管道上；未传入 flare_node 时火炬节点按 e 处理。
+    """
     pipe_params = {}
-    
-    for pipe in pipes_data:
+
+    for pipe in _records(pipes_data, "pipe_id"):
         pipe_id = pipe.get("pipe_id")
         pipe_params[pipe_id] = {
-            "equivalent_length": pipe.get("equivalent_length"),
-            "diameter": pipe.get("diameter"),
-            "roughness": pipe.get("roughness"),
-            "cross_area": pipe.get("cross_area"),
+            "equivalent_length": _number(pipe.get("equivalent_length"), "管道参数 equivalent_length"),
+            "diameter": _number(pipe.get("diameter"), "管道参数 diameter"),
+            "roughness": _number(pipe.get("roughness"), "管道参数 roughness"),
+            "cross_area": _number(pipe.get("cross_area"), "管道参数 cross_area"),
             "outlet_pressure": None,  # 需要计算
             "flow_rate": None,        # 需要计算
             "avg_temperature": None,  # 需要计算
@@ -21,29 +37,121 @@ def map_request_to_pipe_params(pipes_data):
     
     # 设置火炬装置出口压力
     flare_pipe_id = None
+    flare_suffix = f"->{flare_node}" if flare_node is not None else "->e"
     for pipe_id in pipe_params:
-        if pipe_id.endswith("->e"):  # 假设e为火炬节点，可根据实际情况调整
+        if pipe_id.endswith(flare_suffix):
             flare_pipe_id = pipe_id
             break
     
     if flare_pipe_id:
-        pipe_params[flare_pipe_id]["outlet_pressure"] = 100000  # 100kPa，固定值
+        pipe_params[flare_pipe_id]["outlet_pressure"] = FLARE_OUTLET_PRESSURE
         
     return pipe_params
 
 def map_request_to_discharge_params(discharge_points_data):
     """将请求中的泄放点数据映射到内部泄放点参数格式"""
     discharge_params = {}
-    
-    for point in discharge_points_data:
+
+    # 列式数据（字段名 -> 数组）先转为逐点记录，泄放点数量少，转换开销可忽略
+    for point in _records(discharge_points_data, "node_id"):
         node_id = point.get("node_id")
         discharge_params[node_id] = {
-            "flow_rate": point.get("flow_rate"),
-            "pressure": point.get("pressure"),
-            "temperature": point.get("temperature"),
-            "molecular_weight": point.get("molecular_weight"),
-            "max_backpressure": point.get("max_backpressure"),
-            "viscosity": point.get("viscosity")
+            "flow_rate": _number(point.get("flow_rate"), "泄放点参数 flow_rate"),
+            "pressure": _number(point.get("pressure"), "泄放点参数 pressure"),
+            "temperature": _number(point.get("temperature"), "泄放点参数 temperature"),
+            "molecular_weight": _number(point.get("molecular_weight"), "泄放点参数 molecular_weight"),
+            "max_backpressure": _number(point.get("max_backpressure"), "泄放点参数 max_backpressure"),
+            "viscosity": _number(point.get("viscosity"), "泄放点参数 viscosity")
         }
         
-    return discharge_params 
\ No newline at end of file
+    return discharge_params
+
+def is_columnar(section):
+    """列式数据为 字段名 -> 数组 的字典，逐条记录格式为列表"""
+    return isinstance(section, dict)
+
+def _column_length(columns, key_field):
+    keys = columns.get(key_field)
+    if not isinstance(keys, list):
+        raise InvalidInputError(f"列式数据缺少 {key_field} 列")
+    for field, values in columns.items():
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise InvalidInputError(f"列 {field} 长度与 {key_field} 列不一致")
+    return len(keys)
+
+def _columns_to_rows(columns, key_field):
+    count = _column_length(columns, key_field)
+    fields = list(columns)
+    return [{field: columns[field][i] for field in fields} for i in range(count)]
+
+def _records(section, key_field):
+    """逐条记录列表；列式数据先转为逐条记录"""
+    if is_columnar(section):
+        return _columns_to_rows(section, key_field)
+    if not isinstance(section, list) or not all(isinstance(row, dict) for row in section):
+        raise InvalidInputError(f"数据须为逐条记录列表或以 {key_field} 为键列的列式数据")
+    return section
+
+def _number(value, label):
+    """参数值须为数值或缺省（None），数值字符串按 PipeStore 的规则转为 float"""
+    if value is None or (isinstance(value, numbers.Real) and not isinstance(value, bool)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise InvalidInputError(f"{label} 必须为数值")
+
+def map_request_to_pipe_store(pipes_data, topology):
+    """管道数据直接装入按拓扑管道编号排列的 PipeStore，不构建中间参数字典
+
+    pipes_data 可为逐条记录列表，或列式数据 {"pipe_id": [...], "diameter": [...], ...}。
+    不在管网中的管道忽略，重复的管道以最后一条为准；火炬出口压力设置在接入火炬节点的首段管道上。
+    """
+    pipe_index = topology.pipe_index
+    pipe_count = topology.pipe_count
+
+    if is_columnar(pipes_data):
+        count = _column_length(pipes_data, "pipe_id")
+        rows = np.fromiter((pipe_index.get(pipe_id, -1) for pipe_id in pipes_data["pipe_id"]),
+                           dtype=np.intp, count=count)
+        def values(field):
+            return pipes_data.get(field, [None] * count)
+    else:
+        pipes_data = _records(pipes_data, "pipe_id")
+        rows = np.fromiter((pipe_index.get(pipe.get("pipe_id"), -1) for pipe in pipes_data),
+                           dtype=np.intp, count=len(pipes_data))
+        def values(field):
+            return [pipe.get(field) for pipe in pipes_data]
+
+    known = rows >= 0
+    target = rows[known]
+    columns = {}
+    for field in PIPE_INPUT_FIELDS:
+        column = np.full(pipe_count, np.nan)
+        try:
+            column[target] = np.asarray(values(field), dtype=float)[known]
+        except (TypeError, ValueError):
+            raise InvalidInputError(f"管道参数 {field} 必须为数值")
+        columns[field] = column
+
+    # 火炬出口压力：取请求中给出的、接入火炬节点的首段管道
+    outlet_pressure = np.full(pipe_count, np.nan)
+    provided = np.zeros(pipe_count, dtype=bool)
+    provided[target] = True
+    flare_pipe = next((pipe_id for pipe_id in topology.node_inlet_pipes[topology.flare_index] if provided[pipe_id]), None)
+    if flare_pipe is not None:
+        outlet_pressure[flare_pipe] = FLARE_OUTLET_PRESSURE
+    columns["outlet_pressure"] = outlet_pressure
+
+    return PipeStore(topology.pipe_names, columns)
+
+def map_request_to_discharge_store(discharge_points_data, discharge_nodes):
+    """泄放点数据（逐条记录或列式）直接装入按 discharge_nodes 顺序排列的 DischargeStore"""
+    discharge_params = map_request_to_discharge_params(discharge_points_data)
+    columns = {}
+    for field in DischargeStore.FIELDS:
+        try:
+            columns[field] = np.asarray([discharge_params.get(node, {}).get(field) for node in discharge_nodes], dtype=float)
+        except (TypeError, ValueError):
+            raise InvalidInputError(f"泄放点参数 {field} 必须为数值")
+    return DischargeStore(list(discharge_nodes), columns)
@@ -0,0 +1,201 @@
+import threading
+import time
+import pymysql
+from pymysql.constants import SERVER_STATUS
+from config import MYSQL_CONFIG, MYSQL_POOL_CONFIG
+
+class PoolTimeoutError(pymysql.err.OperationalError):
+    """连接池在等待时间内没有可用连接"""
+
+class PooledConnection:
+    """连接池借出的连接：用法同 pymysql 连接，close() 时归还连接池而不是断开"""
+    _conn = None
+
+    def __init__(self, pool, conn, created_at):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise pymysql.err.InterfaceError("连接已归还连接池")
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release(conn, self._created_at)
+
+    def discard(self):
+        """关闭底层连接并释放名额（如未读完的流式查询，继续复用需先读完剩余结果）"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._discard(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # 调用方忘记 close 时也归还名额
+        if getattr(self, "_conn", None) is not None:
+            self.close()
+
+class ConnectionPool:
+    """有界 MySQL 连接池
+
+    - 最多 max_size 个连接，借出时若已满则等待 checkout_timeout 秒，超时抛出 PoolTimeoutError；
+    - 空闲超过 ping_idle_seconds 的连接借出前先 ping 检查存活，失效则重建；
+    - 存活超过 max_age_seconds 的连接在归还时关闭（回收）；
+    - 归还时若仍处于事务中（未提交的查询）则回滚，避免下次借出看到旧快照。
+    """
+
+    def __init__(self, connect_kwargs, max_size=10, checkout_timeout=5.0, max_age_seconds=3600,
+                 ping_idle_seconds=5.0, connect=pymysql.connect):
+        self.connect_kwargs = connect_kwargs
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_age_seconds = max_age_seconds
+        self.ping_idle_seconds = ping_idle_seconds
+        self._connect = connect
+
+        self._idle = []                      # (连接, 创建时间, 归还时间)，后进先出
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.ping_failures = 0
+        self.recycled = 0
+        self.wait_seconds = 0.0
+
+    def connection(self):
+        """借出连接，返回 PooledConnection（可用 with 语句自动归还）"""
+        wait_start = None
+        with self._cond:
+            while not self._idle and self._in_use >= self.max_size:
+                now = time.monotonic()
+                if wait_start is None:
+                    wait_start = now
+                    self.waits += 1
+                remaining = wait_start + self.checkout_timeout - now
+                if remaining <= 0:
+                    self.timeouts += 1
+                    self.wait_seconds += now - wait_start
+                    raise PoolTimeoutError(f"连接池已满（{self.max_size}），等待 {self.checkout_timeout} 秒后仍无可用连接")
+                self._cond.wait(remaining)
+            if wait_start is not None:
+                self.wait_seconds += time.monotonic() - wait_start
+
+            entry = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self.checkouts += 1
+
+        # 建立连接与 ping 均在锁外进行
+        try:
+            if entry is not None:
+                conn, created_at, returned_at = entry
+                if time.monotonic() - returned_at >= self.ping_idle_seconds and not self._ping(conn):
+                    entry = None
+            if entry is None:
+                conn, created_at = self._connect(**self.connect_kwargs), time.monotonic()
+                with self._cond:
+                    self.created += 1
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        return PooledConnection(self, conn, created_at)
+
+    def _ping(self, conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            self._close(conn)
+            with self._cond:
+                self.ping_failures += 1
+            return False
+
+    def _release(self, conn, created_at):
+        now = time.monotonic()
+        reusable = conn.open
+        if reusable and now - created_at >= self.max_age_seconds:
+            reusable = False
+            with self._cond:
+                self.recycled += 1
+        if reusable and conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+
+        if not reusable:
+            self._close(conn)
+
+        with self._cond:
+            self._in_use -= 1
+            if reusable:
+                self._idle.append((conn, created_at, now))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        self._close(conn)
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self.closed += 1
+
+    def close_all(self):
+        """关闭全部空闲连接（借出中的连接归还后仍可复用）"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        """连接池指标"""
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "ping_failures": self.ping_failures,
+                "recycled": self.recycled,
+                "wait_seconds": round(self.wait_seconds, 3)
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """进程内共享的连接池，首次使用时按 config.py 创建（不会在导入时连接数据库）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(MYSQL_CONFIG, **MYSQL_POOL_CONFIG)
+    return _pool
+
+def get_db_connection():
+    """从连接池借出连接，用完调用 close() 归还"""
+    return get_pool().connection()
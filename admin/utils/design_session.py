@@ -0,0 +1,375 @@
+import heapq
+import numbers
+import operator
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from utils.data_mapper import InvalidInputError
+from utils.flow_calculator import create_pipe_objects, create_discharge_objects
+from utils.network_topology import compile_network_topology
+from utils.load_aggregator import aggregate_pipe_loads, update_pipe_loads
+from utils.vectorized_solver import (as_float_array, to_optional_list, solve_mach_numbers,
+                                     solve_reynolds_numbers, solve_friction_factors)
+from utils.pressure_ratio_solver import solve_pressure_ratio, solve_pressure_ratios
+from utils.pressure_calculator import VECTORIZE_MIN_PIPES
+from utils.mixture_properties import LOAD_SUM_FIELDS, mixture_properties
+
+# 补丁中允许修改的字段
+PIPE_PATCH_FIELDS = ("equivalent_length", "diameter", "roughness", "cross_area")
+DISCHARGE_PATCH_FIELDS = ("flow_rate", "pressure", "temperature", "molecular_weight", "max_backpressure", "viscosity")
+# 影响管道累计量的泄放点字段
+LOAD_FIELDS = ("flow_rate", "temperature", "molecular_weight", "viscosity")
+
+# 返回给前端的管道计算结果字段
+PIPE_RESULT_FIELDS = ("flow_rate", "avg_temperature", "avg_molecular_weight", "mach_number",
+                      "reynolds_number", "friction_factor", "outlet_pressure", "inlet_pressure")
+_pipe_state = operator.attrgetter(*PIPE_RESULT_FIELDS)
+
+def _check_patch(patch, fields, label):
+    """补丁须为对象，其中可修改字段的值须为数值"""
+    if not isinstance(patch, dict):
+        raise InvalidInputError(f"{label}补丁须为对象")
+    for field in fields:
+        value = patch.get(field)
+        if field in patch and (not isinstance(value, numbers.Real) or isinstance(value, bool)):
+            raise InvalidInputError(f"{label}参数 {field} 必须为数值")
+
+class DesignSession:
+    """交互式设计会话：保存上次计算后的管道状态，补丁只重算受影响的管道
+
+    泄放点参数变化影响其到火炬路径上的流量、温度、分子量、雷诺数与摩擦系数；
+    管道参数变化只影响该管道本身。压力自这些管道向上游传播，入口压力不变处停止。
+    计算规则与 check_flare_system 逐段计算一致，结果等同于对修改后的请求全量重算。
+    """
+
+    def __init__(self, connection_graph, flare_node, discharge_nodes, pipe_params, discharge_params):
+        self.session_id = uuid.uuid4().hex
+        self.last_access = time.time()
+
+        self.topology = compile_network_topology(connection_graph, flare_node)
+        self.pipes = create_pipe_objects(connection_graph, pipe_params, topology=self.topology)
+        self.discharge_objects = create_discharge_objects(discharge_nodes, discharge_params)
+        self.discharge_data = self.topology.index_discharge_points(self.discharge_objects)
+        self.discharge_by_node = {point.node_id: point for point in self.discharge_objects}
+
+        # 未参与压力计算的管道保留请求中的出口压力
+        self.initial_outlet_pressure = [pipe.outlet_pressure for pipe in self.pipes]
+        flare_pipe = next((self.pipes[pipe_id] for pipe_id in self.topology.node_inlet_pipes[self.topology.flare_index]), None)
+        if flare_pipe is None or flare_pipe.outlet_pressure is None:
+            raise ValueError("未设置火炬管道出口压力")
+        self.flare_pressure = flare_pipe.outlet_pressure
+
+        # 各管道入口压力（未取整），None 表示未求得
+        self.inlet_pressures = [None] * self.topology.pipe_count
+        self.loads = aggregate_pipe_loads(self.topology, self.discharge_objects)
+
+        # 不满足背压要求的泄放点
+        self.unsatisfied = {}
+
+        all_pipes = range(self.topology.pipe_count)
+        self._update_hydraulics(all_pipes)
+        self._update_pressures(all_pipes)
+        self._update_qualification(self.discharge_objects)
+
+    def __getstate__(self):
+        # 版本号由 SessionStore 维护，不随会话状态保存
+        return {key: value for key, value in self.__dict__.items() if key != "version"}
+
+    @property
+    def qualified(self):
+        return not self.unsatisfied
+
+    def apply_patch(self, pipe_patches, discharge_patches):
+        """应用补丁并增量重算，返回 (结果有变化的管道编号列表, 重算统计)"""
+        topology = self.topology
+        before = {}
+
+        def remember(pipe_id):
+            if pipe_id not in before:
+                before[pipe_id] = self.pipe_state(pipe_id)
+
+        # 1. 校验补丁对象与字段值，全部合法后再修改状态
+        patched_pipes = []
+        for patch in pipe_patches:
+            _check_patch(patch, PIPE_PATCH_FIELDS, "管道")
+            pipe_id = topology.pipe_index.get(patch.get("pipe_id"))
+            if pipe_id is None:
+                raise InvalidInputError(f"管道 {patch.get('pipe_id')} 不在管网中")
+            patched_pipes.append(pipe_id)
+
+        patched_points = []
+        for patch in discharge_patches:
+            _check_patch(patch, DISCHARGE_PATCH_FIELDS, "泄放点")
+            point = self.discharge_by_node.get(patch.get("node_id"))
+            if point is None:
+                raise InvalidInputError(f"泄放点 {patch.get('node_id')} 不在泄放节点列表中")
+            patched_points.append(point)
+
+        # 2. 修改管道与泄放点参数
+        for pipe_id, patch in zip(patched_pipes, pipe_patches):
+            remember(pipe_id)
+            for field in PIPE_PATCH_FIELDS:
+                if field in patch:
+                    setattr(self.pipes[pipe_id], field, patch[field])
+
+        for point, patch in zip(patched_points, discharge_patches):
+            for field in DISCHARGE_PATCH_FIELDS:
+                if field in patch:
+                    setattr(point, field, patch[field])
+
+        # 3. 累计量只沿泄放点到火炬的路径重算（仅修改背压限值等字段时无需重算）
+        node_ids = [topology.node_index[point.node_id]
+                    for point, patch in zip(patched_points, discharge_patches)
+                    if point.node_id in topology.node_index and any(field in patch for field in LOAD_FIELDS)]
+        load_pipes = update_pipe_loads(self.loads, topology, self.discharge_data, node_ids)
+
+        dirty = list(dict.fromkeys(load_pipes + patched_pipes))
+        for pipe_id in dirty:
+            remember(pipe_id)
+        self._update_hydraulics(dirty)
+        pressure_pipes = self._update_pressures(dirty, remember)
+        self._update_qualification(patched_points, pressure_pipes)
+
+        changed = [pipe_id for pipe_id, state in before.items() if self.pipe_state(pipe_id) != state]
+        changed.sort(key=lambda pipe_id: topology.pipe_depth[pipe_id])
+        stats = {
+            "hydraulic_pipes": len(dirty),
+            "pressure_pipes": len(pressure_pipes),
+            "changed_pipes": len(changed),
+            "total_pipes": topology.pipe_count
+        }
+        return changed, stats
+
+    def _update_hydraulics(self, pipe_ids):
+        """重算给定管道的流量、平均温度、平均分子量、马赫数、雷诺数与摩擦系数"""
+        pipe_ids = list(pipe_ids)
+        if not pipe_ids:
+            return
+        loads = self.loads
+        pipes = [self.pipes[pipe_id] for pipe_id in pipe_ids]
+
+        # 只对这些管道的累计量计算混合物性：平均温度、平均分子量（保留整数）、q·√M 加权黏度与声速
+        properties = mixture_properties(*([getattr(loads, field)[pipe_id] for pipe_id in pipe_ids]
+                                           for field in LOAD_SUM_FIELDS))
+        for pipe_id, pipe, T, M in zip(pipe_ids, pipes, properties.temperature.tolist(),
+                                       properties.molecular_weight.tolist()):
+            pipe.flow_rate = loads.flow[pipe_id]
+            pipe.avg_temperature = int(T) if T == T else None
+            pipe.avg_molecular_weight = int(M) if M == M else None
+
+        mach = solve_mach_numbers([pipe.flow_rate for pipe in pipes], properties.temperature,
+                                  properties.molecular_weight, [pipe.cross_area for pipe in pipes],
+                                  sound_speed=properties.sound_speed)
+
+        diameter = as_float_array([pipe.diameter for pipe in pipes])
+        reynolds = solve_reynolds_numbers([pipe.flow_rate for pipe in pipes], diameter, properties.viscosity)
+        friction = solve_friction_factors(reynolds, [pipe.roughness for pipe in pipes], diameter / 1000)
+
+        for pipe, M, Re, f in zip(pipes, to_optional_list(mach, 2), to_optional_list(reynolds, 2),
+                                  to_optional_list(friction, 6)):
+            pipe.mach_number = M
+            pipe.reynolds_number = Re
+            pipe.friction_factor = f
+
+    def _update_pressures(self, pipe_ids, remember=None):
+        """自给定管道按深度向上游重算入口压力，入口压力不变的管道不再向上游传播，返回重算的管道编号"""
+        topology = self.topology
+        pipe_depth = topology.pipe_depth
+        heap = [(pipe_depth[pipe_id], pipe_id) for pipe_id in set(pipe_ids) if pipe_depth[pipe_id] >= 0]
+        heapq.heapify(heap)
+        queued = {pipe_id for _, pipe_id in heap}
+        computed = []
+
+        while heap:
+            # 同一深度的管道互不依赖，一起求解
+            depth = heap[0][0]
+            level = []
+            while heap and heap[0][0] == depth:
+                level.append(heapq.heappop(heap)[1])
+
+            solve_ids, solve_fLD, solve_mach = [], [], []
+            new_inlet = {}
+            for pipe_id in level:
+                if remember is not None:
+                    remember(pipe_id)
+                pipe = self.pipes[pipe_id]
+                parent = topology.pipe_parent[pipe_id]
+                P2 = self.flare_pressure if parent == -1 else self.inlet_pressures[parent]
+                pipe.outlet_pressure = P2 if P2 is not None else self.initial_outlet_pressure[pipe_id]
+                new_inlet[pipe_id] = None
+
+                f, L, D, M = pipe.friction_factor, pipe.equivalent_length, pipe.diameter, pipe.mach_number
+                if P2 is None or None in (f, L, D, M) or P2 <= 0 or M <= 0:
+                    continue
+                solve_ids.append(pipe_id)
+                solve_fLD.append((f * L) / D)
+                solve_mach.append(M)
+
+            if len(solve_ids) >= VECTORIZE_MIN_PIPES:
+                ratios = solve_pressure_ratios(solve_fLD, solve_mach)[0].tolist()
+            else:
+                ratios = [solve_pressure_ratio(fLD, M) for fLD, M in zip(solve_fLD, solve_mach)]
+            for pipe_id, x in zip(solve_ids, ratios):
+                if x is not None and x == x:
+                    new_inlet[pipe_id] = self.pipes[pipe_id].outlet_pressure / x
+
+            for pipe_id in level:
+                computed.append(pipe_id)
+                P1 = new_inlet[pipe_id]
+                self.pipes[pipe_id].inlet_pressure = round(P1, 2) if P1 is not None else None
+                if P1 == self.inlet_pressures[pipe_id]:
+                    continue
+                self.inlet_pressures[pipe_id] = P1
+                for child in topology.pipe_children[pipe_id]:
+                    if child not in queued:
+                        queued.add(child)
+                        heapq.heappush(heap, (depth + 1, child))
+
+        return computed
+
+    def _update_qualification(self, points, pressure_pipes=()):
+        """重新判断给定泄放点及入口压力重算过的泄放点是否满足背压要求"""
+        topology = self.topology
+        nodes = {point.node_id for point in points}
+        for pipe_id in pressure_pipes:
+            point = self.discharge_data.get(topology.pipe_start[pipe_id])
+            if point is not None:
+                nodes.add(point.node_id)
+
+        for node in nodes:
+            node_id = topology.node_index.get(node)
+            pipe_id = topology.node_outlet_pipe[node_id] if node_id is not None else -1
+            self.unsatisfied.pop(node, None)
+            if pipe_id == -1:
+                continue
+            inlet_pressure = self.pipes[pipe_id].inlet_pressure
+            max_backpressure = self.discharge_by_node[node].max_backpressure
+            if inlet_pressure is None:
+                self.unsatisfied[node] = None
+            elif inlet_pressure > max_backpressure:
+                self.unsatisfied[node] = inlet_pressure
+
+    def pipe_state(self, pipe_id):
+        """管道计算结果元组，用于判断补丁前后是否变化"""
+        return _pipe_state(self.pipes[pipe_id])
+
+    def pipe_result(self, pipe_id):
+        """单根管道的计算结果字典"""
+        pipe = self.pipes[pipe_id]
+        result = {"pipe_id": pipe.name}
+        for field in PIPE_RESULT_FIELDS:
+            result[field] = getattr(pipe, field)
+        return result
+
+class SessionStore:
+    """SQLite 会话存储：各 Web 工作进程及其计算进程共用同一数据库文件，补丁可由任一工作进程处理
+
+    会话状态序列化保存，修改在数据库写事务内进行，每次保存版本号加一；各进程另在内存中保留最近使用的会话，
+    版本号与数据库一致时直接使用，不再反序列化。超过 max_sessions 时淘汰最久未访问的会话，
+    超过 ttl_seconds 未访问的会话失效。
+    """
+
+    def __init__(self, path, max_sessions=64, ttl_seconds=3600):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()      # 会话编号 -> 会话（本进程内存层）
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    @property
+    def _db(self):
+        """本进程的数据库连接（首次使用时打开并建表；fork 出的进程不沿用父进程的连接与内存层）"""
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA busy_timeout=30000")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS design_session ("
+                "session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, last_access REAL NOT NULL, "
+                "state BLOB NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_session_access ON design_session (last_access)")
+            self._connection, self._pid = connection, os.getpid()
+            self._sessions.clear()
+        return self._connection
+
+    def add(self, session):
+        """保存新会话（不放入内存层：会话常在计算进程中创建，补丁由 Web 工作进程处理）"""
+        now = time.time()
+        state = pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self.ttl_seconds is not None:
+                    self._db.execute("DELETE FROM design_session WHERE last_access < ?", (now - self.ttl_seconds,))
+                self._db.execute(
+                    "INSERT INTO design_session (session_id, version, last_access, state) VALUES (?, 0, ?, ?)",
+                    (session.session_id, now, state))
+                self._db.execute(
+                    "DELETE FROM design_session WHERE session_id IN ("
+                    "SELECT session_id FROM design_session ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_sessions,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        session.version = 0
+
+    def _load(self, session_id, now):
+        """读取会话并刷新访问时间，不存在或已过期返回 None（调用方持有 self._lock）"""
+        row = self._db.execute("SELECT version, last_access FROM design_session WHERE session_id = ?",
+                               (session_id,)).fetchone()
+        if row is None or (self.ttl_seconds is not None and now - row[1] > self.ttl_seconds):
+            self._sessions.pop(session_id, None)
+            if row is not None:
+                self._db.execute("DELETE FROM design_session WHERE session_id = ?", (session_id,))
+            return None
+        self._db.execute("UPDATE design_session SET last_access = ? WHERE session_id = ?", (now, session_id))
+
+        session = self._sessions.get(session_id)
+        if session is None or session.version != row[0]:
+            state = self._db.execute("SELECT state FROM design_session WHERE session_id = ?", (session_id,)).fetchone()
+            session = pickle.loads(state[0])
+            session.version = row[0]
+            self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        session.last_access = now
+        return session
+
+    def update(self, session_id, func):
+        """在数据库写事务内取会话、执行 func(会话) 并保存，返回 (会话, func 的返回值)，会话不存在时返回 (None, None)
+
+        写事务使各进程对会话的修改依次进行；func 抛出异常时回滚，本进程内存层丢弃该会话（状态可能已部分修改）。
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                session = self._load(session_id, time.time())
+                if session is None:
+                    self._db.execute("COMMIT")
+                    return None, None
+                result = func(session)
+                self._db.execute(
+                    "UPDATE design_session SET state = ?, version = version + 1 WHERE session_id = ?",
+                    (pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL), session_id))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                self._sessions.pop(session_id, None)
+                raise
+            session.version += 1
+            return session, result
+
+    def remove(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            cursor = self._db.execute("DELETE FROM design_session WHERE session_id = ?", (session_id,))
+            return cursor.rowcount > 0
@@ -1,36 +1,68 @@
-from collections import defaultdict
+import numpy as np
+from models.network_store import PipeStore, DischargeStore
+from utils.load_aggregator import resolve_pipe_loads
+from utils.vectorized_solver import as_float_array
 
-def create_pipe_objects(connection_graph, default_params=None):
+def create_pipe_objects(connection_graph, default_params=None, topology=None):
     """创建管道对象列表"""
     from models.flare_models import Pipe
     
     pipe_list = []
     default_params = default_params or {}  
 
-    for end_node, start_nodes in connection_graph.items():
-        for start_node in start_nodes:
-            name = f"{start_node}->{end_node}"
-            params = default_params.get(name, {})
-            
-            pipe_obj = Pipe(
-                name=name,
-                equivalent_length=params.get("equivalent_length"),
-                diameter=params.get("diameter"),
-                outlet_pressure=params.get("outlet_pressure"),
-                roughness=params.get("roughness"),
-                cross_area=params.get("cross_area"),
-                flow_rate=params.get("flow_rate"),
-                avg_temperature=params.get("avg_temperature"),
-                avg_molecular_weight=params.get("avg_molecular_weight"),
-                mach_number=params.get("mach_number"),
-                friction_factor=params.get("friction_factor"),
-                inlet_pressure=params.get("inlet_pressure"),
-                reynolds_number=params.get("reynolds_number")
-            )
-            pipe_list.append(pipe_obj)
-    
+    if topology is not None:
+        pipe_names = topology.pipe_names
+    else:
+        pipe_names = [f"{start_node}->{end_node}"
+                      for end_node, start_nodes in connection_graph.items()
+                      for start_node in start_nodes]
+
+    for name in pipe_names:
+        params = default_params.get(name, {})
+        
+        pipe_obj = Pipe(
+            name=name,
+            equivalent_length=params.get("equivalent_length"),
+            diameter=params.get("diameter"),
+            outlet_pressure=params.get("outlet_pressure"),
+            roughness=params.get("roughness"),
+            cross_area=params.get("cross_area"),
+            flow_rate=params.get("flow_rate"),
+            avg_temperature=params.get("avg_temperature"),
+            avg_molecular_weight=params.get("avg_molecular_weight"),
+            mach_number=params.get("mach_number"),
+            friction_factor=params.get("friction_factor"),
+            inlet_pressure=params.get("inlet_pressure"),
+            reynolds_number=params.get("reynolds_number")
+        )
+        pipe_list.append(pipe_obj)
+
     return pipe_list
 
+def create_pipe_store(connection_graph, default_params=None, topology=None):
+    """创建管道列存储（PipeStore），属性接口同管道对象列表，大管网内存占用小得多"""
+    default_params = default_params or {}
+
+    if topology is not None:
+        pipe_names = topology.pipe_names
+    else:
+        pipe_names = [f"{start_node}->{end_node}"
+                      for end_node, start_nodes in connection_graph.items()
+                      for start_node in start_nodes]
+
+    params_list = [default_params.get(name, {}) for name in pipe_names]
+    columns = {field: as_float_array([params.get(field) for params in params_list])
+               for field in PipeStore.FIELDS}
+    return PipeStore(pipe_names, columns)
+
+def create_discharge_store(discharge_nodes, default_params=None):
+    """创建泄放点列存储（DischargeStore）"""
+    default_params = default_params or {}
+    params_list = [default_params.get(node, {}) for node in discharge_nodes]
+    columns = {field: as_float_array([params.get(field) for params in params_list])
+               for field in DischargeStore.FIELDS}
+    return DischargeStore(list(discharge_nodes), columns)
+
 def create_discharge_objects(discharge_nodes, default_params=None):
     """创建泄放点对象列表"""
     from models.flare_models import DischargePoint
@@ -53,37 +85,19 @@ def create_discharge_objects(discharge_nodes, default_params=None):
 
     return discharge_objects
 
-def calculate_pipe_flow_rates(pipe_list, discharge_objects, connection_graph, flare_node):
+def calculate_pipe_flow_rates(pipe_list, discharge_objects, connection_graph, flare_node, topology=None, loads=None):
     """计算各段管道流量"""
-    # 构建前向图：终点 -> 起点列表
-    forward_graph = defaultdict(list)
-    for end_node, start_nodes in connection_graph.items():
-        for start_node in start_nodes:
-            forward_graph[end_node].append(start_node)
-
-    # 构建泄放点流量映射
-    discharge_flow_map = {point.node_id: point.flow_rate for point in discharge_objects}
+    # 累计量由单次后序遍历得到（未传入时现场计算）
+    topology, loads = resolve_pipe_loads(loads, topology, discharge_objects, connection_graph, flare_node)
 
-    # 创建一个映射，名称 -> 管道对象
-    name_to_pipe = {pipe.name: pipe for pipe in pipe_list}
+    # 列存储：整列赋值，未到达的管道保留原值
+    if isinstance(pipe_list, PipeStore) and topology.align(pipe_list) is pipe_list:
+        flow = as_float_array(loads.flow)
+        pipe_list.flow_rate[:] = np.where(np.isnan(flow), pipe_list.flow_rate, flow)
+        return pipe_list
 
-    # 定义回溯函数：计算从该节点向前所有泄放点的累计流量
-    def backtrack_flow(end_node):
-        total_flow = 0
-        if end_node in discharge_flow_map:
-            return discharge_flow_map[end_node]
+    for pipe, flow in zip(topology.align(pipe_list), loads.flow):
+        if pipe is not None and flow is not None:
+            pipe.flow_rate = flow
 
-        for start_node in forward_graph.get(end_node, []):
-            # 管道名
-            pipe_name = f"{start_node}->{end_node}"
-            sub_flow = backtrack_flow(start_node)
-            total_flow += sub_flow
-            # 写入管道流量
-            if pipe_name in name_to_pipe:
-                name_to_pipe[pipe_name].flow_rate = sub_flow
-        return total_flow
-
-    # 从火炬装置开始递归计算
-    backtrack_flow(flare_node)
-
-    return pipe_list 
\ No newline at end of file
+    return pipe_list
@@ -0,0 +1,194 @@
+import cProfile
+import glob
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from config import METRICS_CONFIG
+
+class Histogram:
+    """Prometheus 直方图：按标签值分别累计各桶计数、总和与次数"""
+
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # 标签值元组 -> [各桶计数, 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """各标签值的 [各桶计数, 总和, 次数]（标签值元组 -> 列表的副本）"""
+        with self._lock:
+            return {key: [list(counts), total, count] for key, (counts, total, count) in self._series.items()}
+
+    def render(self, series=None):
+        """Prometheus 文本格式（桶计数为累计值）；series 为汇总后的 snapshot()，默认取本进程"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        series = self.snapshot() if series is None else series
+        series = sorted((key, counts, total, count) for key, (counts, total, count) in series.items())
+        for key, counts, total, count in series:
+            pairs = list(zip(self.label_names, key))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', f'{bound:g}')])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {total:.9g}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {count}")
+        return "\n".join(lines)
+
+def _format_labels(pairs):
+    """{name="value",...}，值中的反斜杠、双引号与换行按 Prometheus 规则转义"""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class MetricsRegistry:
+    """指标注册表，/metrics 接口按 Prometheus 文本格式输出
+
+    未设置目录时只输出本进程的指标；多进程部署时各进程调用 use_directory() 指向同一目录，
+    flush() 将本进程的指标写入其中的 metrics-<pid>.json，render() 汇总目录下全部文件。
+    已退出进程的文件保留，各计数在一次部署内单调不减（目录应在每次启动时新建或清空）。
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self.directory = None
+        self._flush_lock = threading.Lock()
+
+    def histogram(self, name, documentation, label_names, buckets):
+        metric = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def use_directory(self, directory):
+        """本进程的指标写入 directory 并按其中全部进程的指标输出"""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def flush(self):
+        """将本进程的指标写入指标目录（未设置目录时不做任何事）"""
+        if self.directory is None:
+            return
+        snapshot = {metric.name: [[list(key), *values] for key, values in metric.snapshot().items()]
+                    for metric in self._metrics}
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        with self._flush_lock:
+            with open(path + ".tmp", "w", encoding="utf-8") as file:
+                json.dump(snapshot, file, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+
+    def _collect(self):
+        """汇总指标目录下各进程的指标：指标名 -> 标签值元组 -> [各桶计数, 总和, 次数]"""
+        self.flush()
+        merged = {metric.name: {} for metric in self._metrics}
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for name, rows in snapshot.items():
+                series = merged.get(name)
+                if series is None:
+                    continue
+                for key, counts, total, count in rows:
+                    current = series.setdefault(tuple(key), [[0] * len(counts), 0.0, 0])
+                    current[0] = [a + b for a, b in zip(current[0], counts)]
+                    current[1] += total
+                    current[2] += count
+        return merged
+
+    def render(self):
+        if self.directory is None:
+            return "\n".join(metric.render() for metric in self._metrics) + "\n"
+        merged = self._collect()
+        return "\n".join(metric.render(merged[metric.name]) for metric in self._metrics) + "\n"
+
+metrics = MetricsRegistry()
+request_duration = metrics.histogram(
+    "flare_request_duration_seconds", "接口请求耗时（秒）", ("route", "method", "status"),
+    METRICS_CONFIG['request_buckets'])
+stage_duration = metrics.histogram(
+    "flare_stage_duration_seconds", "单工况校验各计算阶段耗时（秒）", ("stage",),
+    METRICS_CONFIG['stage_buckets'])
+
+class StageTimer:
+    """分阶段计时（perf_counter_ns），同名阶段累加
+
+    listener 为可选的阶段完成回调 listener(阶段, 纳秒)，如异步任务的进度记录；阶段异常结束时不调用。
+    """
+
+    def __init__(self, listener=None):
+        self.stages = {}  # 阶段 -> 纳秒，按首次执行顺序
+        self.listener = listener
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            self.stages[name] = self.stages.get(name, 0) + elapsed
+        if self.listener is not None:
+            self.listener(name, elapsed)
+
+    def as_milliseconds(self):
+        return {name: round(elapsed / 1e6, 3) for name, elapsed in self.stages.items()}
+
+def record_stage_durations(stages, histogram=stage_duration):
+    """将 diagnostics.stages（阶段 -> 毫秒）记入指标直方图
+
+    在接口所在进程记录：计算可能在计算进程中执行，其进程内的指标不会被 /metrics 采集。
+    """
+    for name, elapsed in stages.items():
+        histogram.observe(elapsed / 1e3, stage=name)
+
+def iteration_summary(iterations):
+    """求解器迭代次数统计（按管道）"""
+    iterations = np.asarray(iterations)
+    if iterations.size == 0:
+        return {"pipes": 0, "total": 0, "mean": None, "max": None}
+    return {
+        "pipes": int(iterations.size),
+        "total": int(iterations.sum()),
+        "mean": round(float(iterations.mean()), 2),
+        "max": int(iterations.max())
+    }
+
+def profile_call(func, *args, **kwargs):
+    """在 cProfile 下执行 func，返回 (结果, 按累计耗时排序的前 N 个函数)"""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    summary = {
+        "total_calls": stats.total_calls,
+        "total_time_ms": round(stats.total_tt * 1000, 3),
+        "functions": [
+            {
+                "function": f"{filename}:{line}({name})",
+                "calls": primitive_calls if primitive_calls == calls else f"{calls}/{primitive_calls}",
+                "total_time_ms": round(total_time * 1000, 3),
+                "cumulative_time_ms": round(cumulative_time * 1000, 3)
+            }
+            for (filename, line, name), (primitive_calls, calls, total_time, cumulative_time, _)
+            in rows[:METRICS_CONFIG['profile_top']]
+        ]
+    }
+    return result, summary
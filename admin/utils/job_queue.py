@@ -0,0 +1,341 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from utils.calculation_executor import (CalculationExecutor, CalculationTimeout, CalculationProcessFailed,
+                                       calculation_timeout_response, calculation_process_failed_response)
+
+# 任务状态：排队、执行中、完成、失败（计算接口返回错误或执行异常）、已取消
+JOB_STATES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+class JobCancelled(BaseException):
+    """任务已被取消
+
+    继承 BaseException：各服务以 except Exception 把计算异常转为 503，取消需穿过这些处理直达任务执行线程。
+    """
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA busy_timeout=30000")
+    return connection
+
+class JobQueue:
+    """SQLite 持久化任务队列：各 Web 工作进程及其计算进程共用同一数据库文件
+
+    执行中的任务由执行进程定期刷新心跳，心跳超过 lease_seconds 未更新（执行进程已退出）的任务重新排队，
+    累计领取 max_attempts 次仍未完成时记为失败。
+    """
+
+    def __init__(self, path, lease_seconds=60, max_attempts=3, ttl_seconds=86400, max_queued=100):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.ttl_seconds = ttl_seconds
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    @property
+    def _db(self):
+        """本进程的数据库连接（首次使用时打开并建表；fork 出的进程不沿用父进程的连接）"""
+        if self._connection is None or self._pid != os.getpid():
+            connection = _connect(self.path)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS calculation_job ("
+                "job_id TEXT PRIMARY KEY, job_type TEXT NOT NULL, state TEXT NOT NULL, "
+                "request TEXT NOT NULL, options TEXT NOT NULL, progress TEXT NOT NULL DEFAULT '{}', result TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, cancel_requested INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, started_at REAL, heartbeat_at REAL, finished_at REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_job_state ON calculation_job (state, created_at)")
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def submit(self, job_type, request, options=None):
+        """加入队列并返回任务编号；排队任务数已达上限时返回 None"""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # 顺带清理过期的已结束任务
+                if self.ttl_seconds is not None:
+                    self._db.execute(
+                        "DELETE FROM calculation_job WHERE finished_at IS NOT NULL AND finished_at < ?",
+                        (now - self.ttl_seconds,))
+                queued = self._db.execute("SELECT COUNT(*) FROM calculation_job WHERE state = 'queued'").fetchone()[0]
+                if queued >= self.max_queued:
+                    self._db.execute("ROLLBACK")
+                    return None
+                self._db.execute(
+                    "INSERT INTO calculation_job (job_id, job_type, state, request, options, created_at) "
+                    "VALUES (?, ?, 'queued', ?, ?, ?)",
+                    (job_id, job_type, json.dumps(request, ensure_ascii=False),
+                     json.dumps(options or {}, ensure_ascii=False), now))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def claim(self):
+        """领取最早排队（或心跳超时）的任务并标记为执行中，返回 (任务编号, 类型, 请求, 选项)，无任务时返回 None"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # 心跳超时且已达领取次数上限的任务不再重试
+                self._db.execute(
+                    "UPDATE calculation_job SET state = 'failed', finished_at = ?, result = ? "
+                    "WHERE state = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                    (now, json.dumps(_abandoned_response(self.max_attempts), ensure_ascii=False),
+                     now - self.lease_seconds, self.max_attempts))
+                row = self._db.execute(
+                    "SELECT job_id, job_type, request, options FROM calculation_job "
+                    "WHERE state = 'queued' OR (state = 'running' AND heartbeat_at < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now - self.lease_seconds,)).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE calculation_job SET state = 'running', attempts = attempts + 1, "
+                        "started_at = ?, heartbeat_at = ?, progress = '{}' WHERE job_id = ?",
+                        (now, now, row[0]))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2]), json.loads(row[3])
+
+    def heartbeat(self, job_ids):
+        """刷新执行中任务的心跳"""
+        if not job_ids:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE calculation_job SET heartbeat_at = ? WHERE job_id = ? AND state = 'running'",
+                [(now, job_id) for job_id in job_ids])
+
+    def finish(self, job_id, state, result):
+        """记录执行结果；已被取消的任务保持取消状态"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE calculation_job SET state = ?, result = ?, finished_at = ? "
+                "WHERE job_id = ? AND state = 'running'",
+                (state, json.dumps(result, ensure_ascii=False), time.time(), job_id))
+
+    def cancel(self, job_id):
+        """取消任务：排队中的直接取消，执行中的标记取消请求（在下一个阶段或工况块结束时生效）
+
+        返回取消前的状态，任务不存在时返回 None。
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT state FROM calculation_job WHERE job_id = ?", (job_id,)).fetchone()
+                if row is not None and row[0] == 'queued':
+                    self._db.execute(
+                        "UPDATE calculation_job SET state = 'cancelled', finished_at = ? WHERE job_id = ?",
+                        (time.time(), job_id))
+                elif row is not None and row[0] == 'running':
+                    self._db.execute("UPDATE calculation_job SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return row[0] if row is not None else None
+
+    def get(self, job_id):
+        """任务状态、进度与结果（未结束时结果为 None），任务不存在时返回 None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT job_id, job_type, state, progress, result, attempts, cancel_requested, "
+                "created_at, started_at, finished_at FROM calculation_job WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "type": row[1],
+            "state": row[2],
+            "progress": json.loads(row[3]),
+            "result": json.loads(row[4]) if row[4] is not None else None,
+            "attempts": row[5],
+            "cancel_requested": bool(row[6]),
+            "created_at": row[7],
+            "started_at": row[8],
+            "finished_at": row[9]
+        }
+
+    def stats(self):
+        """各状态任务数"""
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM calculation_job GROUP BY state").fetchall()
+        counts = dict.fromkeys(JOB_STATES, 0)
+        counts.update(rows)
+        return counts
+
+def _abandoned_response(attempts):
+    return {
+        "status": 503,
+        "error_code": "JOB_ABANDONED",
+        "message": f"任务执行进程已退出（已尝试 {attempts} 次）"
+    }
+
+class JobProgress:
+    """任务进度记录：计算中各阶段完成、各工况块完成时调用，写入任务表并检查取消请求
+
+    可序列化（只保存数据库路径与任务编号），在计算进程内首次使用时打开连接；
+    写入至少间隔 min_interval 秒（最后一次进度可能未写入，任务结束时以结果为准）。
+    """
+
+    def __init__(self, path, job_id, min_interval=0.5):
+        self.path = path
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.state = {}
+        self._db = None
+        self._flushed_at = 0.0
+
+    def __getstate__(self):
+        return dict(self.__dict__, _db=None)
+
+    def stage_completed(self, name, elapsed_ns):
+        """StageTimer 阶段结束回调"""
+        self.state.setdefault("stages_completed", []).append(name)
+        self.state["stage_ms"] = round(self.state.get("stage_ms", 0) + elapsed_ns / 1e6, 3)
+        self._flush()
+
+    def update(self, **counters):
+        """更新计数类进度，如 scenarios_done、scenarios_total"""
+        self.state.update(counters)
+        self._flush()
+
+    def _flush(self):
+        now = time.monotonic()
+        if now - self._flushed_at < self.min_interval:
+            return
+        self._flushed_at = now
+        if self._db is None:
+            self._db = _connect(self.path)
+        self._db.execute("UPDATE calculation_job SET progress = ? WHERE job_id = ?",
+                         (json.dumps(self.state, ensure_ascii=False), self.job_id))
+        row = self._db.execute("SELECT cancel_requested FROM calculation_job WHERE job_id = ?",
+                               (self.job_id,)).fetchone()
+        if row is None or row[0]:
+            raise JobCancelled()
+
+def _run_job(func, progress, args, kwargs):
+    """在计算进程（或任务线程）内执行任务，开始前先检查是否已取消"""
+    progress.update()
+    return func(*args, progress=progress, **kwargs)
+
+class JobRunner:
+    """任务执行器：workers 个任务线程循环从队列领取任务执行，另有一个心跳线程
+
+    processes > 0 时任务在独立的计算进程池中执行（与同步接口的计算进程互不占用），超过 timeout 秒记为失败；
+    否则在任务线程内执行。resolve(任务类型) 返回 (计算函数, 参数元组)，计算函数需接受 progress 关键字参数，
+    返回带 status 的结果字典。
+    """
+
+    def __init__(self, queue, resolve, workers=1, processes=0, timeout=None, poll_interval=0.5):
+        self.queue = queue
+        self.resolve = resolve
+        self.workers = workers
+        self.processes = processes
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._executor = None
+        self._threads = []
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    @property
+    def started(self):
+        return bool(self._threads)
+
+    def start(self, processes=None):
+        """启动任务线程；processes 覆盖构造时的计算进程数
+
+        计算进程须在 Web 工作进程开始处理请求前派生（见 CalculationExecutor.start），
+        之后才启动时应传入 processes=0，在任务线程内执行。
+        """
+        processes = self.processes if processes is None else processes
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            if processes > 0:
+                self._executor = CalculationExecutor()
+                self._executor.start(processes, self.timeout)
+            self._stopping.clear()
+            self._threads = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                             for i in range(self.workers)]
+            self._threads.append(threading.Thread(target=self._beat, name="job-heartbeat", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def shutdown(self, wait=True):
+        """停止领取新任务；wait=True 时等待执行中的任务完成（未完成的任务在心跳超时后由其他进程重新执行）"""
+        self._stopping.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+            executor, self._executor = self._executor, None
+        if wait:
+            for thread in threads:
+                thread.join()
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _beat(self):
+        interval = max(0.1, self.queue.lease_seconds / 3)
+        while not self._stopping.wait(interval):
+            with self._lock:
+                job_ids = list(self._running)
+            self.queue.heartbeat(job_ids)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._stopping.wait(self.poll_interval)
+                continue
+            job_id, job_type, request, options = job
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                state, result = self._execute(job_id, job_type, request, options)
+                self.queue.finish(job_id, state, result)
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+
+    def _execute(self, job_id, job_type, request, options):
+        """执行一个任务，返回 (结束状态, 结果)"""
+        progress = JobProgress(self.queue.path, job_id)
+        try:
+            func, args = self.resolve(job_type, request, options)
+            if self._executor is not None:
+                result = self._executor.run(_run_job, func, progress, args, {})
+            else:
+                result = _run_job(func, progress, args, {})
+        except JobCancelled:
+            return "cancelled", None
+        except CalculationTimeout:
+            return "failed", calculation_timeout_response(self.timeout)
+        except CalculationProcessFailed:
+            return "failed", calculation_process_failed_response()
+        except Exception as e:
+            return "failed", {
+                "status": 503,
+                "error_code": "JOB_FAILED",
+                "message": f"任务执行异常: {str(e)}"
+            }
+        # 计算接口本身返回的错误（如参数校验失败）同样记为失败
+        return ("succeeded" if result.get('status') == 200 else "failed"), result
@@ -0,0 +1,151 @@
+import math
+import numpy as np
+from utils.network_topology import compile_network_topology
+from utils.parallel_executor import map_in_threads
+
+class PipeLoads:
+    """各管道上游泄放点累计量，按管道编号索引；未从火炬节点到达的管道为 None"""
+
+    def __init__(self, pipe_count):
+        self.flow = [None] * pipe_count               # Σq，kg/h
+        self.temp_product = [None] * pipe_count       # Σq·T
+        self.q_div_M = [None] * pipe_count            # Σq/M
+        self.q_sqrt_M = [None] * pipe_count           # Σq·√M
+        self.q_mu_sqrt_M = [None] * pipe_count        # Σq·μ·√M
+        self.properties = None                        # 混合物性缓存（见 pipe_mixture_properties）
+
+def aggregate_pipe_loads(topology, discharge_objects):
+    """单次迭代后序遍历，同时计算各管道的 Σq、Σq·T、Σq/M、Σq·√M、Σq·μ·√M"""
+    discharge_data = topology.index_discharge_points(discharge_objects)
+    loads = PipeLoads(topology.pipe_count)
+
+    # 自上而下标记可到达管道：泄放点上游的管道不参与累计（与原回溯在泄放点处终止一致）
+    reached = topology.reachable_pipes(discharge_data)
+
+    # 后序遍历：上游管道先于下游管道完成累计
+    for pipe_id in topology.post_order:
+        if reached[pipe_id]:
+            _accumulate_pipe(loads, topology, discharge_data, pipe_id)
+
+    return loads
+
+def aggregate_partitioned_loads(topology, discharge_store, partition, workers):
+    """累计量计算的分区并行版本（泄放点为 DischargeStore），结果与 aggregate_pipe_loads 逐位相同
+
+    各累计量为按管道编号的数组，未到达的管道为 NaN。各组子树互不相交，先在线程池中并行累计各组，
+    再累计主干。泄放点参数缺失或分子量为0时改用 aggregate_pipe_loads（报错一致）。
+    """
+    # 泄放点出口管道及其参数（同一节点出现多次时取最后一次，与 index_discharge_points 一致）
+    node_index = topology.node_index
+    nodes = np.array([node_index.get(node, -1) for node in discharge_store.node_ids], dtype=int)
+    rows = np.flatnonzero(nodes != -1)
+    nodes, last = np.unique(nodes[rows][::-1], return_index=True)
+    rows = rows[::-1][last]
+
+    # 自火炬逐层标记可到达管道：泄放点上游的管道不参与累计
+    is_discharge = np.zeros(topology.node_count, dtype=bool)
+    is_discharge[nodes] = True
+    pipe_end = np.array(topology.pipe_end, dtype=int)
+    pipe_parent = partition.pipe_parent
+    reached = np.zeros(topology.pipe_count, dtype=bool)
+    for level in partition.levels:
+        parents = pipe_parent[level]
+        reached[level] = ~is_discharge[pipe_end[level]] & ((parents == -1) | reached[np.maximum(parents, 0)])
+
+    source_pipes = np.array(topology.node_outlet_pipe, dtype=int)[nodes]
+    sourced = (source_pipes != -1) & reached[np.maximum(source_pipes, 0)]
+    source_pipes, rows = source_pipes[sourced], rows[sourced]
+    q = discharge_store.flow_rate[rows]
+    T = discharge_store.temperature[rows]
+    M = discharge_store.molecular_weight[rows]
+    mu = discharge_store.viscosity[rows]
+    if np.any(np.isnan(q) | np.isnan(T) | np.isnan(M) | np.isnan(mu) | (M == 0)):
+        return aggregate_pipe_loads(topology, discharge_store)
+
+    # 管道在前的布局：每根管道的5个累计量连续存放，末尾全零行供步骤矩阵填充
+    sums = np.zeros((topology.pipe_count + 1, 5))
+    sqrt_M = np.sqrt(M)
+    sums[source_pipes] = np.column_stack([q, T * q, q / M, q * sqrt_M, q * mu * sqrt_M])
+
+    group_steps, trunk_steps = partition.propagation_steps(reached)
+
+    def accumulate(steps):
+        for children, parents in steps:
+            upstream = sums[children]
+            total = upstream[:, 0]
+            for k in range(1, upstream.shape[1]):
+                total = total + upstream[:, k]
+            sums[parents] = total
+
+    map_in_threads(accumulate, group_steps, workers)
+    accumulate(trunk_steps)
+
+    sums = sums[:-1]
+    sums[~reached] = np.nan
+    loads = PipeLoads(0)
+    loads.flow, loads.temp_product, loads.q_div_M, loads.q_sqrt_M, loads.q_mu_sqrt_M = sums.T.copy()
+    return loads
+
+def update_pipe_loads(loads, topology, discharge_data, node_ids):
+    """泄放点参数变化后，仅重算这些节点到火炬路径上的管道累计量，返回重算的管道编号（上游在前）
+
+    discharge_data 为 节点编号 -> 泄放点对象；路径在遇到下游泄放点时终止（该点上游不参与累计）。
+    """
+    pipe_depth = topology.pipe_depth
+    dirty = set()
+    for node_id in node_ids:
+        pipe_id = topology.node_outlet_pipe[node_id]
+        while pipe_id != -1 and pipe_id not in dirty and loads.flow[pipe_id] is not None:
+            dirty.add(pipe_id)
+            pipe_id = topology.pipe_parent[pipe_id]
+
+    # 深度大的（上游）先算，等价于后序遍历中的相对顺序
+    ordered = sorted(dirty, key=lambda pipe_id: -pipe_depth[pipe_id])
+    for pipe_id in ordered:
+        _accumulate_pipe(loads, topology, discharge_data, pipe_id)
+    if ordered:
+        loads.properties = None
+    return ordered
+
+def _accumulate_pipe(loads, topology, discharge_data, pipe_id):
+    """计算单根管道的累计量：起点为泄放点时取其自身参数，否则为上游管道之和"""
+    start_node = topology.pipe_start[pipe_id]
+    point = discharge_data.get(start_node)
+    if point is not None:
+        q = point.flow_rate
+        M = point.molecular_weight
+        if M == 0:
+            raise ValueError(f"泄放点 {topology.node_names[start_node]} 分子量不能为0")
+        sqrt_M = math.sqrt(M)
+        loads.flow[pipe_id] = q
+        loads.temp_product[pipe_id] = point.temperature * q
+        loads.q_div_M[pipe_id] = q / M
+        loads.q_sqrt_M[pipe_id] = q * sqrt_M
+        loads.q_mu_sqrt_M[pipe_id] = q * point.viscosity * sqrt_M
+        return
+
+    flow = loads.flow
+    temp_product = loads.temp_product
+    q_div_M = loads.q_div_M
+    q_sqrt_M = loads.q_sqrt_M
+    q_mu_sqrt_M = loads.q_mu_sqrt_M
+
+    total_q = total_qT = total_q_div_M = total_q_sqrt_M = total_q_mu_sqrt_M = 0
+    for child in topology.node_inlet_pipes[start_node]:
+        total_q += flow[child]
+        total_qT += temp_product[child]
+        total_q_div_M += q_div_M[child]
+        total_q_sqrt_M += q_sqrt_M[child]
+        total_q_mu_sqrt_M += q_mu_sqrt_M[child]
+    flow[pipe_id] = total_q
+    temp_product[pipe_id] = total_qT
+    q_div_M[pipe_id] = total_q_div_M
+    q_sqrt_M[pipe_id] = total_q_sqrt_M
+    q_mu_sqrt_M[pipe_id] = total_q_mu_sqrt_M
+
+def resolve_pipe_loads(loads, topology, discharge_objects, connection_graph, flare_node=None):
+    """取已编译的拓扑与累计量；未传入时现场编译并聚合"""
+    topology = topology or compile_network_topology(connection_graph, flare_node)
+    if loads is None:
+        loads = aggregate_pipe_loads(topology, discharge_objects)
+    return topology, loads
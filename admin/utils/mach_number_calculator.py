@@ -1,111 +1,78 @@
-import math
-from collections import defaultdict
-
-def calculate_pipe_mach_numbers(pipe_list):
-    """计算各段管道末端马赫数"""
-    for pipe in pipe_list:
-        try:
-            # 原始参数提取
-            flow_rate = pipe.flow_rate          # kg/h
-            temperature = pipe.avg_temperature   # K
-            mol_weight = pipe.avg_molecular_weight  # g/mol
-            cross_area = pipe.cross_area         # cm²
-
-            # 检查有效性
-            if None in (flow_rate, temperature, mol_weight, cross_area) or \
-               mol_weight == 0 or temperature == 0 or cross_area == 0:
-                continue  # 跳过不完整或非法数据
-
-            # 单位换算
-            q = flow_rate / 3600                  # kg/s
-            A = cross_area / 10000                # m²
-            a = ((8314 * temperature) / mol_weight)**0.5  # 声速，m/s
-            
-            # 计算马赫数
-            mach_number = round((q / (A*100000)) * a, 2)  # 保留2位小数
-
-            # 赋值到对象
+import numpy as np
+from models.network_store import PipeStore
+from utils.load_aggregator import resolve_pipe_loads
+from utils.instrumentation import iteration_summary
+from utils.mixture_properties import pipe_mixture_properties
+from utils.vectorized_solver import (as_float_array, to_optional_list, round_like_python, solve_mach_numbers,
+                                     solve_reynolds_numbers, solve_friction_factors)
+
+def calculate_pipe_mach_numbers(pipe_list, topology=None, loads=None):
+    """计算各段管道末端马赫数
+
+    传入 topology 与 loads 时，列存储直接取累计量上缓存的混合物性声速（无流量的管道仍按管道参数计算）。
+    """
+    # 列存储：直接使用管道参数列，无需复制
+    if isinstance(pipe_list, PipeStore):
+        sound_speed = None
+        if loads is not None and topology is not None and topology.align(pipe_list) is pipe_list:
+            sound_speed = pipe_mixture_properties(loads).sound_speed
+        mach_numbers = round_like_python(solve_mach_numbers(
+            pipe_list.flow_rate, pipe_list.avg_temperature, pipe_list.avg_molecular_weight, pipe_list.cross_area,
+            sound_speed=sound_speed), 2)
+        pipe_list.mach_number[:] = np.where(np.isnan(mach_numbers), pipe_list.mach_number, mach_numbers)
+        return pipe_list
+
+    # 整个管网一次向量化计算，不完整或非法数据的管道跳过
+    mach_numbers = solve_mach_numbers(
+        [pipe.flow_rate for pipe in pipe_list],             # kg/h
+        [pipe.avg_temperature for pipe in pipe_list],       # K
+        [pipe.avg_molecular_weight for pipe in pipe_list],  # g/mol
+        [pipe.cross_area for pipe in pipe_list]             # cm²
+    )
+
+    # 赋值到对象（保留2位小数）
+    for pipe, mach_number in zip(pipe_list, to_optional_list(mach_numbers, 2)):
+        if mach_number is not None:
             pipe.mach_number = mach_number
 
-        except Exception as e:
-            print(f"[错误] 计算 {pipe.name} 马赫数失败：{e}")
-
     return pipe_list
 
-def calculate_pipe_friction_factors(pipe_list, discharge_objects, connection_graph, flare_node):
-    """计算各段管道摩擦系数"""
-    # 构建前向图
-    forward_graph = defaultdict(list)
-    for end_node, start_nodes in connection_graph.items():
-        for start_node in start_nodes:
-            forward_graph[end_node].append(start_node)
-
-    # 提取泄放点数据
-    discharge_data = {point.node_id: point for point in discharge_objects}
-    name_to_pipe = {pipe.name: pipe for pipe in pipe_list}
-
-    # 回溯函数：收集当前管道可达的泄放点
-    def backtrack_discharge_points(end_node):
-        if end_node in discharge_data:
-            return [discharge_data[end_node]]
-
-        points = []
-        for start_node in forward_graph.get(end_node, []):
-            points += backtrack_discharge_points(start_node)
-        return points
-
-    def calculate_reynolds_number(pipe, related_points):
-        Q = pipe.flow_rate  # kg/h
-        if not Q or Q == 0:
-            return None
-
-        Q_s = Q / 3600  # 转换为 kg/s
-        numerator = 0
-        denominator = 0
-        for point in related_points:
-            qi = point.flow_rate / 3600
-            Mi = point.molecular_weight
-            mu = point.viscosity
-            if Mi == 0:
-                continue
-            weight = qi / Q_s
-            numerator += weight * mu * math.sqrt(Mi)
-            denominator += weight * math.sqrt(Mi)
-        if denominator == 0:
-            return None
-        
-        D = pipe.diameter / 1000  # mm -> m
-        viscosity = numerator / denominator
-        Re = 4 * Q_s / (math.pi * D * viscosity)
-        return Re
-
-    def calculate_friction_factor(Re, roughness, diameter):
-        if Re is None or Re <= 0:
-            return None
-        
-        # 初值（Blasius公式估算）
-        f = 0.02
-        for _ in range(20):
-            try:
-                left = 1 / math.sqrt(f)
-                right = -2.0 * math.log10((roughness / (3.7 * diameter)) + (2.51 / (Re * math.sqrt(f))))
-                diff = abs(left - right)
-                f = 1 / (right ** 2)
-                if diff < 1e-6:
-                    break
-            except Exception:
-                return None
-        return round(f, 6)
-
-    # 主流程：逐管道回溯泄放点 -> 计算雷诺数和摩擦系数
-    for pipe in pipe_list:
-        start_node, end_node = pipe.name.split("->")
-        discharge_points = backtrack_discharge_points(start_node)
-
-        Re = calculate_reynolds_number(pipe, discharge_points)
-        pipe.reynolds_number = round(Re, 2) if Re else None
-
-        f = calculate_friction_factor(Re, pipe.roughness, pipe.diameter/1000)  # 毫米转米
+def calculate_pipe_friction_factors(pipe_list, discharge_objects, connection_graph, flare_node, topology=None, loads=None,
+                                    stats=None):
+    """计算各段管道摩擦系数，传入 stats（dict）时写入 Colebrook 迭代次数统计 stats["colebrook"]"""
+    # 累计量由单次后序遍历得到（未传入时现场计算）
+    topology, loads = resolve_pipe_loads(loads, topology, discharge_objects, connection_graph, flare_node)
+    aligned = topology.align(pipe_list)
+
+    # 列存储：直接使用管道参数列，无需复制
+    if aligned is pipe_list and isinstance(pipe_list, PipeStore):
+        # 混合黏度按 q·√M 加权，取累计量上缓存的混合物性
+        viscosity = pipe_mixture_properties(loads).viscosity
+        reynolds = solve_reynolds_numbers(pipe_list.flow_rate, pipe_list.diameter, viscosity)
+        friction, iterations = solve_friction_factors(reynolds, pipe_list.roughness, pipe_list.diameter / 1000,
+                                                      return_iterations=True)
+        if stats is not None:
+            stats["colebrook"] = iteration_summary(iterations[~np.isnan(friction)])
+        pipe_list.reynolds_number[:] = round_like_python(reynolds, 2)
+        pipe_list.friction_factor[:] = round_like_python(friction, 6)
+        return pipe_list
+
+    pipe_ids = [pipe_id for pipe_id, pipe in enumerate(aligned) if pipe is not None]
+    pipes = [aligned[pipe_id] for pipe_id in pipe_ids]
+
+    # 混合黏度按 q·√M 加权：μ = Σ(q·μ·√M) / Σ(q·√M)，无可达泄放点时为 NaN
+    viscosity = pipe_mixture_properties(loads).viscosity[pipe_ids]
+
+    # 整个管网一次求解雷诺数和 Colebrook 摩擦系数
+    diameter = as_float_array([pipe.diameter for pipe in pipes])  # mm
+    reynolds = solve_reynolds_numbers([pipe.flow_rate for pipe in pipes], diameter, viscosity)
+    friction, iterations = solve_friction_factors(reynolds, [pipe.roughness for pipe in pipes], diameter / 1000,
+                                                  return_iterations=True)  # 毫米转米
+    if stats is not None:
+        stats["colebrook"] = iteration_summary(iterations[~np.isnan(friction)])
+
+    for pipe, Re, f in zip(pipes, to_optional_list(reynolds, 2), to_optional_list(friction, 6)):
+        pipe.reynolds_number = Re
         pipe.friction_factor = f
 
-    return pipe_list 
\ No newline at end of file
+    return pipe_list
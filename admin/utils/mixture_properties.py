@@ -0,0 +1,53 @@
+import numpy as np
+
+GAS_CONSTANT = 8314     # 通用气体常数，J/(kmol·K)
+
+LOAD_SUM_FIELDS = ("flow", "temp_product", "q_div_M", "q_sqrt_M", "q_mu_sqrt_M")
+
+def sound_speeds(temperature, molecular_weight):
+    """等温声速 √(R·T/M)，m/s；temperature: K, molecular_weight: g/mol"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sqrt((GAS_CONSTANT * np.asarray(temperature, dtype=float)) / np.asarray(molecular_weight, dtype=float))
+
+def gas_densities(pressure, temperature, molecular_weight):
+    """理想气体密度 P·M/(R·T)，kg/m³；pressure: Pa"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (np.asarray(pressure, dtype=float) * np.asarray(molecular_weight, dtype=float) /
+                (GAS_CONSTANT * np.asarray(temperature, dtype=float)))
+
+class MixtureProperties:
+    """各管道混合物性（数组，形状与累计量相同），无流量或未到达的管道为 NaN"""
+
+    def __init__(self, temperature, molecular_weight, viscosity):
+        self.temperature = temperature              # 平均温度，K（取整）
+        self.molecular_weight = molecular_weight    # 平均分子量，g/mol（取整）
+        self.viscosity = viscosity                  # 混合黏度，Pa·s
+        self.sound_speed = sound_speeds(temperature, molecular_weight)  # m/s
+
+    def densities(self, pressure):
+        """给定压力（Pa，可为各管道压力数组）下的混合气体密度"""
+        return gas_densities(pressure, self.temperature, self.molecular_weight)
+
+def mixture_properties(flow, temp_product, q_div_M, q_sqrt_M, q_mu_sqrt_M):
+    """由上游累计量一次计算全部管道（可含多工况）的混合物性
+
+    平均温度 = Σ(q·T)/Σq，平均分子量 = Σq/Σ(q/M)（均按四舍六入五成双取整，与 Python round 一致），
+    混合黏度按 q·√M 加权：μ = Σ(q·μ·√M)/Σ(q·√M)。
+    """
+    flow, temp_product, q_div_M, q_sqrt_M, q_mu_sqrt_M = (
+        np.asarray(values, dtype=float) for values in (flow, temp_product, q_div_M, q_sqrt_M, q_mu_sqrt_M))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        temperature = np.where(flow > 0, np.rint(temp_product / flow), np.nan)
+        molecular_weight = np.where(q_div_M > 0, np.rint(flow / q_div_M), np.nan)
+        viscosity = np.where(q_sqrt_M != 0, q_mu_sqrt_M / q_sqrt_M, np.nan)
+    return MixtureProperties(temperature, molecular_weight, viscosity)
+
+def pipe_mixture_properties(loads):
+    """单工况各管道（按管道编号）的混合物性
+
+    结果缓存在累计量对象上，同一次计算的温度、分子量、马赫数、摩擦系数各阶段及管径搜索共用；
+    累计量经 update_pipe_loads 更新后缓存失效。
+    """
+    if loads.properties is None:
+        loads.properties = mixture_properties(*(getattr(loads, field) for field in LOAD_SUM_FIELDS))
+    return loads.properties
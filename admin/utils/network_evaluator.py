@@ -0,0 +1,254 @@
+import copy
+import numpy as np
+from models.network_store import PipeStore
+from utils.network_topology import compile_network_topology
+from utils.vectorized_solver import (as_float_array, round_like_python, solve_mach_numbers, solve_reynolds_numbers,
+                                     solve_friction_factors)
+from utils.pressure_ratio_solver import solve_pressure_ratios
+from utils.mixture_properties import mixture_properties
+
+# 泄放工况矩阵中的累计量顺序：Σq、Σq·T、Σq/M、Σq·√M、Σq·μ·√M
+LOAD_SUM_COUNT = 5
+
+class CompiledNetwork:
+    """编译后的管网：拓扑 + 按管道编号排列的管道参数列，可对多组泄放工况重复求值"""
+
+    def __init__(self, topology, pipe_params, discharge_nodes, flare_pressure):
+        self.topology = topology
+        self.pipe_count = topology.pipe_count
+        self.flare_pressure = flare_pressure
+
+        # 管道参数列（按管道编号），缺失值为 NaN；PipeStore 直接使用其数组列
+        def column(key):
+            if isinstance(pipe_params, PipeStore):
+                return getattr(pipe_params, key)
+            return as_float_array([pipe_params.get(name, {}).get(key) for name in topology.pipe_names])
+
+        self.equivalent_length = column("equivalent_length")
+        self.diameter = column("diameter")
+        self.roughness = column("roughness")
+        self.cross_area = column("cross_area")
+
+        # 泄放节点（去重，忽略不在管网中的节点），工况矩阵的列按此顺序排列
+        node_index = topology.node_index
+        self.discharge_nodes = list(dict.fromkeys(node for node in discharge_nodes if node in node_index))
+        discharge_ids = [node_index[node] for node in self.discharge_nodes]
+        self.discharge_pipe_ids = np.array([topology.node_outlet_pipe[node] for node in discharge_ids], dtype=int)
+
+        # 可到达管道：回溯在泄放点处终止
+        reached = topology.reachable_pipes(set(discharge_ids))
+        self.reached = np.array(reached, dtype=bool)
+
+        # 累计量源头：可到达的泄放点出口管道
+        self.source_columns = np.array([k for k, pipe_id in enumerate(self.discharge_pipe_ids)
+                                        if pipe_id != -1 and reached[pipe_id]], dtype=int)
+        self.source_pipes = self.discharge_pipe_ids[self.source_columns]
+
+        # 各层向下游传递累计量的 (子管道, 父管道)，由深到浅排列；终点为泄放点的管道不传递。
+        # 子管道按管道编号排列，np.add.at 依次累加，与单工况逐管道求和的顺序（及舍入）一致
+        discharge_set = set(discharge_ids)
+        self.propagation = []
+        for level in reversed(topology.levels):
+            children = [pipe_id for pipe_id in sorted(level)
+                        if reached[pipe_id] and topology.pipe_parent[pipe_id] != -1 and
+                        topology.pipe_end[pipe_id] not in discharge_set]
+            if children:
+                self.propagation.append((np.array(children, dtype=int),
+                                         np.array([topology.pipe_parent[c] for c in children], dtype=int)))
+
+        # 压力自火炬逐层向上游推进
+        self.levels = [np.array(level, dtype=int) for level in topology.levels]
+        self.pipe_parent = np.array(topology.pipe_parent, dtype=int)
+
+    @property
+    def discharge_count(self):
+        return len(self.discharge_nodes)
+
+    def detached(self):
+        """不含拓扑的浅拷贝（工况求值只用数组列），传给工作进程时序列化数据量小得多"""
+        network = copy.copy(self)
+        network.topology = None
+        return network
+
+class ScenarioLoads:
+    """多工况泄放参数矩阵，形状均为 (工况数, 泄放节点数)"""
+
+    def __init__(self, flow_rate, temperature, molecular_weight, viscosity, max_backpressure, roughness_scale=None):
+        self.flow_rate = flow_rate                  # kg/h，缺失视为0（该工况不泄放）
+        self.temperature = temperature              # K
+        self.molecular_weight = molecular_weight    # g/mol
+        self.viscosity = viscosity                  # Pa·s
+        self.max_backpressure = max_backpressure    # Pa
+        self.roughness_scale = roughness_scale      # 各工况管道粗糙度倍数，形状 (工况数,)，None 为不调整
+
+    @property
+    def scenario_count(self):
+        return self.flow_rate.shape[0]
+
+    def rows(self, start, stop):
+        """取第 start 至 stop-1 个工况（视图，不复制）"""
+        roughness_scale = None if self.roughness_scale is None else self.roughness_scale[start:stop]
+        return ScenarioLoads(self.flow_rate[start:stop], self.temperature[start:stop],
+                             self.molecular_weight[start:stop], self.viscosity[start:stop],
+                             self.max_backpressure[start:stop], roughness_scale)
+
+class ScenarioResults:
+    """多工况计算结果，形状均为 (工况数, 管道数)，未求得的值为 NaN"""
+
+    def __init__(self, flow_rate, avg_temperature, avg_molecular_weight, mach_number,
+                 reynolds_number, friction_factor, outlet_pressure, inlet_pressure):
+        self.flow_rate = flow_rate
+        self.avg_temperature = avg_temperature
+        self.avg_molecular_weight = avg_molecular_weight
+        self.mach_number = mach_number
+        self.reynolds_number = reynolds_number
+        self.friction_factor = friction_factor
+        self.outlet_pressure = outlet_pressure
+        self.inlet_pressure = inlet_pressure
+
+def compile_network(connection_graph, flare_node, discharge_nodes, pipe_params, topology=None):
+    """编译管网拓扑与管道参数，火炬出口压力取接入火炬节点的首段管道
+
+    pipe_params 为 管道名 -> 参数字典，或按 topology 管道编号排列的 PipeStore。
+    """
+    topology = topology or compile_network_topology(connection_graph, flare_node)
+
+    flare_pressure = None
+    for pipe_id in topology.node_inlet_pipes[topology.flare_index]:
+        if isinstance(pipe_params, PipeStore):
+            if not np.isnan(pipe_params.outlet_pressure[pipe_id]):
+                flare_pressure = float(pipe_params.outlet_pressure[pipe_id])
+                break
+            continue
+        params = pipe_params.get(topology.pipe_names[pipe_id])
+        if params is not None:
+            flare_pressure = params.get("outlet_pressure")
+            break
+    if flare_pressure is None:
+        raise ValueError("未设置火炬管道出口压力")
+
+    return CompiledNetwork(topology, pipe_params, discharge_nodes, flare_pressure)
+
+def build_scenario_loads(network, base_params, scenario_params_list):
+    """由基础泄放参数与各工况覆盖参数（均为 节点 -> 参数字典）构建工况矩阵"""
+    fields = ("flow_rate", "temperature", "molecular_weight", "viscosity", "max_backpressure")
+    column_index = {node: col for col, node in enumerate(network.discharge_nodes)}
+    scenario_count = len(scenario_params_list)
+
+    # 基础参数行，复制到每个工况
+    base_rows = {field: np.full(network.discharge_count, np.nan) for field in fields}
+    for node, params in base_params.items():
+        col = column_index.get(node)
+        if col is None:
+            continue
+        for field in fields:
+            if params.get(field) is not None:
+                base_rows[field][col] = params[field]
+    matrices = {field: np.tile(row, (scenario_count, 1)) for field, row in base_rows.items()}
+
+    # 各工况仅覆盖其给出的非空字段
+    for row, scenario_params in enumerate(scenario_params_list):
+        for node, params in scenario_params.items():
+            col = column_index.get(node)
+            if col is None:
+                continue
+            for field in fields:
+                value = params.get(field)
+                if value is not None:
+                    matrices[field][row, col] = value
+
+    flow_rate = matrices["flow_rate"]
+    flow_rate[np.isnan(flow_rate)] = 0.0
+    return ScenarioLoads(flow_rate, matrices["temperature"], matrices["molecular_weight"],
+                         matrices["viscosity"], matrices["max_backpressure"])
+
+def idle_discharge_points(loads):
+    """各工况未泄放（流量为0或未给出）的泄放点，形状 (工况数, 泄放节点数)
+
+    矩阵计算中未泄放的支路不产生压降，其背压取下游管道入口压力并照常校验；
+    单工况校验接口中这类泄放点求不出入口压力，判为不满足。
+    """
+    return loads.flow_rate == 0
+
+def aggregate_scenario_loads(network, loads):
+    """逐层向下游累加，得到各工况各管道的累计量，形状 (累计量, 工况数, 管道数)"""
+    q = loads.flow_rate[:, network.source_columns]
+    T = loads.temperature[:, network.source_columns]
+    M = loads.molecular_weight[:, network.source_columns]
+    mu = loads.viscosity[:, network.source_columns]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_M = np.sqrt(M)
+        flowing = q > 0
+        own = np.stack([
+            q,
+            np.where(flowing, q * T, 0.0),
+            np.where(flowing, q / M, 0.0),
+            np.where(flowing, q * sqrt_M, 0.0),
+            np.where(flowing, q * mu * sqrt_M, 0.0),
+        ])
+
+    # 管道在前的布局便于按管道编号累加：(管道数, 累计量, 工况数)
+    sums = np.zeros((network.pipe_count, LOAD_SUM_COUNT, loads.scenario_count))
+    sums[network.source_pipes] = own.transpose(2, 0, 1)
+    for children, parents in network.propagation:
+        np.add.at(sums, parents, sums[children])
+
+    sums[~network.reached] = np.nan
+    return sums.transpose(1, 2, 0)
+
+def evaluate_scenarios(network, loads):
+    """对全部工况一次性执行流量、温度、分子量、马赫数、摩擦系数与压力计算
+
+    与单工况计算规则一致；另外流量为0的管道（该工况下未泄放的支路）不产生压降。
+    """
+    sums = aggregate_scenario_loads(network, loads)
+    flow = sums[0]
+    properties = mixture_properties(*sums)
+
+    roughness = network.roughness
+    if loads.roughness_scale is not None:
+        roughness = loads.roughness_scale[:, None] * roughness
+
+    mach = round_like_python(solve_mach_numbers(flow, properties.temperature, properties.molecular_weight,
+                                                network.cross_area, sound_speed=properties.sound_speed), 2)
+    reynolds = solve_reynolds_numbers(flow, network.diameter, properties.viscosity)
+    friction = round_like_python(solve_friction_factors(reynolds, roughness, network.diameter / 1000), 6)
+
+    outlet_pressure, inlet_pressure = propagate_scenario_pressures(network, flow, mach, friction)
+
+    return ScenarioResults(flow, properties.temperature, properties.molecular_weight, mach,
+                           round_like_python(reynolds, 2), friction, outlet_pressure, inlet_pressure)
+
+def propagate_scenario_pressures(network, flow, mach, friction):
+    """自火炬逐层向上游求各工况入口压力，每层所有工况一次求解"""
+    shape = flow.shape
+    outlet_pressure = np.full(shape, np.nan)
+    inlet_pressure = np.full(shape, np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fLD_all = friction * network.equivalent_length / network.diameter
+
+    for level in network.levels:
+        parents = network.pipe_parent[level]
+        P2 = np.where(parents == -1, network.flare_pressure, inlet_pressure[:, parents])
+        outlet_pressure[:, level] = P2
+
+        x, _ = solve_pressure_ratios(fLD_all[:, level], mach[:, level])
+        x = np.where(flow[:, level] == 0, 1.0, x)
+        inlet_pressure[:, level] = np.where(P2 > 0, P2 / x, np.nan)
+
+    return outlet_pressure, inlet_pressure
+
+def scenario_qualification(network, loads, results):
+    """各工况各泄放点背压与裕量（允许背压 - 实际背压），返回 (是否合格, 背压, 裕量)"""
+    has_pipe = network.discharge_pipe_ids != -1
+    backpressure = np.full(loads.flow_rate.shape, np.nan)
+    backpressure[:, has_pipe] = results.inlet_pressure[:, network.discharge_pipe_ids[has_pipe]]
+    backpressure = round_like_python(backpressure, 2)
+
+    margin = loads.max_backpressure - backpressure
+    # 与单工况一致：未求得入口压力的泄放点视为不满足
+    satisfied = margin >= 0
+    qualified = np.all(satisfied | ~has_pipe, axis=1)
+    return qualified, backpressure, margin
@@ -0,0 +1,190 @@
+import math
+import random
+from config import SIZING_CONFIG
+from utils.pipe_sizer import cross_area_for_diameter
+
+FLARE_NODE = "FLARE"
+KNOCKOUT_NODE = "KO"
+ROUGHNESS = 0.000045  # 商品钢管，m
+
+def _split(count, parts):
+    """将 count 尽量均分为 parts 份，去掉为0的份"""
+    return [share for share in (count // parts + (i < count % parts) for i in range(parts)) if share > 0]
+
+def _sound_speed_factor(q, qT, q_div_M):
+    """按混合平均温度、分子量估算声速 √(8314·T/M)"""
+    return math.sqrt(8314 * (qT / q) / (q / q_div_M))
+
+class _NetworkBuilder:
+    """按 主管 → 装置总管 → 分支管 → 安全阀出口管 的层次生成管网，管径按设计马赫数选取"""
+
+    def __init__(self, rnd, branching, depth, tie_ins_per_node, flow_range, header_mach, tailpipe_mach):
+        self.rnd = rnd
+        self.branching = branching
+        self.depth = depth
+        self.tie_ins_per_node = tie_ins_per_node
+        self.flow_range = flow_range
+        self.header_mach = header_mach
+        self.tailpipe_mach = tailpipe_mach
+        self.catalog = SIZING_CONFIG['diameter_catalog']
+        self.graph = {}
+        self.outlet_diameters = {}  # 节点 -> 其出口管管径
+        self.pipes = []
+        self.discharge_points = []
+
+    def diameter_for(self, q, qT, q_div_M, mach):
+        """管道马赫数不超过 mach 的最小管径：优先取标准管径系列，超出系列时按 100 mm 向上取整"""
+        # 马赫数 = (q/3600) / (A/10⁴ · 10⁵) · 声速，A 单位 cm²
+        min_area = q / 3600 * _sound_speed_factor(q, qT, q_div_M) / mach * 0.1
+        min_diameter = 20 * math.sqrt(min_area / math.pi)
+        for diameter in self.catalog:
+            if diameter >= min_diameter:
+                return diameter
+        return 100 * math.ceil(min_diameter / 100)
+
+    def add_pipe(self, start, end, loads, length_range, mach, diameter=None):
+        """生成管道 start → end；未指定 diameter 时按累计泄放量 loads 与设计马赫数 mach 选取"""
+        self.graph.setdefault(end, []).append(start)
+        if diameter is None:
+            diameter = self.diameter_for(*loads, mach)
+        self.outlet_diameters.setdefault(start, diameter)
+        self.pipes.append({
+            "pipe_id": f"{start}->{end}",
+            "equivalent_length": round(self.rnd.uniform(*length_range), 1),
+            "diameter": diameter,
+            "roughness": ROUGHNESS,
+            "cross_area": float(cross_area_for_diameter(diameter))
+        })
+
+    def add_crossover(self, start, end, length_range):
+        """两总管节点间的跨接管，管径取两节点出口管中较小者（形成环路）"""
+        diameter = min(self.outlet_diameters[start], self.outlet_diameters[end])
+        self.add_pipe(start, end, None, length_range, None, diameter)
+
+    def add_discharge_point(self, node):
+        rnd = self.rnd
+        set_pressure = rnd.uniform(1.5e6, 5e6)
+        point = {
+            "node_id": node,
+            "flow_rate": round(rnd.uniform(*self.flow_range), 1),
+            "pressure": round(set_pressure),
+            "temperature": round(rnd.uniform(290, 480), 1),
+            "molecular_weight": round(rnd.uniform(16, 80), 2),
+            # 常规安全阀约 10%，背压平衡式可达 50%
+            "max_backpressure": round(set_pressure * rnd.uniform(0.1, 0.5)),
+            "viscosity": round(rnd.uniform(8e-6, 2e-5), 8)
+        }
+        self.discharge_points.append(point)
+        q = point["flow_rate"]
+        return q, q * point["temperature"], q / point["molecular_weight"]
+
+    def build_header(self, node, count, level):
+        """在 node 上游生成含 count 个泄放点的分支，返回累计 (Σq, Σq·T, Σq/M)"""
+        if level >= self.depth:
+            return self.build_subheader(node, count)
+        totals = [0.0, 0.0, 0.0]
+        for k, share in enumerate(_split(count, self.branching), 1):
+            child = f"{node}-{k}"
+            loads = self.build_header(child, share, level + 1)
+            self.add_pipe(child, node, loads, (50, 300) if level == 0 else (20, 150), self.header_mach)
+            totals = [a + b for a, b in zip(totals, loads)]
+        return tuple(totals)
+
+    def build_subheader(self, node, count):
+        """末级分支管：沿管段依次接入安全阀出口管，每个节点最多接 tie_ins_per_node 个"""
+        segments = _split(count, math.ceil(count / self.tie_ins_per_node))
+        chain = [node] + [f"{node}.{k}" for k in range(1, len(segments))]
+        segment_loads = []
+        for segment_node, tie_ins in zip(chain, segments):
+            totals = [0.0, 0.0, 0.0]
+            for j in range(1, tie_ins + 1):
+                psv = f"PSV-{len(self.discharge_points) + 1:06d}"
+                loads = self.add_discharge_point(psv)
+                self.add_pipe(psv, segment_node, loads, (5, 40), self.tailpipe_mach)
+                totals = [a + b for a, b in zip(totals, loads)]
+            segment_loads.append(totals)
+        # 自链尾向 node 累加，逐段生成分支管管段
+        upstream = [0.0, 0.0, 0.0]
+        for k in range(len(chain) - 1, 0, -1):
+            upstream = [a + b for a, b in zip(upstream, segment_loads[k])]
+            self.add_pipe(chain[k], chain[k - 1], tuple(upstream), (10, 60), self.header_mach)
+        return tuple(a + b for a, b in zip(upstream, segment_loads[0]))
+
+def generate_flare_network(discharge_count, depth=3, branching=4, header_segments=3, tie_ins_per_node=2,
+                           flow_range=(1000, 50000), header_mach=0.3, tailpipe_mach=0.5, crossovers=0, flares=1,
+                           seed=0, columnar=False):
+    """生成合成火炬管网请求（格式同校验接口）
+
+    结构：各装置总管接入主管的不同管段，主管经分液罐接至火炬；装置总管逐级分出 branching 个分支管，
+    共 depth 级；末级分支管沿程接入安全阀出口管。泄放点在各分支间均分。
+    管径按累计泄放量取设计马赫数（总管 header_mach、出口管 tailpipe_mach）下的最小标准管径。
+    crossovers 为随机选取的两总管节点间增加的跨接管数（形成环路）；flares > 1 时主管远端经
+    KO-k 另接火炬 FLARE-k（k = 2 … flares），flare_node 为火炬节点列表。二者均需用管网求解器计算。
+    columnar=True 时 pipes 与 discharge_points 按列式格式输出。
+    """
+    if discharge_count < 1:
+        raise ValueError("泄放点数至少为1")
+    if depth < 1 or branching < 1 or header_segments < 1 or tie_ins_per_node < 1 or flares < 1:
+        raise ValueError("depth、branching、header_segments、tie_ins_per_node、flares 需为正整数")
+    if crossovers < 0:
+        raise ValueError("crossovers 不能为负数")
+
+    builder = _NetworkBuilder(random.Random(seed), branching, depth, tie_ins_per_node,
+                              flow_range, header_mach, tailpipe_mach)
+
+    # 装置总管（第1级分支）依次接入主管各管段节点 MH-1 … MH-n
+    main_nodes = [f"MH-{k}" for k in range(1, header_segments + 1)]
+    node_loads = {node: [0.0, 0.0, 0.0] for node in main_nodes}
+    for k, share in enumerate(_split(discharge_count, branching), 1):
+        unit_header = f"U{k}"
+        loads = builder.build_header(unit_header, share, 1)
+        attach = main_nodes[(k - 1) % header_segments]
+        builder.add_pipe(unit_header, attach, loads, (50, 300), builder.header_mach)
+        node_loads[attach] = [a + b for a, b in zip(node_loads[attach], loads)]
+
+    # 主管自远端向分液罐累加；未接入装置总管的远端管段不生成
+    upstream = [0.0, 0.0, 0.0]
+    chain = [KNOCKOUT_NODE] + main_nodes
+    for k in range(len(chain) - 1, 0, -1):
+        upstream = [a + b for a, b in zip(upstream, node_loads[chain[k]])]
+        if upstream[0] > 0:
+            builder.add_pipe(chain[k], chain[k - 1], tuple(upstream), (100, 400), builder.header_mach)
+    builder.add_pipe(KNOCKOUT_NODE, FLARE_NODE, tuple(upstream), (60, 120), builder.header_mach)
+    flare_nodes = [FLARE_NODE]
+    far_end = chain[-1] if chain[-1] in builder.outlet_diameters else KNOCKOUT_NODE
+    for k in range(2, flares + 1):
+        knockout, flare = f"{KNOCKOUT_NODE}-{k}", f"{FLARE_NODE}-{k}"
+        diameter = builder.outlet_diameters[far_end]
+        builder.add_pipe(far_end, knockout, None, (100, 400), None, diameter)
+        builder.add_pipe(knockout, flare, None, (60, 120), None, diameter)
+        flare_nodes.append(flare)
+
+    # 跨接管：两端取不同的总管节点（不含安全阀与火炬侧节点），已有管道相连的节点对不再跨接
+    header_nodes = sorted(node for node in builder.outlet_diameters
+                          if not node.startswith(("PSV-", KNOCKOUT_NODE)))
+    pairs = {frozenset((start, end)) for end, starts in builder.graph.items() for start in starts}
+    free_pairs = len(header_nodes) * (len(header_nodes) - 1) // 2 - sum(
+        1 for pair in pairs if pair <= set(header_nodes))
+    for _ in range(min(crossovers, free_pairs)):
+        while True:
+            start, end = builder.rnd.sample(header_nodes, 2)
+            if frozenset((start, end)) not in pairs:
+                break
+        pairs.add(frozenset((start, end)))
+        builder.add_crossover(start, end, (20, 150))
+
+    pipes = builder.pipes
+    discharge_points = builder.discharge_points
+    if columnar:
+        pipes = {field: [pipe[field] for pipe in pipes] for field in pipes[0]}
+        discharge_points = {field: [point[field] for point in discharge_points] for field in discharge_points[0]}
+
+    return {
+        "system_config": {
+            "connection_graph": builder.graph,
+            "discharge_nodes": [point["node_id"] for point in builder.discharge_points],
+            "flare_node": FLARE_NODE if flares == 1 else flare_nodes
+        },
+        "pipes": pipes,
+        "discharge_points": discharge_points
+    }
@@ -0,0 +1,116 @@
+import heapq
+import numpy as np
+
+class NetworkPartition:
+    """树状管网按主管节点切分：若干互不相交的子树组（各组可并行计算）与连接各组的主干管道
+
+    每组由若干完整子树组成，子树根管道的下游管道属于主干；各组管道总数大致均衡。
+    """
+
+    def __init__(self, levels, pipe_parent, pipe_depth, group_of, group_count):
+        self.levels = levels                  # 全管网按深度分层的管道编号数组
+        self.pipe_parent = pipe_parent
+        self.pipe_depth = pipe_depth
+        self.group_of = group_of              # 管道编号 -> 组号，主干为 -1
+        self.group_count = group_count
+
+        # 各组与主干按深度由浅到深的管道编号数组（跳过空层）
+        pipes = np.lexsort((pipe_depth, group_of))
+        keys = np.stack([group_of[pipes], pipe_depth[pipes]])
+        breaks = np.flatnonzero(np.any(keys[:, 1:] != keys[:, :-1], axis=0)) + 1
+        self.group_levels = [[] for _ in range(group_count)]
+        self.trunk_levels = []
+        for level in np.split(pipes, breaks):
+            group = group_of[level[0]]
+            (self.trunk_levels if group == -1 else self.group_levels[group]).append(level)
+
+    @property
+    def trunk_pipe_count(self):
+        return int(np.count_nonzero(self.group_of == -1))
+
+    def group_sizes(self):
+        return np.bincount(self.group_of[self.group_of >= 0], minlength=self.group_count)
+
+    def group_pipes(self, group):
+        """本组全部管道编号，group 为 -1 时为主干"""
+        levels = self.trunk_levels if group == -1 else self.group_levels[group]
+        return np.concatenate(levels) if levels else np.empty(0, dtype=int)
+
+    def propagation_steps(self, reached):
+        """累计量自上游向下游传递的步骤，按父管道所在组划分，返回 (各组步骤, 主干步骤)
+
+        每步为同一组、同一深度的父管道及其上游管道矩阵 (父管道, 子管道序号)，子管道按管道编号（即入口顺序）排列，
+        不足的位置填管道数（指向全零行）；步骤按深度由深到浅排列。逐列依次相加与逐管道求和的舍入一致。
+        reached 为参与累计的管道标记，其父管道均不是泄放点出口管道。
+        """
+        group_steps = [[] for _ in range(self.group_count)]
+        trunk_steps = []
+        children = np.flatnonzero(reached & (self.pipe_parent != -1))
+        if not len(children):
+            return group_steps, trunk_steps
+        parents = self.pipe_parent[children]
+        owner = self.group_of[parents]
+        depth = self.pipe_depth[parents]
+        order = np.lexsort((children, parents, -depth, owner))
+        children, parents, owner, depth = children[order], parents[order], owner[order], depth[order]
+
+        # 各子管道在其父管道入口中的序号，及父管道在步骤内的行号
+        first = np.r_[True, parents[1:] != parents[:-1]]
+        position = np.arange(len(parents))
+        rank = position - np.maximum.accumulate(np.where(first, position, 0))
+        row = np.cumsum(first) - 1
+        heads = np.flatnonzero(first)
+        head_parents = parents[heads]
+
+        step_start = np.flatnonzero(np.r_[True, (owner[1:] != owner[:-1]) | (depth[1:] != depth[:-1])])
+        step_stop = np.r_[step_start[1:], len(parents)]
+        widths = np.maximum.reduceat(rank, step_start) + 1
+        padding = len(self.pipe_parent)
+        for start, stop, width, step_owner in zip(step_start.tolist(), step_stop.tolist(), widths.tolist(),
+                                                  owner[step_start].tolist()):
+            rows = row[start:stop]
+            first_row, last_row = int(rows[0]), int(rows[-1])
+            matrix = np.full((last_row - first_row + 1, width), padding)
+            matrix[rows - first_row, rank[start:stop]] = children[start:stop]
+            steps = trunk_steps if step_owner == -1 else group_steps[step_owner]
+            steps.append((matrix, head_parents[first_row:last_row + 1]))
+        return group_steps, trunk_steps
+
+def partition_network(topology, group_count, split_factor=4):
+    """将树状管网切分为 group_count 组子树与主干
+
+    自火炬起反复将最大的子树在其根管道处切开（根管道归入主干），直到各子树管道数不超过
+    总数 / (group_count × split_factor)；再按管道数由大到小依次分给当前最轻的组。
+    """
+    pipe_count = topology.pipe_count
+    pipe_parent = np.array(topology.pipe_parent, dtype=int)
+    pipe_depth = np.array(topology.pipe_depth, dtype=int)
+    levels = [np.array(level, dtype=int) for level in topology.levels]
+
+    # 各管道（含其上游）子树的管道数
+    subtree_size = np.ones(pipe_count, dtype=np.int64)
+    for level in reversed(levels[1:]):
+        np.add.at(subtree_size, pipe_parent[level], subtree_size[level])
+
+    target = max(1, pipe_count // (group_count * split_factor))
+    subtrees = [(-int(subtree_size[pipe_id]), pipe_id) for pipe_id in (levels[0] if levels else [])]
+    heapq.heapify(subtrees)
+    pipe_children = topology.pipe_children
+    while subtrees and -subtrees[0][0] > target:
+        _, pipe_id = heapq.heappop(subtrees)
+        for child in pipe_children[pipe_id]:
+            heapq.heappush(subtrees, (-int(subtree_size[child]), child))
+
+    group_of = np.full(pipe_count, -1, dtype=int)
+    group_loads = [(0, group) for group in range(group_count)]
+    for size, root in sorted(subtrees):
+        load, group = heapq.heappop(group_loads)
+        group_of[root] = group
+        heapq.heappush(group_loads, (load - size, group))
+
+    # 子树内的管道归入其根管道所在组
+    for level in levels[1:]:
+        unassigned = group_of[level] == -1
+        group_of[level[unassigned]] = group_of[pipe_parent[level[unassigned]]]
+
+    return NetworkPartition(levels, pipe_parent, pipe_depth, group_of, group_count)
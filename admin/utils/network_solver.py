@@ -0,0 +1,741 @@
+import math
+from collections import deque
+import numpy as np
+from utils.data_mapper import FLARE_OUTLET_PRESSURE
+from utils.pressure_ratio_solver import solve_ratio_variables
+from utils.pressure_calculator import solve_level_ratios
+from utils.vectorized_solver import (LN10, as_float_array, round_like_python, solve_mach_numbers,
+                                     solve_reynolds_numbers, solve_friction_factors)
+from utils.instrumentation import StageTimer, iteration_summary
+from utils.mixture_properties import mixture_properties
+
+# 牛顿迭代收敛判据：各回路 ln P 闭合残差上限（相对压力误差）
+NEWTON_TOL = 1e-9
+NEWTON_MAX_ITER = 50
+# 线搜索最多折半次数
+LINE_SEARCH_STEPS = 8
+# 回路数不超过 DENSE_MAX_LOOPS 时直接求解稠密雅可比矩阵，否则用预条件共轭梯度法：
+# 不超过 PRECONDITIONED_MAX_LOOPS 时以复用的雅可比矩阵逆预条件（超过 REFACTOR_ITERATIONS 次迭代时重新求逆），
+# 更多时用 Jacobi 预条件
+DENSE_MAX_LOOPS = 500
+PRECONDITIONED_MAX_LOOPS = 4000
+REFACTOR_ITERATIONS = 30
+
+# 只有单工况校验接口支持一般管网，其余接口遇到时返回的提示
+LOOPED_NETWORK_UNSUPPORTED = "含分流、环路或多个火炬节点的管网目前仅单工况校验接口 /check 支持"
+
+def is_looped_network(connection_graph, flare_node):
+    """多个火炬节点，或存在出口管道不止一根的节点（分流、跨接管、环路）时需用管网求解器"""
+    if isinstance(flare_node, (list, tuple)):
+        return True
+    seen = set()
+    for start_nodes in connection_graph.values():
+        for node in start_nodes:
+            if node in seen:
+                return True
+            seen.add(node)
+    return False
+
+def _ragged_indices(indptr, rows):
+    """CSR 中若干行的元素下标（按行依次拼接）"""
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.intp)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+def _csr(keys, size):
+    """按 keys 稳定分组：返回 (indptr, 按组排列的元素下标)，组内保持原顺序"""
+    order = np.argsort(keys, kind='stable')
+    indptr = np.zeros(size + 1, dtype=np.intp)
+    np.cumsum(np.bincount(keys, minlength=size), out=indptr[1:])
+    return indptr, order
+
+class PipeNetwork:
+    """编译后的一般管网：可含分流、跨接管与环路，可有多个火炬节点
+
+    节点与管道编号同 NetworkTopology（管道名 "起点->终点"，按 connection_graph 遍历顺序），
+    map_request_to_pipe_store 可直接使用。
+    求解结构在编译时一次建立，各次牛顿迭代复用：
+    - 以各火炬节点为根的生成森林：树管道流量由质量守恒确定，是回路流量的线性函数；
+    - 回路：每根不在森林中的管道（弦）与森林中的路径构成一个回路（两端属于不同火炬时经两个火炬闭合），
+      回路关联矩阵 K（回路 × 管道，元素 ±1）以 COO 形式保存；
+    - 雅可比矩阵 K·diag(dφ/dq)·Kᵀ 的段结构：经过回路集合相同的管道合并为一段，
+      每段对矩阵的贡献为该段 Σdφ/dq 乘以固定的符号外积；
+    - 不在回路上的管道（桥）及其汇入回路节点的常量泄放量。
+    泄放点为源点，终点为泄放点的管道与不能到达火炬的管道不参与计算（同树状管网）。
+    """
+
+    def __init__(self, node_names, pipe_start, pipe_end, flare_indices, discharge_indices):
+        self.node_names = node_names
+        self.node_index = {name: i for i, name in enumerate(node_names)}
+        self.flare_indices = flare_indices
+        self.discharge_indices = discharge_indices        # 节点编号 -> 泄放点序号
+
+        node_count = len(node_names)
+        pipe_count = len(pipe_start)
+        self.pipe_start = np.asarray(pipe_start, dtype=np.intp)
+        self.pipe_end = np.asarray(pipe_end, dtype=np.intp)
+        self.pipe_names = [f"{node_names[s]}->{node_names[e]}" for s, e in zip(pipe_start, pipe_end)]
+        self.pipe_index = {name: i for i, name in enumerate(self.pipe_names)}
+
+        # 映射接口同 NetworkTopology（火炬出口压力在求解时按火炬节点设定）
+        self.flare_index = flare_indices[0]
+        self.node_inlet_pipes = [[] for _ in range(node_count)]
+        for pipe_id, end in enumerate(pipe_end):
+            self.node_inlet_pipes[end].append(pipe_id)
+
+        # 终点为泄放点的管道不参与计算
+        active = [end not in discharge_indices for end in pipe_end]
+        adjacency = [[] for _ in range(node_count)]
+        for pipe_id, (start, end) in enumerate(zip(pipe_start, pipe_end)):
+            if active[pipe_id]:
+                adjacency[start].append(pipe_id)
+                adjacency[end].append(pipe_id)
+
+        # 自各火炬节点广度优先生成森林
+        root = [-1] * node_count
+        parent_pipe = [-1] * node_count
+        parent_node = [-1] * node_count
+        depth = [0] * node_count
+        queue = deque()
+        for flare in flare_indices:
+            if root[flare] == -1:
+                root[flare] = flare
+                queue.append(flare)
+        while queue:
+            node = queue.popleft()
+            for pipe_id in adjacency[node]:
+                other = pipe_start[pipe_id] if pipe_end[pipe_id] == node else pipe_end[pipe_id]
+                if root[other] == -1:
+                    root[other] = root[node]
+                    parent_pipe[other] = pipe_id
+                    parent_node[other] = node
+                    depth[other] = depth[node] + 1
+                    queue.append(other)
+
+        self.reached = np.array([r != -1 for r in root], dtype=bool)
+        self.parent_pipe = np.array(parent_pipe, dtype=np.intp)
+        self.parent_node = np.array(parent_node, dtype=np.intp)
+        self.depth = np.array(depth, dtype=np.intp)
+        is_tree_pipe = np.zeros(pipe_count, dtype=bool)
+        is_tree_pipe[self.parent_pipe[self.parent_pipe >= 0]] = True
+        self.active = np.array(active, dtype=bool) & self.reached[self.pipe_start] & self.reached[self.pipe_end]
+
+        # 树管道方向：起点为子节点（管道名方向指向火炬）时为 +1
+        self.pipe_sign = np.ones(pipe_count)
+        children = np.flatnonzero(self.parent_pipe >= 0)
+        self.pipe_sign[self.parent_pipe[children]] = np.where(
+            self.pipe_start[self.parent_pipe[children]] == children, 1.0, -1.0)
+
+        # 自深到浅逐层累加子树泄放量，同层按管道编号排列（求和顺序同树状管网的后序遍历）
+        self.tree_levels = []
+        max_depth = int(self.depth[children].max()) if len(children) else 0
+        for level in range(max_depth, 0, -1):
+            nodes = children[self.depth[children] == level]
+            self.tree_levels.append(nodes[np.argsort(self.parent_pipe[nodes], kind='stable')])
+
+        self.chords = np.flatnonzero(self.active & ~is_tree_pipe)
+        self._build_loops(parent_pipe, parent_node, depth)
+
+        # 不在回路上的管道均为"桥"：上游一侧不含火炬，流量与累计量恒为其子树泄放量之和。
+        # 牛顿迭代中只需对回路管道逐层混合，汇入回路节点的桥按常量注入
+        in_loop = np.zeros(pipe_count, dtype=bool)
+        in_loop[self.loop_pipe_ids] = True
+        on_loop = np.zeros(node_count, dtype=bool)
+        on_loop[self.pipe_start[in_loop]] = True
+        on_loop[self.pipe_end[in_loop]] = True
+        self.bridge_children = children[~in_loop[self.parent_pipe[children]] & on_loop[self.parent_node[children]]]
+
+    def _build_loops(self, parent_pipe, parent_node, depth):
+        """回路关联矩阵与雅可比矩阵的段结构"""
+        pipe_start = self.pipe_start
+        pipe_end = self.pipe_end
+        pipe_sign = self.pipe_sign
+        loop_ids, loop_pipes, orientation = [], [], []
+
+        # 弦 s->e 的回路方程：u_s - u_e = φ(q_弦)，u 为 ln P，沿树路径 u_子 - u_父 = σ·φ(q)
+        for loop, chord in enumerate(self.chords.tolist()):
+            a, b = int(pipe_start[chord]), int(pipe_end[chord])
+            while a != b and not (parent_pipe[a] == -1 and parent_pipe[b] == -1):
+                if depth[a] >= depth[b] and parent_pipe[a] != -1:
+                    loop_ids.append(loop)
+                    loop_pipes.append(parent_pipe[a])
+                    orientation.append(1.0)
+                    a = parent_node[a]
+                else:
+                    loop_ids.append(loop)
+                    loop_pipes.append(parent_pipe[b])
+                    orientation.append(-1.0)
+                    b = parent_node[b]
+            loop_ids.append(loop)
+            loop_pipes.append(chord)
+            orientation.append(-1.0)
+
+        self.loop_count = len(self.chords)
+        loop_ids = np.asarray(loop_ids, dtype=np.intp)
+        loop_pipes = np.asarray(loop_pipes, dtype=np.intp)
+        orientation = np.asarray(orientation, dtype=float)
+        signs = np.where(np.isin(loop_pipes, self.chords), 1.0, pipe_sign[loop_pipes]) * orientation
+
+        # 回路经过的管道按局部编号保存，迭代中只需计算这些管道的压降
+        self.loop_pipe_ids, entry_pipe = np.unique(loop_pipes, return_inverse=True)
+        self.k_loop = loop_ids
+        self.k_pipe = entry_pipe
+        self.k_sign = signs
+
+        # 经过的回路（及方向）相同的管道合并为一段：K·D·Kᵀ = Σ_段 (ΣD) · o·oᵀ
+        by_pipe = np.lexsort((loop_ids, entry_pipe))
+        segments = {}
+        segment_of_pipe = np.zeros(len(self.loop_pipe_ids), dtype=np.intp)
+        segment_entries = []
+        bounds = np.flatnonzero(np.diff(entry_pipe[by_pipe])) + 1
+        for group in np.split(by_pipe, bounds) if len(by_pipe) else []:
+            key = tuple(zip(loop_ids[group].tolist(), orientation[group].tolist()))
+            segment = segments.get(key)
+            if segment is None:
+                segment = segments[key] = len(segment_entries)
+                segment_entries.append(key)
+            segment_of_pipe[entry_pipe[group[0]]] = segment
+        self.segment_of_pipe = segment_of_pipe
+        self.segment_count = len(segment_entries)
+
+        # 各段经过的 (回路, 方向)：K·D·Kᵀ = S·diag(ΣD)·Sᵀ，S 为回路-段关联矩阵
+        self.s_segment = np.repeat(np.arange(self.segment_count), [len(entries) for entries in segment_entries])
+        self.s_loop = np.array([loop for entries in segment_entries for loop, _ in entries], dtype=np.intp)
+        self.s_sign = np.array([o for entries in segment_entries for _, o in entries], dtype=float)
+        self._dense_incidence = None
+
+    @property
+    def pipe_count(self):
+        return len(self.pipe_names)
+
+    @property
+    def node_count(self):
+        return len(self.node_names)
+
+    def subtree_sums(self, source):
+        """各节点在生成树中的子树累计量（source 的最后一维为节点）"""
+        subtree = source.copy()
+        for nodes in self.tree_levels:
+            np.add.at(subtree, (..., self.parent_node[nodes]), subtree[..., nodes])
+        return subtree
+
+    def loop_sources(self, source_loads):
+        """回路节点的常量注入：自身泄放量 + 汇入的桥的子树累计量"""
+        injection = source_loads.copy()
+        if len(self.bridge_children):
+            subtree = self.subtree_sums(source_loads)
+            np.add.at(injection, (..., self.parent_node[self.bridge_children]), subtree[..., self.bridge_children])
+        return injection
+
+    def tree_flows(self, source):
+        """回路流量为0时的管道流量（管道名方向为正）：树管道流量为其子树泄放量之和"""
+        subtree = self.subtree_sums(source)
+        flows = np.zeros(self.pipe_count)
+        children = np.flatnonzero(self.parent_pipe >= 0)
+        pipes = self.parent_pipe[children]
+        flows[pipes] = self.pipe_sign[pipes] * subtree[children]
+        flows[~self.active] = np.nan
+        return flows
+
+    def loop_flows_to_pipe_flows(self, base_flows, loop_flows):
+        """q = q₀ - Kᵀ·w"""
+        flows = base_flows.copy()
+        if self.loop_count:
+            correction = np.bincount(self.k_pipe, self.k_sign * loop_flows[self.k_loop],
+                                     minlength=len(self.loop_pipe_ids))
+            flows[self.loop_pipe_ids] -= correction
+        return flows
+
+    def loop_residuals(self, drops):
+        """各回路 ln P 闭合残差 K·φ（drops 为回路管道的 φ，按局部编号）"""
+        return np.bincount(self.k_loop, self.k_sign * drops[self.k_pipe], minlength=self.loop_count)
+
+    def segment_derivatives(self, derivatives):
+        """各段 dφ/dq 之和（derivatives 按回路管道局部编号）"""
+        return np.bincount(self.segment_of_pipe, derivatives, minlength=self.segment_count)
+
+    def jacobian_product(self, segment_values, x):
+        """K·diag(dφ/dq)·Kᵀ·x（按段计算，不显式组装矩阵）"""
+        along = np.bincount(self.s_segment, self.s_sign * x[self.s_loop], minlength=self.segment_count)
+        return np.bincount(self.s_loop, self.s_sign * (segment_values * along)[self.s_segment],
+                           minlength=self.loop_count)
+
+    def jacobian_matrix(self, segment_values):
+        """组装稠密的 K·diag(dφ/dq)·Kᵀ：回路较少时按稠密的回路-段关联矩阵相乘，否则逐段累加外积"""
+        n = self.loop_count
+        if n <= DENSE_MAX_LOOPS:
+            if self._dense_incidence is None:
+                self._dense_incidence = np.zeros((n, self.segment_count))
+                self._dense_incidence[self.s_loop, self.s_segment] = self.s_sign
+            return (self._dense_incidence * segment_values) @ self._dense_incidence.T
+        matrix = np.zeros((n, n))
+        bounds = np.flatnonzero(np.diff(self.s_segment)) + 1
+        for loops, signs, value in zip(np.split(self.s_loop, bounds), np.split(self.s_sign, bounds),
+                                       segment_values):
+            matrix[np.ix_(loops, loops)] += value * np.outer(signs, signs)
+        return matrix
+
+    def jacobian_diagonal(self, segment_values):
+        return np.bincount(self.s_loop, segment_values[self.s_segment], minlength=self.loop_count)
+
+    def __repr__(self):
+        return (f"PipeNetwork(flares={[self.node_names[i] for i in self.flare_indices]}, "
+                f"nodes={self.node_count}, pipes={self.pipe_count}, loops={self.loop_count})")
+
+
+def compile_pipe_network(connection_graph, flare_nodes, discharge_nodes):
+    """将 connection_graph（终点 -> 起点列表）编译为 PipeNetwork，flare_nodes 为火炬节点或其列表"""
+    if isinstance(flare_nodes, str):
+        flare_nodes = [flare_nodes]
+    node_index = {}
+    node_names = []
+    pipe_start = []
+    pipe_end = []
+
+    def get_node_id(name):
+        node_id = node_index.get(name)
+        if node_id is None:
+            node_id = node_index[name] = len(node_names)
+            node_names.append(name)
+        return node_id
+
+    for end_node, start_nodes in connection_graph.items():
+        end_id = get_node_id(end_node)
+        for start_node in start_nodes:
+            pipe_start.append(get_node_id(start_node))
+            pipe_end.append(end_id)
+
+    if not flare_nodes:
+        raise ValueError("未指定火炬节点")
+    for flare in flare_nodes:
+        if flare not in node_index:
+            raise ValueError(f"火炬节点 {flare} 不在管网连接图中")
+
+    discharge_indices = {}
+    for i, node in enumerate(discharge_nodes):
+        if node in node_index:
+            discharge_indices.setdefault(node_index[node], i)
+
+    return PipeNetwork(node_names, pipe_start, pipe_end,
+                       [node_index[flare] for flare in flare_nodes], discharge_indices)
+
+class _FlowOrder:
+    """按当前流向对节点拓扑分层（上游在前），同时给出各层节点的入流、出流管道
+
+    pipes 给出时只对其中的管道分层（其余管道视为不存在）。
+    level_inlets、level_outlets 为各层的入流、出流管道在 self.pipes 中的下标，
+    入流管道按所入节点、管道编号排列（节点累计量的求和顺序同树状管网）。
+    """
+
+    def __init__(self, network, flows, pipes=None):
+        node_count = network.node_count
+        moving = np.flatnonzero(network.active & (flows != 0))
+        if pipes is not None:
+            moving = np.intersect1d(moving, pipes, assume_unique=True)
+        forward = flows[moving] > 0
+        self.pipes = moving
+        self.upstream = np.where(forward, network.pipe_start[moving], network.pipe_end[moving])
+        self.downstream = np.where(forward, network.pipe_end[moving], network.pipe_start[moving])
+
+        in_indptr, in_order = _csr(self.downstream, node_count)
+        out_indptr, out_order = _csr(self.upstream, node_count)
+
+        indegree = np.bincount(self.downstream, minlength=node_count)
+        frontier = np.flatnonzero(indegree == 0)
+        self.levels = []
+        self.level_inlets = []
+        self.level_outlets = []
+        done = 0
+        while len(frontier):
+            self.levels.append(frontier)
+            self.level_inlets.append(in_order[_ragged_indices(in_indptr, frontier)])
+            outlets = out_order[_ragged_indices(out_indptr, frontier)]
+            self.level_outlets.append(outlets)
+            done += len(frontier)
+            targets = self.downstream[outlets]
+            np.subtract.at(indegree, targets, 1)
+            targets = np.sort(targets[indegree[targets] == 0])
+            frontier = targets[np.r_[True, targets[1:] != targets[:-1]]] if len(targets) else targets
+        # 迭代过程中可能出现环流，剩余节点按编号附在最后（收敛解中不存在）
+        self.cyclic = done < node_count
+        if self.cyclic:
+            seen = np.zeros(node_count, dtype=bool)
+            for level in self.levels:
+                seen[level] = True
+            rest = np.flatnonzero(~seen)
+            self.levels.append(rest)
+            self.level_inlets.append(in_order[_ragged_indices(in_indptr, rest)])
+            self.level_outlets.append(out_order[_ragged_indices(out_indptr, rest)])
+
+def _source_loads(network, discharge_objects):
+    """各节点泄放量的 (q, q·T, q/M, q·√M, q·μ·√M)，算式同树状管网的泄放点管道"""
+    loads = np.zeros((5, network.node_count))
+    flow_rate = as_float_array(discharge_objects.flow_rate)
+    temperature = as_float_array(discharge_objects.temperature)
+    molecular_weight = as_float_array(discharge_objects.molecular_weight)
+    viscosity = as_float_array(discharge_objects.viscosity)
+    node_ids = np.fromiter(network.discharge_indices.keys(), dtype=np.intp, count=len(network.discharge_indices))
+    rows = np.fromiter(network.discharge_indices.values(), dtype=np.intp, count=len(node_ids))
+    if np.any(molecular_weight[rows] == 0):
+        bad = node_ids[np.flatnonzero(molecular_weight[rows] == 0)[0]]
+        raise ValueError(f"泄放点 {network.node_names[bad]} 分子量不能为0")
+    q = flow_rate[rows]
+    sqrt_M = np.sqrt(molecular_weight[rows])
+    loads[0, node_ids] = q
+    loads[1, node_ids] = temperature[rows] * q
+    loads[2, node_ids] = q / molecular_weight[rows]
+    loads[3, node_ids] = q * sqrt_M
+    loads[4, node_ids] = q * viscosity[rows] * sqrt_M
+    return loads
+
+def _mix_pipe_loads(network, order, flows, source_loads, outflow=None):
+    """按流向逐层混合：节点累计量 = 泄放量 + Σ入流管道累计量，出流管道按流量比例分配节点累计量
+
+    返回 (各管道累计量, 各节点累计量)，累计量依次为 Σq、Σq·T、Σq/M、Σq·√M、Σq·μ·√M，未参与计算的管道为 NaN。
+    order 只含部分管道时由 outflow 给出各节点的总出流量。
+    """
+    node_loads = np.zeros_like(source_loads)
+    pipe_loads = np.full((5, network.pipe_count), np.nan)
+    pipe_loads[:, network.active & (flows == 0)] = 0.0
+    speed = np.abs(flows)
+    for level, inlets, outlets in zip(order.levels, order.level_inlets, order.level_outlets):
+        np.add.at(node_loads, (..., order.downstream[inlets]), pipe_loads[:, order.pipes[inlets]])
+        node_loads[:, level] += source_loads[:, level]
+        if not len(outlets):
+            continue
+        upstream = order.upstream[outlets]
+        pipes = order.pipes[outlets]
+        level_outflow = outflow if outflow is not None else np.bincount(upstream, speed[pipes],
+                                                                          minlength=network.node_count)
+        share = speed[pipes] / level_outflow[upstream]
+        pipe_loads[:, pipes] = node_loads[:, upstream] * share
+    return pipe_loads, node_loads
+
+def _drop_coefficients(network, store, pipe_loads, node_loads, source_loads, pipes):
+    """回路管道的压降系数：马赫数、雷诺数与 |q| 之比（按混合物性，未取整）
+
+    无流量的管道（如初始的弦）取起点、终点节点的混合物性，均无流量时取全部泄放点的混合物性。
+    """
+    loads = pipe_loads[:, pipes].copy()
+    fallbacks = (node_loads[:, network.pipe_start[pipes]], node_loads[:, network.pipe_end[pipes]],
+                 source_loads.sum(axis=1)[:, None])
+    for fallback in fallbacks:
+        dry = ~(loads[0] > 0)
+        if not np.any(dry):
+            break
+        loads[:, dry] = np.broadcast_to(fallback, loads.shape)[:, dry]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        temperature = loads[1] / loads[0]
+        molecular_weight = loads[0] / loads[2]
+        viscosity = loads[4] / loads[3]
+        mach_per_flow = solve_mach_numbers(1.0, temperature, molecular_weight, store.cross_area[pipes])
+        reynolds_per_flow = solve_reynolds_numbers(1.0, store.diameter[pipes], viscosity)
+    return mach_per_flow, reynolds_per_flow
+
+def _pipe_drops(store, pipes, flows, mach_per_flow, reynolds_per_flow, previous=None):
+    """回路管道的 φ(q) = sign(q)·ln(P入/P出) 及 dφ/dq（混合物性固定），返回 (φ, dφ/dq, v)
+
+    ln(P入/P出) = ½·ln(1 + v)，v 满足 v/M² - ln(1 + v) = fL/D；
+    dv/dq = (2v/(M²·q) + (L/D)·df/dq) / (1/M² - 1/(1 + v))，df/dq 由 Colebrook 式隐函数求导。
+    """
+    speed = np.abs(flows)
+    diameter = store.diameter[pipes]
+    length_ratio = store.equivalent_length[pipes] / diameter  # 同树状管网，fL/D 中 D 以 mm 计
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        mach = mach_per_flow * speed
+        reynolds = reynolds_per_flow * speed
+        friction = solve_friction_factors(reynolds, store.roughness[pipes], diameter / 1000, tol=1e-12)
+
+        # Colebrook：F(y, Re) = y + 2·lg(ε/(3.7D) + 2.51·y/Re)，y = 1/√f
+        y = 1 / np.sqrt(friction)
+        a = store.roughness[pipes] / (3.7 * diameter / 1000)
+        b = 2.51 / reynolds
+        arg = a + b * y
+        dy_dRe = (2 * b * y / (reynolds * arg * LN10)) / (1 + 2 * b / (arg * LN10))
+        df_dq = -2 / (y ** 3) * dy_dRe * reynolds_per_flow
+
+        v, _ = solve_ratio_variables(friction * length_ratio, mach, previous)
+        dv_dq = (2 * v / (mach * mach * speed) + length_ratio * df_dq) / (1 / (mach * mach) - 1 / (1 + v))
+        drops = 0.5 * np.log1p(v) * np.sign(flows)
+        derivatives = 0.5 * dv_dq / (1 + v)
+
+    still = speed == 0
+    drops[still] = 0.0
+    derivatives[still] = 0.0
+    if not np.all(np.isfinite(drops)):
+        bad = pipes[np.flatnonzero(~np.isfinite(drops))[0]]
+        raise ValueError(f"管道 {store.names[bad]} 参数不完整或非法，无法计算压降")
+    derivatives = np.where(np.isfinite(derivatives) & (derivatives > 0), derivatives, 0.0)
+    return drops, derivatives, v
+
+class _JacobianSolver:
+    """牛顿方程 K·D·Kᵀ·Δw = r 的求解（D 取下限，避免无流量管道使矩阵奇异）
+
+    回路较少时每次组装稠密矩阵直接求解；回路较多时用共轭梯度法（矩阵与向量之积按段计算，不组装矩阵），
+    预条件矩阵为某次迭代雅可比矩阵的逆，在后续迭代中复用，共轭梯度迭代次数过多时才重新求逆；
+    回路更多时用 Jacobi 预条件。
+    """
+
+    def __init__(self, network):
+        self.network = network
+        self.inverse = None
+
+    def solve(self, derivatives, residuals, tol):
+        """tol 为共轭梯度法的相对残差要求（非精确牛顿法）"""
+        network = self.network
+        floor = 1e-9 * derivatives.max() if derivatives.size and derivatives.max() > 0 else 1.0
+        segment_values = network.segment_derivatives(np.maximum(derivatives, floor))
+        if network.loop_count <= DENSE_MAX_LOOPS:
+            return np.linalg.solve(network.jacobian_matrix(segment_values), residuals)
+
+        def matvec(x):
+            return network.jacobian_product(segment_values, x)
+        if network.loop_count > PRECONDITIONED_MAX_LOOPS:
+            diagonal = network.jacobian_diagonal(segment_values)
+            return _conjugate_gradient(matvec, lambda r: r / diagonal, residuals, tol)[0]
+
+        if self.inverse is None:
+            self.inverse = np.linalg.inv(network.jacobian_matrix(segment_values))
+        step, iterations = _conjugate_gradient(matvec, lambda r: self.inverse @ r, residuals, tol)
+        if iterations > REFACTOR_ITERATIONS:
+            self.inverse = None
+        return step
+
+def _conjugate_gradient(matvec, precondition, rhs, tol=1e-10, max_iter=None):
+    """对称正定矩阵的预条件共轭梯度法，返回 (解, 迭代次数)"""
+    x = np.zeros(len(rhs))
+    r = rhs.copy()
+    z = precondition(r)
+    p = z.copy()
+    rz = r @ z
+    target = tol * np.linalg.norm(rhs)
+    iterations = 0
+    for iterations in range(max_iter or 10 * len(rhs)):
+        if np.linalg.norm(r) <= target:
+            break
+        Ap = matvec(p)
+        alpha = rz / (p @ Ap)
+        x += alpha * p
+        r -= alpha * Ap
+        z = precondition(r)
+        rz_next = r @ z
+        p = z + (rz_next / rz) * p
+        rz = rz_next
+    return x, iterations
+
+def solve_network_flows(network, store, source_loads, stats=None):
+    """阻尼牛顿法求解回路流量，返回 (管道流量, 管道累计量, 流向分层)
+
+    未知量为各弦（回路）流量 w，管道流量 q = q₀ - Kᵀ·w 始终满足质量守恒；
+    方程为各回路 ln P 闭合：r(w) = K·φ(q) = 0，雅可比矩阵 K·diag(dφ/dq)·Kᵀ 对称正定。
+    混合物性（温度、分子量、黏度）随流向与分流比变化，每次迭代按当前流量重算（迭代内固定）；
+    牛顿步按 |r| 回溯线搜索。
+    迭代中只对回路管道混合（桥按常量注入），流向不变时沿用分层。无回路时直接为树状管网的流量。
+    """
+    base_flows = network.tree_flows(source_loads[0])
+    loop_flows = np.zeros(network.loop_count)
+    flows = base_flows
+    pipes = network.loop_pipe_ids
+    iterations = 0
+    residual = 0.0
+    previous = None
+    loop_sources = network.loop_sources(source_loads) if network.loop_count else None
+    directions = None
+    jacobian = _JacobianSolver(network)
+
+    while network.loop_count:
+        # 分层只取决于流向，流向不变时沿用
+        if directions is None or not np.array_equal(directions, np.sign(flows[pipes])):
+            directions = np.sign(flows[pipes])
+            order = _FlowOrder(network, flows, pipes)
+        moving = network.active & (flows != 0)
+        upstream = np.where(flows[moving] > 0, network.pipe_start[moving], network.pipe_end[moving])
+        outflow = np.bincount(upstream, np.abs(flows[moving]), minlength=network.node_count)
+        pipe_loads, node_loads = _mix_pipe_loads(network, order, flows, loop_sources, outflow)
+        mach_per_flow, reynolds_per_flow = _drop_coefficients(network, store, pipe_loads, node_loads, source_loads,
+                                                              pipes)
+        drops, derivatives, previous = _pipe_drops(store, pipes, flows[pipes], mach_per_flow, reynolds_per_flow,
+                                                   previous)
+        residuals = network.loop_residuals(drops)
+        residual = float(np.abs(residuals).max())
+        if residual <= NEWTON_TOL:
+            break
+        if iterations >= NEWTON_MAX_ITER:
+            raise ValueError(f"管网求解未收敛（{NEWTON_MAX_ITER} 次迭代后回路压力残差 {residual:.3g}）")
+        iterations += 1
+
+        step = jacobian.solve(derivatives, residuals, min(1e-2, residual))
+        norm = np.linalg.norm(residuals)
+        alpha = 1.0
+        for _ in range(LINE_SEARCH_STEPS):
+            trial_loops = loop_flows + alpha * step
+            trial_flows = network.loop_flows_to_pipe_flows(base_flows, trial_loops)
+            trial_drops, _, _ = _pipe_drops(store, pipes, trial_flows[pipes], mach_per_flow, reynolds_per_flow,
+                                            previous)
+            if np.linalg.norm(network.loop_residuals(trial_drops)) < (1 - 1e-4 * alpha) * norm:
+                break
+            alpha /= 2
+
+        loop_flows = trial_loops
+        flows = trial_flows
+
+    if stats is not None:
+        stats["network"] = {
+            "loops": network.loop_count,
+            "iterations": iterations,
+            "residual": residual
+        }
+
+    order = _FlowOrder(network, flows)
+    if order.cyclic:
+        raise ValueError("管网求解结果存在环流")
+    return flows, _mix_pipe_loads(network, order, flows, source_loads)[0], order
+
+def solve_pipe_network(network, store, discharge_objects, timer=None, stats=None):
+    """一般管网（含环路、多火炬）单工况计算与校验，返回 (管道存储, 是否合格, 满足的泄放点, 不满足的泄放点)
+
+    流量分配由牛顿法按未取整的物性求得；各管道结果的计算与取整规则同树状管网（温度、分子量取整数，
+    马赫数、雷诺数2位小数，摩擦系数6位小数，压力2位小数），无回路时结果与树状管网完全一致
+    （有流量但马赫数取整为0的管道除外，见 _propagate_pressures）。
+    flow_rate 为负表示实际流向与管道名方向相反，入口/出口压力按实际流向。
+    节点有多根出流管道时，各路径推得的压力取最大值（保守），stats["network"]["pressure_closure"]
+    为各节点不同路径压力的最大相对差，反映取整对回路闭合的影响。
+    """
+    timer = timer or StageTimer()
+    with timer.stage("loads"):
+        source_loads = _source_loads(network, discharge_objects)
+    with timer.stage("flow"):
+        flows, pipe_loads, order = solve_network_flows(network, store, source_loads, stats)
+
+    active = network.active
+    with timer.stage("temperature"):
+        store.flow_rate[active] = np.sign(flows[active]) * pipe_loads[0, active]
+        speed = pipe_loads[0]
+        properties = mixture_properties(*pipe_loads)
+        temperature = properties.temperature
+        store.avg_temperature[:] = np.where(np.isnan(temperature), store.avg_temperature, temperature)
+    with timer.stage("molecular_weight"):
+        molecular_weight = properties.molecular_weight
+        store.avg_molecular_weight[:] = np.where(np.isnan(molecular_weight), store.avg_molecular_weight,
+                                                 molecular_weight)
+    with timer.stage("mach"):
+        mach = round_like_python(solve_mach_numbers(
+            speed, store.avg_temperature, store.avg_molecular_weight, store.cross_area,
+            sound_speed=properties.sound_speed), 2)
+        store.mach_number[:] = np.where(np.isnan(mach), store.mach_number, mach)
+    with timer.stage("friction"):
+        reynolds = solve_reynolds_numbers(speed, store.diameter, properties.viscosity)
+        friction = solve_friction_factors(reynolds, store.roughness, store.diameter / 1000)
+        store.reynolds_number[:] = round_like_python(reynolds, 2)
+        store.friction_factor[:] = round_like_python(friction, 6)
+    with timer.stage("pressure"):
+        node_pressure, closure, ratio_iterations = _propagate_pressures(network, store, flows, order)
+    if stats is not None:
+        stats["pressure_ratio"] = iteration_summary(ratio_iterations)
+        stats["network"]["reversed_pipes"] = int(np.count_nonzero(flows[active] < 0))
+        stats["network"]["pressure_closure"] = closure
+
+    with timer.stage("qualification"):
+        is_qualified, satisfied, not_satisfied = _qualify(network, store, discharge_objects, node_pressure)
+    return store, is_qualified, satisfied, not_satisfied
+
+def _pressure_steps(network, flows, order):
+    """逆流向推算压力的各步 (管道, 上游节点, 下游节点)，自火炬侧开始
+
+    无回路时按生成树深度分层，各层管道与树状管网的压力计算层一致（小层用标量求解，结果逐位相同）。
+    """
+    moving = network.active & (flows != 0)
+    if not network.loop_count:
+        steps = []
+        for nodes in reversed(network.tree_levels):
+            pipes = network.parent_pipe[nodes]
+            keep = moving[pipes]
+            steps.append((pipes[keep], nodes[keep], network.parent_node[nodes[keep]]))
+        return steps
+    steps = []
+    for outlets in reversed(order.level_outlets):
+        steps.append((order.pipes[outlets], order.upstream[outlets], order.downstream[outlets]))
+    return steps
+
+def _propagate_pressures(network, store, flows, order):
+    """自火炬节点逆流向逐层推算压力：P入 = P出 / x，x 按取整后的马赫数与摩擦系数求解"""
+    node_pressure = np.full(network.node_count, np.nan)
+    lowest = np.full(network.node_count, np.nan)
+    is_flare = np.zeros(network.node_count, dtype=bool)
+    is_flare[network.flare_indices] = True
+    node_pressure[is_flare] = FLARE_OUTLET_PRESSURE
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fLD = store.friction_factor * store.equivalent_length / store.diameter
+    iterations = []
+
+    for pipes, upstream, downstream in _pressure_steps(network, flows, order):
+        if not len(pipes):
+            continue
+        P2 = node_pressure[downstream]
+        known = ~np.isnan(P2)
+        store.outlet_pressure[pipes[known]] = P2[known]
+        mach = store.mach_number[pipes]
+        valid = known & (P2 > 0) & ~np.isnan(fLD[pipes])
+        solvable = valid & (mach > 0)
+        P1 = np.full(len(pipes), np.nan)
+        # 有流量但马赫数取整为0的管道（如流量很小的跨接管）压降低于显示精度，取 P入 = P出
+        # （树状管网此时不计算入口压力，其上游随之中断；环状管网中这类管道较常见）
+        P1[valid & (mach == 0)] = P2[valid & (mach == 0)]
+        if np.any(solvable):
+            x, level_iterations = solve_level_ratios(fLD[pipes][solvable], mach[solvable])
+            iterations.append(level_iterations)
+            with np.errstate(invalid='ignore'):
+                P1[solvable] = P2[solvable] / x
+        ok = ~np.isnan(P1)
+        store.inlet_pressure[pipes[ok]] = round_like_python(P1[ok], 2)
+        free = ok & ~is_flare[upstream]
+        highest = np.where(np.isnan(node_pressure), -np.inf, node_pressure)
+        np.maximum.at(highest, upstream[free], P1[free])
+        node_pressure = np.where(np.isinf(highest), np.nan, highest)
+        low = np.where(np.isnan(lowest), np.inf, lowest)
+        np.minimum.at(low, upstream[free], P1[free])
+        lowest = np.where(np.isinf(low), np.nan, low)
+    iterations = np.concatenate(iterations) if iterations else np.zeros(0, dtype=int)
+
+    # 无流量的管道与终点为泄放点的管道：出口压力取管道名终点压力，入口压力不计算（同树状管网）
+    still = np.flatnonzero(~(network.active & (flows != 0)))
+    end_pressure = node_pressure[network.pipe_end[still]]
+    known = ~np.isnan(end_pressure)
+    store.outlet_pressure[still[known]] = end_pressure[known]
+
+    with np.errstate(invalid='ignore'):
+        spread = (node_pressure - lowest) / node_pressure
+    closure = float(np.nanmax(spread)) if np.any(~np.isnan(spread)) else 0.0
+    return node_pressure, closure, iterations
+
+def _qualify(network, store, discharge_objects, node_pressure):
+    """各泄放点背压（所在节点压力，保留2位小数）与允许背压比较，泄放点顺序按其首根出口管道编号
+
+    出口管道均未参与计算（如位于另一泄放点上游）的泄放点记为未计算入口压力（同树状管网）。
+    """
+    max_backpressure = as_float_array(discharge_objects.max_backpressure)
+    satisfied = []
+    not_satisfied = []
+    seen = set()
+    for node in network.pipe_start.tolist():
+        row = network.discharge_indices.get(node)
+        if row is None or node in seen:
+            continue
+        seen.add(node)
+        name = network.node_names[node]
+        pressure = node_pressure[node]
+        if math.isnan(pressure):
+            not_satisfied.append((name, "未计算入口压力"))
+            continue
+        actual = round(float(pressure), 2)
+        safe = float(max_backpressure[row])
+        if actual <= safe:
+            satisfied.append((name, actual, safe))
+        else:
+            not_satisfied.append((name, actual, safe))
+    return len(not_satisfied) == 0, satisfied, not_satisfied
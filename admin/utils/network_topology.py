@@ -0,0 +1,143 @@
+class NetworkTopology:
+    """编译后的管网拓扑：节点/管道整数编号、后序遍历顺序及父子索引"""
+
+    def __init__(self, node_names, pipe_start, pipe_end, flare_index):
+        self.node_names = node_names                      # 节点编号 -> 节点名
+        self.node_index = {name: i for i, name in enumerate(node_names)}
+        self.flare_index = flare_index
+        self.flare_node = node_names[flare_index]
+
+        # 管道编号与 connection_graph 的遍历顺序一致（即 create_pipe_objects 的输出顺序）
+        self.pipe_start = pipe_start                      # 管道编号 -> 起点节点编号
+        self.pipe_end = pipe_end                          # 管道编号 -> 终点节点编号
+        self.pipe_names = [f"{node_names[s]}->{node_names[e]}" for s, e in zip(pipe_start, pipe_end)]
+        self.pipe_index = {name: i for i, name in enumerate(self.pipe_names)}
+        self.edge_index = {(node_names[s], node_names[e]): i
+                           for i, (s, e) in enumerate(zip(pipe_start, pipe_end))}
+
+        node_count = len(node_names)
+        pipe_count = len(pipe_start)
+
+        # 节点 -> 流入该节点的管道（上游），节点 -> 流出该节点的管道（下游）
+        self.node_inlet_pipes = [[] for _ in range(node_count)]
+        self.node_outlet_pipe = [-1] * node_count
+        for pipe_id in range(pipe_count):
+            self.node_inlet_pipes[pipe_end[pipe_id]].append(pipe_id)
+            start = pipe_start[pipe_id]
+            if self.node_outlet_pipe[start] != -1:
+                raise ValueError(f"节点 {node_names[start]} 存在多个出口管道，管网不是树状结构")
+            self.node_outlet_pipe[start] = pipe_id
+
+        # 管道父子关系：父管道为下游管道，子管道为上游管道
+        self.pipe_parent = [self.node_outlet_pipe[end] for end in pipe_end]
+        self.pipe_children = [self.node_inlet_pipes[start] for start in pipe_start]
+
+        # 从火炬节点出发的后序遍历（上游管道先于下游管道）及各管道深度
+        self.post_order = []
+        self.pipe_depth = [-1] * pipe_count
+        self._build_post_order()
+
+        # 按深度分层，第0层为直接接入火炬节点的管道
+        self.levels = []
+        for pipe_id in reversed(self.post_order):
+            depth = self.pipe_depth[pipe_id]
+            while len(self.levels) <= depth:
+                self.levels.append([])
+            self.levels[depth].append(pipe_id)
+
+    def _build_post_order(self):
+        """迭代深度优先遍历，同时检测环路"""
+        visiting = [False] * len(self.node_names)
+        stack = [(self.flare_index, iter(self.node_inlet_pipes[self.flare_index]), -1)]
+        visiting[self.flare_index] = True
+
+        while stack:
+            node, inlet_iter, pipe_id = stack[-1]
+            child_pipe = next(inlet_iter, None)
+            if child_pipe is None:
+                stack.pop()
+                if pipe_id != -1:
+                    self.post_order.append(pipe_id)
+                continue
+
+            start = self.pipe_start[child_pipe]
+            if visiting[start]:
+                raise ValueError(f"管网在节点 {self.node_names[start]} 处存在环路")
+            visiting[start] = True
+            self.pipe_depth[child_pipe] = len(stack) - 1
+            stack.append((start, iter(self.node_inlet_pipes[start]), child_pipe))
+
+    @property
+    def pipe_count(self):
+        return len(self.pipe_start)
+
+    @property
+    def node_count(self):
+        return len(self.node_names)
+
+    def align(self, pipe_list):
+        """按管道编号对齐管道对象列表，缺失的管道为 None"""
+        # 按同一拓扑创建的列存储已按管道编号排列
+        names = getattr(pipe_list, "names", None)
+        if names is not None and (names is self.pipe_names or names == self.pipe_names):
+            return pipe_list
+
+        if len(pipe_list) == len(self.pipe_names) and \
+           all(pipe.name == name for pipe, name in zip(pipe_list, self.pipe_names)):
+            return pipe_list
+
+        name_to_pipe = {pipe.name: pipe for pipe in pipe_list}
+        return [name_to_pipe.get(name) for name in self.pipe_names]
+
+    def reachable_pipes(self, blocking_nodes):
+        """自火炬节点可到达的管道标记（按管道编号），回溯在 blocking_nodes（节点编号集合，如泄放点）处终止"""
+        reached = [False] * self.pipe_count
+        pipe_end = self.pipe_end
+        pipe_parent = self.pipe_parent
+        for pipe_id in reversed(self.post_order):
+            parent = pipe_parent[pipe_id]
+            reached[pipe_id] = pipe_end[pipe_id] not in blocking_nodes and \
+                               (parent == -1 or reached[parent])
+        return reached
+
+    def index_discharge_points(self, discharge_objects):
+        """泄放点对象映射：节点编号 -> 泄放点对象（忽略不在管网中的泄放点）"""
+        node_index = self.node_index
+        return {node_index[point.node_id]: point
+                for point in discharge_objects if point.node_id in node_index}
+
+    def __repr__(self):
+        return f"NetworkTopology(flare={self.flare_node}, nodes={self.node_count}, pipes={self.pipe_count})"
+
+
+def compile_network_topology(connection_graph, flare_node=None):
+    """将 connection_graph（终点 -> 起点列表）编译为 NetworkTopology"""
+    node_index = {}
+    node_names = []
+    pipe_start = []
+    pipe_end = []
+
+    def get_node_id(name):
+        node_id = node_index.get(name)
+        if node_id is None:
+            node_id = node_index[name] = len(node_names)
+            node_names.append(name)
+        return node_id
+
+    for end_node, start_nodes in connection_graph.items():
+        end_id = get_node_id(end_node)
+        for start_node in start_nodes:
+            pipe_start.append(get_node_id(start_node))
+            pipe_end.append(end_id)
+
+    if flare_node is None:
+        # 未指定火炬节点时，取第一个没有出口管道且有入口管道的节点
+        has_outlet = set(pipe_start)
+        has_inlet = set(pipe_end)
+        flare_node = next((name for i, name in enumerate(node_names)
+                           if i not in has_outlet and i in has_inlet), None)
+
+    if flare_node not in node_index:
+        raise ValueError(f"火炬节点 {flare_node} 不在管网连接图中")
+
+    return NetworkTopology(node_names, pipe_start, pipe_end, node_index[flare_node])
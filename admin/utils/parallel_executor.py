@@ -0,0 +1,164 @@
+import atexit
+import collections
+import math
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import CALCULATION_CONFIG
+from utils.network_evaluator import evaluate_scenarios, scenario_qualification
+
+# 批量工况的进程池（按进程创建，首次使用时启动；fork 出的子进程不能使用父进程的进程池，按 pid 重建）
+_process_pool = None
+_process_pool_pid = None
+_process_pool_lock = threading.Lock()
+
+# 工作进程内最近几次请求的已编译管网（LRU），同一请求的后续分块与并发请求的分块不再反序列化
+_WORKER_NETWORK_CACHE_SIZE = 4
+_worker_networks = collections.OrderedDict()
+
+# 分区并行计算的线程池（按进程创建：fork 出的子进程不继承父进程的线程）
+_thread_pool = None
+_thread_pool_pid = None
+_thread_pool_size = 0
+_thread_pool_lock = threading.Lock()
+
+def _evaluate_chunk(network_key, network_path, loads):
+    """工作进程：计算一批工况，只回传校验结果以减少进程间传输
+
+    已编译管网由请求进程写入 network_path，本进程首次遇到 network_key 时读取一次。
+    """
+    network = _worker_networks.get(network_key)
+    if network is None:
+        with open(network_path, "rb") as f:
+            network = pickle.load(f)
+        _worker_networks[network_key] = network
+        if len(_worker_networks) > _WORKER_NETWORK_CACHE_SIZE:
+            _worker_networks.popitem(last=False)
+    else:
+        _worker_networks.move_to_end(network_key)
+    results = evaluate_scenarios(network, loads)
+    return scenario_qualification(network, loads, results)
+
+def _publish_network(network):
+    """已编译管网（不含拓扑）序列化写入临时文件，返回文件路径；各分块只传路径"""
+    with tempfile.NamedTemporaryFile(prefix="flare-network-", suffix=".pickle", delete=False) as f:
+        pickle.dump(network.detached(), f, protocol=pickle.HIGHEST_PROTOCOL)
+    return f.name
+
+def _get_process_pool():
+    """本进程的批量工况进程池，首次使用时创建；工作进程按需启动，最多 CALCULATION_CONFIG['max_workers'] 个"""
+    global _process_pool, _process_pool_pid
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_pid != os.getpid():
+            # spawn：新解释器启动工作进程，不在多线程的 Web 工作进程（或计算进程）中直接 fork
+            _process_pool = ProcessPoolExecutor(max_workers=CALCULATION_CONFIG['max_workers'],
+                                                mp_context=multiprocessing.get_context('spawn'))
+            _process_pool_pid = os.getpid()
+        return _process_pool
+
+def _discard_process_pool(pool):
+    """工作进程异常退出后进程池不可再用，丢弃后下次请求重新创建"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_process_pool():
+    """关闭本进程的批量工况进程池"""
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+        owned = _process_pool_pid == os.getpid()
+    if pool is not None and owned:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(shutdown_process_pool)
+
+def iter_scenario_chunks(network, loads, workers=1, chunk_size=None):
+    """按工况分块计算并按原顺序逐块返回 (起始行, 结束行, 是否合格, 背压, 裕量)
+
+    workers <= 1 或只有一块时在当前进程内计算；否则分块提交到本进程的进程池，同时计算的块数不超过 workers，
+    分块数约为进程数的4倍以均衡负载。已编译管网（不含拓扑）每个请求只序列化一次、写入临时文件，
+    各块只传文件路径，工作进程按请求缓存读取结果；全部分块结束后删除该文件。
+    """
+    scenario_count = loads.scenario_count
+    workers = max(1, int(workers or 1))
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(scenario_count / (workers * 4)))
+    bounds = [(start, min(start + chunk_size, scenario_count))
+              for start in range(0, scenario_count, chunk_size)]
+
+    if workers == 1 or len(bounds) <= 1:
+        for start, stop in bounds:
+            chunk = loads.rows(start, stop)
+            results = evaluate_scenarios(network, chunk)
+            yield (start, stop) + scenario_qualification(network, chunk, results)
+        return
+
+    pool = _get_process_pool()
+    network_key = uuid.uuid4().hex
+    network_path = _publish_network(network)
+    remaining = iter(bounds)
+    pending = collections.deque()
+
+    def submit():
+        bound = next(remaining, None)
+        if bound is not None:
+            pending.append(bound + (pool.submit(_evaluate_chunk, network_key, network_path, loads.rows(*bound)),))
+
+    try:
+        for _ in range(workers):
+            submit()
+        # 按提交顺序取出结果，每取出一块再提交下一块
+        while pending:
+            start, stop, future = pending.popleft()
+            outcome = future.result()
+            submit()
+            yield (start, stop) + outcome
+    except BrokenProcessPool:
+        _discard_process_pool(pool)
+        raise
+    finally:
+        for _, _, future in pending:
+            future.cancel()
+        os.unlink(network_path)
+
+def map_in_threads(func, items, workers):
+    """在本进程的线程池中执行 func(item) 并按顺序返回结果，workers <= 1 或只有一项时顺序执行
+
+    用于单个管网分区后各组的计算：大数组的 NumPy 运算释放 GIL，各组可在多个核上同时进行。
+    线程池按本进程请求过的最大线程数创建，请求更多线程时换用更大的线程池（旧线程池不再被引用后其线程自行退出）；
+    每次调用只占用其中 workers 个线程，各线程依次取出下一项执行。
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    global _thread_pool, _thread_pool_pid, _thread_pool_size
+    with _thread_pool_lock:
+        if _thread_pool is None or _thread_pool_pid != os.getpid() or _thread_pool_size < workers:
+            _thread_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="partition")
+            _thread_pool_pid = os.getpid()
+            _thread_pool_size = workers
+        pool = _thread_pool
+
+    results = [None] * len(items)
+    queue = collections.deque(enumerate(items))
+
+    def lane():
+        while True:
+            try:
+                index, item = queue.popleft()
+            except IndexError:
+                return
+            results[index] = func(item)
+
+    for future in [pool.submit(lane) for _ in range(min(workers, len(items)))]:
+        future.result()
+    return results
@@ -0,0 +1,243 @@
+import time
+import numpy as np
+from utils.vectorized_solver import (as_float_array, round_like_python, solve_mach_numbers,
+                                     solve_reynolds_numbers, solve_friction_factors)
+from utils.pressure_ratio_solver import solve_pressure_ratios
+
+def cross_area_for_diameter(diameter):
+    """管径（mm）对应的截面积（cm²，保留2位小数）"""
+    return round_like_python(np.pi * (as_float_array(diameter) / 20) ** 2, 2)
+
+class PipeSizer:
+    """按标准管径系列选取满足背压与马赫数要求的最小管径
+
+    流量、平均温度、平均分子量与混合黏度与管径无关，各管道每个候选管径的压比 x = P2/P1
+    只取决于本管道（计算规则与逐段计算相同），预先向量化求出压降 d = -ln x。
+    泄放点入口压力 = 火炬压力 · exp(Σ 路径压降)，约束化为 Σ 路径压降 ≤ ln(允许背压 / 火炬压力)。
+
+    泄放点按管道先序排列后，每根管道上游子树内的泄放点是连续区间，
+    改一根管道的管径只需对该区间的余量做一次数组加减，候选方案的判定为区间最小值比较。
+
+    搜索步骤：
+    1. 下界：各管道取满足马赫数上限的最小管径（马赫数只与本管道截面积有关）；
+    2. 上界：全部取最大允许管径仍不满足的泄放点直接判为不可行（马赫数受限的管道按可求得压比的最大管径计）；
+    3. 扩径：每轮按 (压降减少量 × 区间内不满足的泄放点数 / 管材增量) 选择管道扩大一级，
+       泄放点区间互不重叠的管道互不影响，同一轮一起扩径；
+    4. 缩径：按可节省管材从大到小逐根尝试缩小管径，区间余量足够才接受。
+    管材量按 Σ 当量长度 × 管径 计。当前管径大于管径系列上限的管道（如大型主管）另以当前管径为最大候选。
+    """
+
+    def __init__(self, topology, pipe_store, discharge_store, properties, catalog, max_mach, fixed_pipes=()):
+        self.topology = topology
+        self.store = pipe_store
+        self.catalog = np.array(sorted(set(float(d) for d in catalog)), dtype=float)
+        if self.catalog.size == 0 or self.catalog[0] <= 0:
+            raise ValueError("管径系列需为正数")
+        self.max_mach = max_mach
+        self.evaluations = 0
+
+        pipe_count = topology.pipe_count
+        flare_pipes = topology.node_inlet_pipes[topology.flare_index]
+        flare_pressure = pipe_store.outlet_pressure[flare_pipes[0]] if flare_pipes else np.nan
+        if np.isnan(flare_pressure):
+            raise ValueError("未设置火炬管道出口压力")
+
+        # 1. 管道先序位置与上游子树大小（后序中上游管道先于下游管道）
+        pre_order = np.array(topology.post_order[::-1], dtype=int)
+        position = np.full(pipe_count, -1)
+        position[pre_order] = np.arange(len(pre_order))
+        subtree_size = np.ones(pipe_count, dtype=int)
+        for pipe_id in topology.post_order:
+            parent = topology.pipe_parent[pipe_id]
+            if parent != -1:
+                subtree_size[parent] += subtree_size[pipe_id]
+
+        # 2. 泄放点（出口管道可达）按先序排列，计算各自的压降预算
+        nodes, outlet_pipes, budgets = [], [], []
+        for point in discharge_store:
+            node_id = topology.node_index.get(point.node_id)
+            pipe_id = topology.node_outlet_pipe[node_id] if node_id is not None else -1
+            if pipe_id == -1 or position[pipe_id] < 0:
+                continue
+            max_backpressure = point.max_backpressure
+            nodes.append(point.node_id)
+            outlet_pipes.append(pipe_id)
+            budgets.append(np.log(max_backpressure / flare_pressure)
+                           if max_backpressure is not None and max_backpressure > 0 else np.inf)
+        order = np.argsort(position[outlet_pipes], kind="stable") if nodes else np.array([], dtype=int)
+        self.nodes = [nodes[i] for i in order]
+        self.outlet_pipes = np.array(outlet_pipes, dtype=int)[order]
+        self.budgets = np.array(budgets, dtype=float)[order]
+        keys = position[self.outlet_pipes]
+        reached = position >= 0
+        self.lo = np.where(reached, np.searchsorted(keys, position, "left"), 0)
+        self.hi = np.where(reached, np.searchsorted(keys, position + subtree_size, "left"), 0)
+
+        # 3. 候选管径网格上的压降；固定管道及上游无泄放点的管道只保留当前管径
+        sized = (self.hi > self.lo) & ~np.isnan(pipe_store.equivalent_length) & ~np.isnan(pipe_store.roughness)
+        for name in fixed_pipes:
+            pipe_id = topology.pipe_index.get(name)
+            if pipe_id is None:
+                raise KeyError(f"管道 {name} 不在管网中")
+            sized[pipe_id] = False
+        self.sized = sized
+
+        size_count = len(self.catalog)
+        diameters = np.broadcast_to(self.catalog, (pipe_count, size_count)).copy()
+        areas = np.broadcast_to(cross_area_for_diameter(self.catalog), (pipe_count, size_count)).copy()
+        # 超出管径系列的当前管径追加为最后一列（截面积沿用请求值），其余管道该列不允许选用
+        self.oversized = sized & (pipe_store.diameter > self.catalog[-1])
+        if self.oversized.any():
+            kept_area = np.where(np.isnan(pipe_store.cross_area), cross_area_for_diameter(pipe_store.diameter),
+                                 pipe_store.cross_area)
+            diameters = np.column_stack([diameters, np.where(self.oversized, pipe_store.diameter, self.catalog[-1])])
+            areas = np.column_stack([areas, np.where(self.oversized, kept_area, areas[:, -1])])
+            size_count += 1
+        diameters[~sized] = pipe_store.diameter[~sized, None]
+        areas[~sized] = pipe_store.cross_area[~sized, None]
+        self.diameters = diameters
+        self.areas = areas
+
+        def column(values):
+            return np.asarray(values, dtype=float)[:, None]
+
+        # 混合物性（声速、黏度）与管径无关，每根管道只取一次
+        mach = round_like_python(solve_mach_numbers(
+            column(pipe_store.flow_rate), column(pipe_store.avg_temperature),
+            column(pipe_store.avg_molecular_weight), areas, sound_speed=column(properties.sound_speed)), 2)
+        reynolds = solve_reynolds_numbers(column(pipe_store.flow_rate), diameters, column(properties.viscosity))
+        friction = round_like_python(solve_friction_factors(reynolds, column(pipe_store.roughness), diameters / 1000), 6)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fLD = friction * column(pipe_store.equivalent_length) / diameters
+            solvable = (mach > 0) & ~np.isnan(fLD)
+            x = np.full(fLD.shape, np.nan)
+            x[solvable] = solve_pressure_ratios(fLD[solvable], mach[solvable])[0]
+            drops = -np.log(x)
+        # 求不出压比的管径视为无穷压降（路径上的泄放点无法求得入口压力）
+        drops[np.isnan(drops)] = np.inf
+        self.drops = drops
+        self.mach = mach
+
+        # 允许的管径：马赫数不超过上限（截面积越大马赫数越小），且能求得压比
+        # （管径过大时马赫数取整为0，逐段计算不再求入口压力），为管径系列的连续区间
+        finite = np.isfinite(drops)
+        if size_count > len(self.catalog):
+            finite[~self.oversized, -1] = False
+        allowed = finite & ~(mach > max_mach)
+        allowed[~sized] = True
+        has_allowed = allowed.any(axis=1)
+        self.mach_limited = np.flatnonzero(sized & ~has_allowed)
+        self.min_size = np.where(has_allowed, np.argmax(allowed, axis=1), 0)
+        self.max_size = np.where(has_allowed & sized, size_count - 1 - np.argmax(allowed[:, ::-1], axis=1), 0)
+        # 上界判定用：马赫数受限的管道取可求得压比的最大管径，其上游泄放点只在背压也无法满足时判为不可行
+        self.bound_size = self.max_size.copy()
+        limited = self.mach_limited[finite[self.mach_limited].any(axis=1)]
+        self.bound_size[limited] = size_count - 1 - np.argmax(finite[limited, ::-1], axis=1)
+
+        self.length = np.where(np.isnan(pipe_store.equivalent_length), 0.0, pipe_store.equivalent_length)
+        self.choice = self.min_size.copy()
+
+    def path_drops(self, choice):
+        """给定管径选择下各泄放点路径压降之和（按先序排列）"""
+        topology = self.topology
+        total = np.zeros(topology.pipe_count + 1)  # 末位为火炬，压降为0
+        pipe_drop = self.drops[np.arange(topology.pipe_count), choice]
+        parent = np.array(topology.pipe_parent, dtype=int)
+        for level in topology.levels:
+            total[level] = total[parent[level]] + pipe_drop[level]
+        return total[self.outlet_pipes]
+
+    def material(self, choice):
+        """管材量 Σ 当量长度 × 管径"""
+        return float(np.sum(self.length * self.diameters[np.arange(len(choice)), choice]))
+
+    def solve(self, max_rounds=10000):
+        """执行搜索，返回 (是否可行, 不可行的泄放点列表, 统计)"""
+        start = time.perf_counter()
+        pipe_ids = np.arange(self.topology.pipe_count)
+
+        # 上界：全部取最大允许管径仍不满足的泄放点无解
+        slack = self.budgets - self.path_drops(self.bound_size)
+        infeasible = [self.nodes[i] for i in np.flatnonzero(~(slack >= 0))]
+        if infeasible or len(self.mach_limited):
+            return False, infeasible, self._stats(start, 0)
+
+        # 扩径：自马赫数下界开始，直到全部泄放点满足背压
+        choice = self.choice
+        slack = self.budgets - self.path_drops(choice)
+        rounds = 0
+        while rounds < max_rounds:
+            violated = slack < 0
+            if not violated.any():
+                break
+            rounds += 1
+
+            counts = np.concatenate(([0], np.cumsum(violated)))
+            count = counts[self.hi] - counts[self.lo]
+            can_grow = (choice < self.max_size) & (count > 0)
+            next_size = np.minimum(choice + 1, self.max_size)
+            cost = self.length * (self.diameters[pipe_ids, next_size] - self.diameters[pipe_ids, choice])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                gain = self.drops[pipe_ids, choice] - self.drops[pipe_ids, next_size]
+                score = np.where(can_grow & (gain > 0), gain * count / np.maximum(cost, 1e-12), 0.0)
+            self.evaluations += int(can_grow.sum())
+
+            best = score.max()
+            if not best > 0:
+                # 各候选管道扩大一级均不降低压降（如压比截断）：路径上的管道直接取最大管径
+                grow = np.flatnonzero(can_grow)
+                choice[grow] = self.max_size[grow]
+                slack = self.budgets - self.path_drops(choice)
+                continue
+
+            # 同一轮扩径的管道泄放点区间互不重叠
+            covered = np.zeros(len(slack), dtype=bool)
+            candidates = np.flatnonzero(score >= best / 2)
+            for pipe_id in candidates[np.argsort(-score[candidates], kind="stable")].tolist():
+                lo, hi = self.lo[pipe_id], self.hi[pipe_id]
+                if covered[lo:hi].any():
+                    continue
+                covered[lo:hi] = True
+                slack[lo:hi] += gain[pipe_id]
+                choice[pipe_id] += 1
+            if not np.isfinite(gain[candidates]).all():
+                # 自无穷压降扩径时增量无意义，按路径重新累计
+                slack = self.budgets - self.path_drops(choice)
+
+        if (slack < 0).any():
+            infeasible = [self.nodes[i] for i in np.flatnonzero(slack < 0)]
+            return False, infeasible, self._stats(start, rounds)
+
+        # 缩径：余量只会减少，每根管道尝试一遍即可
+        saving = self.length * (self.diameters[pipe_ids, choice] - self.diameters[pipe_ids, self.min_size])
+        for pipe_id in np.argsort(-saving, kind="stable").tolist():
+            if not saving[pipe_id] > 0:
+                break
+            lo, hi = self.lo[pipe_id], self.hi[pipe_id]
+            while choice[pipe_id] > self.min_size[pipe_id]:
+                self.evaluations += 1
+                increase = self.drops[pipe_id, choice[pipe_id] - 1] - self.drops[pipe_id, choice[pipe_id]]
+                if not slack[lo:hi].min() >= increase:
+                    break
+                slack[lo:hi] -= increase
+                choice[pipe_id] -= 1
+
+        return True, [], self._stats(start, rounds)
+
+    def _stats(self, start, rounds):
+        elapsed = time.perf_counter() - start
+        return {
+            "sized_pipes": int(self.sized.sum()),
+            "catalog_sizes": len(self.catalog),
+            "oversized_pipes": int(self.oversized.sum()),
+            "rounds": rounds,
+            "evaluations": self.evaluations,
+            "search_cost": round(elapsed, 3)
+        }
+
+    def apply(self, pipe_store):
+        """将选定管径及对应截面积写入管道存储（只修改参与选型的管道）"""
+        pipe_ids = np.flatnonzero(self.sized)
+        pipe_store.diameter[pipe_ids] = self.diameters[pipe_ids, self.choice[pipe_ids]]
+        pipe_store.cross_area[pipe_ids] = self.areas[pipe_ids, self.choice[pipe_ids]]
+        return pipe_store
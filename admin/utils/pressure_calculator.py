@@ -1,87 +1,235 @@
-import math
-from collections import defaultdict
-
-def calculate_pipe_inlet_pressures(pipe_list, connection_graph, flare_node):
-    """计算各段管道入口压力"""
-    # 构建前向图：终点->起点
-    forward_graph = defaultdict(list)
-    for end_node, start_nodes in connection_graph.items():
-        for start_node in start_nodes:
-            forward_graph[end_node].append(start_node)
-
-    # 管道对象映射
-    pipe_map = {pipe.name: pipe for pipe in pipe_list}
-
-    # 递归函数：计算起点的所有入口压力
-    def backtrack_calculate_pressure(end_node, current_outlet_pressure):
-        for start_node in forward_graph.get(end_node, []):
-            pipe_name = f"{start_node}->{end_node}"
-            pipe = pipe_map.get(pipe_name)
+import numpy as np
+from models.network_store import PipeStore
+from utils.network_topology import compile_network_topology
+from utils.pressure_ratio_solver import solve_pressure_ratio_iterations, solve_pressure_ratios
+from utils.vectorized_solver import round_like_python
+from utils.instrumentation import iteration_summary
+from utils.parallel_executor import map_in_threads
+
+# 同层管道数达到该值时改用向量化求解
+VECTORIZE_MIN_PIPES = 32
+
+def calculate_pipe_inlet_pressures(pipe_list, connection_graph, flare_node, topology=None, ratio_table=None,
+                                   stats=None):
+    """计算各段管道入口压力
+
+    自火炬节点逐层（按管道深度）向上游推进，同层管道的压比 x = P2/P1 一次向量化求解；
+    传入 ratio_table（PressureRatioTable）时改用插值表查表，精度见其 max_error。
+    传入 stats（dict）时写入压比求解迭代次数统计 stats["pressure_ratio"]。
+    """
+    # 编译后的管网拓扑（未传入时现场编译）
+    topology = topology or compile_network_topology(connection_graph, flare_node)
+    pipes = topology.align(pipe_list)
+    if pipes is pipe_list and isinstance(pipe_list, PipeStore):
+        return _calculate_store_inlet_pressures(pipe_list, topology, ratio_table, stats)
+    pipe_parent = topology.pipe_parent
+
+    # 从火炬开始，火炬出口压力为已知
+    flare_pipe = next((pipes[pipe_id] for pipe_id in topology.node_inlet_pipes[topology.flare_index]
+                       if pipes[pipe_id] is not None), None)
+
+    if flare_pipe is None or flare_pipe.outlet_pressure is None:
+        raise ValueError("未设置火炬管道出口压力")
+
+    flare_pressure = flare_pipe.outlet_pressure
+
+    # 各管道入口压力（未取整），None 表示未求得，其上游管道不再计算
+    inlet_pressures = [None] * topology.pipe_count
+    iterations = []
+
+    for level in topology.levels:
+        level_ids = []
+        level_fLD = []
+        level_mach = []
+
+        for pipe_id in level:
+            pipe = pipes[pipe_id]
             if pipe is None:
                 continue
 
-            pipe.outlet_pressure = current_outlet_pressure  # 使用上一步入口压力作为本段出口压力
+            parent = pipe_parent[pipe_id]
+            P2 = flare_pressure if parent == -1 else inlet_pressures[parent]
+            if P2 is None:
+                continue
+
+            pipe.outlet_pressure = P2  # 使用下游管道入口压力作为本段出口压力
 
             f = pipe.friction_factor
             L = pipe.equivalent_length
             D = pipe.diameter
             M = pipe.mach_number
-            P2 = pipe.outlet_pressure
 
-            if None in (f, L, D, M, P2) or P2 <= 0 or M <= 0:
+            if None in (f, L, D, M) or P2 <= 0 or M <= 0:
                 continue
 
-            left_side = (f * L) / D
-
-            def equation(x):
-                if x <= 0 or x >= 1:
-                    return float('inf')
-                return ((1 - x**2) / (x**2 * M**2)) + math.log(x**2) - left_side
-
-            # 二分法求解 x = P2/P1
-            low, high = 1e-6, 1 - 1e-6
-            for _ in range(100):
-                mid = (low + high) / 2
-                val = equation(mid)
-                if abs(val) < 1e-6:
-                    break
-                elif val > 0:
-                    low = mid
-                else:
-                    high = mid
-            x = (low + high) / 2
-            P1 = P2 / x
-            pipe.inlet_pressure = round(P1, 2)
+            level_ids.append(pipe_id)
+            level_fLD.append((f * L) / D)
+            level_mach.append(M)
 
-            # 递归处理前一段管道
-            backtrack_calculate_pressure(start_node, P1)
+        if not level_ids:
+            continue
 
-    # 从火炬开始，火炬出口压力为已知
-    flare_pipe = None
-    for pipe in pipe_list:
-        if pipe.name.endswith('->' + flare_node):
-            flare_pipe = pipe
-            break
-            
-    if flare_pipe is None or flare_pipe.outlet_pressure is None:
-        raise ValueError("未设置火炬管道出口压力")
+        ratios, level_iterations = solve_level_ratios(level_fLD, level_mach, ratio_table)
+        ratios = ratios.tolist()
+        iterations.append(level_iterations)
 
-    # 从火炬装置开始回溯计算
-    backtrack_calculate_pressure(flare_node, flare_pipe.outlet_pressure)
+        for pipe_id, x in zip(level_ids, ratios):
+            if x is None or x != x:
+                continue
+            pipe = pipes[pipe_id]
+            P1 = pipe.outlet_pressure / x
+            pipe.inlet_pressure = round(P1, 2)
+            inlet_pressures[pipe_id] = P1
 
+    if stats is not None:
+        stats["pressure_ratio"] = iteration_summary(np.concatenate(iterations) if iterations else [])
     return pipe_list
 
-def check_flare_system_qualification(pipe_list, discharge_objects):
+def solve_level_ratios(fLD, mach, ratio_table=None):
+    """求解一层管道的 x = P2/P1：查表、向量化牛顿，或管道较少时用标量牛顿
+
+    返回 (x, 各管道迭代次数)，查表时迭代次数为0。
+    """
+    if ratio_table is not None:
+        x = ratio_table.lookup(fLD, mach)
+        return x, np.zeros(len(x), dtype=int)
+    if len(fLD) >= VECTORIZE_MIN_PIPES:
+        return solve_pressure_ratios(fLD, mach)
+    return _solve_scalar_ratios(fLD, mach)
+
+def _solve_scalar_ratios(fLD, mach):
+    """逐个管道用标量牛顿求解 x = P2/P1，返回 (x, 各管道迭代次数)"""
+    fLD = fLD.tolist() if isinstance(fLD, np.ndarray) else fLD
+    mach = mach.tolist() if isinstance(mach, np.ndarray) else mach
+    results = [solve_pressure_ratio_iterations(f, M) for f, M in zip(fLD, mach)]
+    x = np.array([np.nan if ratio is None else ratio for ratio, _ in results], dtype=float)
+    return x, np.array([count for _, count in results], dtype=int)
+
+def _calculate_store_inlet_pressures(store, topology, ratio_table=None, stats=None):
+    """列存储版本的逐层压力计算，规则同 calculate_pipe_inlet_pressures"""
+    flare_pipes = topology.node_inlet_pipes[topology.flare_index]
+    flare_pressure = store.outlet_pressure[flare_pipes[0]] if flare_pipes else np.nan
+    if np.isnan(flare_pressure):
+        raise ValueError("未设置火炬管道出口压力")
+
+    pipe_parent = np.array(topology.pipe_parent, dtype=int)
+    inlet_pressures = np.full(len(store), np.nan)  # 未取整，NaN 表示未求得
+    iterations = []
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fLD_all = store.friction_factor * store.equivalent_length / store.diameter
+
+    for level in topology.levels:
+        level = np.array(level, dtype=int)
+        parents = pipe_parent[level]
+        P2 = np.where(parents == -1, flare_pressure, inlet_pressures[parents])
+        known = ~np.isnan(P2)
+        store.outlet_pressure[level[known]] = P2[known]
+
+        mach = store.mach_number[level]
+        fLD = fLD_all[level]
+        solvable = known & (P2 > 0) & (mach > 0) & ~np.isnan(fLD)
+        if not np.any(solvable):
+            continue
+
+        ids = level[solvable]
+        x, level_iterations = solve_level_ratios(fLD[solvable], mach[solvable], ratio_table)
+        iterations.append(level_iterations)
+        solved = ~np.isnan(x)
+        ids = ids[solved]
+        P1 = P2[solvable][solved] / x[solved]
+        inlet_pressures[ids] = P1
+        store.inlet_pressure[ids] = round_like_python(P1, 2)
+
+    if stats is not None:
+        stats["pressure_ratio"] = iteration_summary(np.concatenate(iterations) if iterations else [])
+    return store
+
+def calculate_partitioned_inlet_pressures(store, topology, partition, workers, stats=None):
+    """列存储压力计算的分区并行版本，结果与 calculate_pipe_inlet_pressures 逐位相同
+
+    压比 x 只取决于 fL/D 与马赫数：先由火炬压力与各管道参数确定可求解的管道，各组并行求解本组管道的压比；
+    再自火炬推算主干、各组并行推算入口压力。与逐层计算一致，同层可求解管道不少于 VECTORIZE_MIN_PIPES
+    时向量化求解，否则用标量牛顿。
+    """
+    flare_pipes = topology.node_inlet_pipes[topology.flare_index]
+    flare_pressure = store.outlet_pressure[flare_pipes[0]] if flare_pipes else np.nan
+    if np.isnan(flare_pressure):
+        raise ValueError("未设置火炬管道出口压力")
+
+    pipe_parent = partition.pipe_parent
+    mach = store.mach_number
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fLD_all = store.friction_factor * store.equivalent_length / store.diameter
+    solvable = (mach > 0) & ~np.isnan(fLD_all)
+    # 入参有限时压比有限，其上游管道的出口压力为正
+    finite = solvable & np.isfinite(fLD_all) & np.isfinite(mach)
+
+    # 出口压力已知且为正的可求解管道，及各层求解方式
+    active = np.zeros(len(store), dtype=bool)
+    vectorized = np.zeros(len(store), dtype=bool)
+    for level in partition.levels:
+        parents = pipe_parent[level]
+        positive = np.where(parents == -1, flare_pressure > 0, finite[np.maximum(parents, 0)] &
+                            active[np.maximum(parents, 0)])
+        active[level] = positive & solvable[level]
+        if np.count_nonzero(active[level]) >= VECTORIZE_MIN_PIPES:
+            vectorized[level] = active[level]
+
+    ratios = np.full(len(store), np.nan)
+    iterations = np.zeros(len(store), dtype=int)
+    inlet_pressures = np.full(len(store), np.nan)  # 未取整，NaN 表示未求得
+
+    def solve(group):
+        pipes = partition.group_pipes(group)
+        pipes = pipes[active[pipes]]
+        for ids, solver in ((pipes[vectorized[pipes]], solve_pressure_ratios),
+                            (pipes[~vectorized[pipes]], _solve_scalar_ratios)):
+            if len(ids):
+                ratios[ids], iterations[ids] = solver(fLD_all[ids], mach[ids])
+
+    def propagate(levels):
+        for level in levels:
+            parents = pipe_parent[level]
+            P2 = np.where(parents == -1, flare_pressure, inlet_pressures[np.maximum(parents, 0)])
+            known = ~np.isnan(P2)
+            store.outlet_pressure[level[known]] = P2[known]
+            ids = level[active[level]]
+            inlet_pressures[ids] = P2[active[level]] / ratios[ids]
+
+    groups = list(range(partition.group_count))
+    map_in_threads(solve, groups + [-1], workers)
+    propagate(partition.trunk_levels)
+    map_in_threads(lambda group: propagate(partition.group_levels[group]), groups, workers)
+
+    solved = ~np.isnan(inlet_pressures)
+    store.inlet_pressure[solved] = round_like_python(inlet_pressures[solved], 2)
+    if stats is not None:
+        stats["pressure_ratio"] = iteration_summary(iterations[active])
+    return store
+
+def check_flare_system_qualification(pipe_list, discharge_objects, topology=None):
     """判断火炬系统是否满足要求"""
     # 泄放点名 -> 安全阀允许背压 映射
     backpressure_map = {point.node_id: point.max_backpressure for point in discharge_objects}
 
+    # 管道起点名：有拓扑时按管道编号取，否则从管道名拆分
+    if topology is not None:
+        pipes = topology.align(pipe_list)
+        node_names = topology.node_names
+        start_nodes = [node_names[start] for start in topology.pipe_start]
+    else:
+        pipes = pipe_list
+        start_nodes = [pipe.name.split("->")[0] for pipe in pipe_list]
+
     satisfied = []
     not_satisfied = []
 
-    for pipe in pipe_list:
-        start_node, _ = pipe.name.split("->")
-        if start_node in backpressure_map:
+    for pipe_id, start_node in enumerate(start_nodes):
+        if start_node not in backpressure_map:
+            continue
+        pipe = pipes[pipe_id]
+        if pipe is not None:
             safe_backpressure = backpressure_map[start_node]
             actual_inlet_pressure = pipe.inlet_pressure
 
@@ -0,0 +1,190 @@
+import math
+from functools import lru_cache
+import numpy as np
+
+# 与原二分法相同的求解区间 x = P2/P1 ∈ [X_MIN, X_MAX]
+X_MIN = 1e-6
+X_MAX = 1 - 1e-6
+
+def pressure_ratio_residual(x, fLD, mach):
+    """等温流动压比方程残差 g(x) = (1 - x²)/(x²·M²) + ln(x²) - fL/D"""
+    x2 = x * x
+    return (1 - x2) / (x2 * mach * mach) + np.log(x2) - fLD
+
+def solve_pressure_ratios(fLD, mach, x0=None, tol=1e-12, max_iter=50):
+    """向量化安全牛顿法求解 x = P2/P1，返回 (x, 各元素迭代次数)
+
+    以 v = 1/x² - 1 为变量求解（见 solve_ratio_variables），
+    结果截断到原二分法的区间 [X_MIN, X_MAX]，fL/D ≤ 0 时返回 X_MAX。
+    x0 为可选初值（如上一时间步或插值表结果），非法入参返回 NaN。
+    """
+    v0 = None
+    if x0 is not None:
+        x0 = np.asarray(x0, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            v0 = 1 / (x0 * x0) - 1
+    v, iterations = solve_ratio_variables(fLD, mach, v0, tol, max_iter)
+    with np.errstate(invalid='ignore'):
+        x = np.clip(1 / np.sqrt(1 + v), X_MIN, X_MAX)
+    return x, iterations
+
+def solve_ratio_variables(fLD, mach, v0=None, tol=1e-12, max_iter=50):
+    """向量化安全牛顿法求解 v = 1/x² - 1 = (P1/P2)² - 1（不截断），返回 (v, 各元素迭代次数)
+
+    方程 g(v) = v/M² - ln(1 + v) - fL/D = 0。
+    在 v > max(0, M² - 1)（即 x < min(1, 1/M)）上 g 单调递增且为凸函数，根唯一；
+    牛顿步越出当前有根区间时退化为二分（或向右扩张），保证收敛。
+    fL/D ≤ 0 时返回 0，v0 为可选初值，非法入参返回 NaN。
+    """
+    fLD, mach = np.broadcast_arrays(np.asarray(fLD, dtype=float), np.asarray(mach, dtype=float))
+    valid = np.isfinite(fLD) & np.isfinite(mach) & (mach > 0)
+    iterations = np.zeros(fLD.shape, dtype=int)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        m2 = mach * mach
+        lo = np.maximum(0.0, m2 - 1)       # g(lo) < 0
+        hi = np.full(fLD.shape, np.inf)
+        solvable = valid & (fLD > 0)
+
+        # 初值：忽略对数项的近似解再做一次不动点修正，位于根左侧
+        v = m2 * (fLD + np.log1p(m2 * fLD))
+        if v0 is not None:
+            v0 = np.asarray(v0, dtype=float)
+            v = np.where(np.isfinite(v0) & (v0 > 0), v0, v)
+        v = np.where(solvable, np.maximum(v, lo), 0.0)
+
+        active = solvable.copy()
+        for _ in range(max_iter):
+            if not np.any(active):
+                break
+            iterations += active
+
+            g = v / m2 - np.log1p(v) - fLD
+            dg = 1 / m2 - 1 / (1 + v)
+            lo = np.where(active & (g < 0), v, lo)
+            hi = np.where(active & (g >= 0), v, hi)
+
+            v_next = v - g / dg
+            outside = ~np.isfinite(v_next) | (v_next < lo) | (v_next > hi)
+            fallback = np.where(np.isfinite(hi), (lo + hi) / 2, 2 * lo + 1)
+            v_next = np.where(outside, fallback, v_next)
+
+            # |Δx|/x ≈ |Δv| / (2(1 + v))
+            converged = np.abs(v_next - v) <= 2 * tol * (1 + v)
+            v = np.where(active, v_next, v)
+            active &= ~converged
+
+    return np.where(valid, v, np.nan), iterations
+
+def solve_pressure_ratio(fLD, mach, x0=None, tol=1e-12, max_iter=50):
+    """单个管道压比求解（纯 Python 标量版，算法同 solve_pressure_ratios），非法入参返回 None
+
+    管道数很少的树层（如长主管链）用标量版，避免数组调用开销。
+    """
+    return solve_pressure_ratio_iterations(fLD, mach, x0, tol, max_iter)[0]
+
+def solve_pressure_ratio_iterations(fLD, mach, x0=None, tol=1e-12, max_iter=50):
+    """同 solve_pressure_ratio，返回 (x, 迭代次数)"""
+    if fLD is None or mach is None or not (math.isfinite(fLD) and math.isfinite(mach)) or mach <= 0:
+        return None, 0
+    if not fLD > 0:
+        return X_MAX, 0
+
+    m2 = mach * mach
+    lo = max(0.0, m2 - 1)
+    hi = math.inf
+    v = m2 * (fLD + math.log1p(m2 * fLD))
+    if x0 is not None and 0 < x0 < 1:
+        v = 1 / (x0 * x0) - 1
+    v = max(v, lo)
+
+    iterations = 0
+    for _ in range(max_iter):
+        iterations += 1
+        g = v / m2 - math.log1p(v) - fLD
+        dg = 1 / m2 - 1 / (1 + v)
+        if g < 0:
+            lo = v
+        else:
+            hi = v
+
+        v_next = v - g / dg if dg != 0 else math.nan
+        if not (lo <= v_next <= hi):
+            v_next = (lo + hi) / 2 if hi != math.inf else 2 * lo + 1
+
+        converged = abs(v_next - v) <= 2 * tol * (1 + v)
+        v = v_next
+        if converged:
+            break
+
+    return min(max(1 / math.sqrt(1 + v), X_MIN), X_MAX), iterations
+
+def _mach_axis(mach):
+    """Mach 轴坐标 lg(M/(1-M))：小 Mach 与接近临界处均加密"""
+    return np.log10(mach / (1 - mach))
+
+class PressureRatioTable:
+    """压比预计算插值表：在 (lg(fL/D), lg(M/(1-M))) 网格上对 ln(1/x² - 1) 做双线性插值
+
+    小压降时 1/x² - 1 ≈ M²·fL/D，取对数后近似为双线性，插值误差小。
+    max_error 为建表时在各网格单元中心实测的最大相对误差 |Δx|/x。
+    表外（含 M ≥ 1）的点回退到精确求解。
+    """
+
+    def __init__(self, fld_range=(1e-4, 1e4), mach_range=(1e-3, 0.999), fld_points=241, mach_points=241):
+        self.fld_axis = np.linspace(np.log10(fld_range[0]), np.log10(fld_range[1]), fld_points)
+        self.mach_axis = np.linspace(_mach_axis(mach_range[0]), _mach_axis(mach_range[1]), mach_points)
+        fld_grid, mach_grid = np.meshgrid(10 ** self.fld_axis, self._axis_to_mach(self.mach_axis), indexing='ij')
+        x, _ = solve_pressure_ratios(fld_grid, mach_grid)
+        self.values = np.log(1 / (x * x) - 1)
+
+        # 在单元中心处与精确解比较，得到误差上界估计
+        fld_mid = 10 ** ((self.fld_axis[:-1] + self.fld_axis[1:]) / 2)
+        mach_mid = self._axis_to_mach((self.mach_axis[:-1] + self.mach_axis[1:]) / 2)
+        fld_mid, mach_mid = np.meshgrid(fld_mid, mach_mid, indexing='ij')
+        exact, _ = solve_pressure_ratios(fld_mid, mach_mid)
+        approx = self._interpolate(fld_mid, mach_mid)
+        self.max_error = float(np.max(np.abs(approx - exact) / exact))
+
+    @staticmethod
+    def _axis_to_mach(t):
+        r = 10 ** t
+        return r / (1 + r)
+
+    def _interpolate(self, fLD, mach):
+        fu = (np.log10(fLD) - self.fld_axis[0]) / (self.fld_axis[1] - self.fld_axis[0])
+        fv = (_mach_axis(mach) - self.mach_axis[0]) / (self.mach_axis[1] - self.mach_axis[0])
+        i = np.clip(np.floor(fu).astype(int), 0, len(self.fld_axis) - 2)
+        j = np.clip(np.floor(fv).astype(int), 0, len(self.mach_axis) - 2)
+        tu = fu - i
+        tv = fv - j
+        z = (self.values[i, j] * (1 - tu) * (1 - tv) + self.values[i + 1, j] * tu * (1 - tv) +
+             self.values[i, j + 1] * (1 - tu) * tv + self.values[i + 1, j + 1] * tu * tv)
+        return np.clip(1 / np.sqrt(1 + np.exp(z)), X_MIN, X_MAX)
+
+    def in_range(self, fLD, mach):
+        """判断入参是否落在表内"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u = np.log10(fLD)
+            v = _mach_axis(mach)
+        return (u >= self.fld_axis[0]) & (u <= self.fld_axis[-1]) & \
+               (v >= self.mach_axis[0]) & (v <= self.mach_axis[-1])
+
+    def lookup(self, fLD, mach, refine=False):
+        """向量化查表求 x = P2/P1；refine=True 时以查表值为初值做牛顿精修"""
+        fLD, mach = np.broadcast_arrays(np.asarray(fLD, dtype=float), np.asarray(mach, dtype=float))
+        inside = self.in_range(fLD, mach)
+        x = np.full(fLD.shape, np.nan)
+        if np.any(inside):
+            x[inside] = self._interpolate(fLD[inside], mach[inside])
+
+        # 表外的点，以及需要精修的点，调用精确求解（查表值作初值）
+        solve = np.ones(fLD.shape, dtype=bool) if refine else ~inside
+        if np.any(solve):
+            x[solve], _ = solve_pressure_ratios(fLD[solve], mach[solve], x0=x[solve])
+        return x
+
+@lru_cache(maxsize=1)
+def get_default_ratio_table():
+    """默认压比插值表（进程内首次使用时构建）"""
+    return PressureRatioTable()
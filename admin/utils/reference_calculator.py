@@ -0,0 +1,319 @@
+"""原始计算实现（递归回溯、逐管道标量计算），冻结备查，仅供 benchmark.py 正确性校验使用
+
+各函数保持最初版本的算法与取整：流量、温度、分子量、压力自火炬递归回溯，雷诺数按各泄放点流量权重逐点累加，
+摩擦系数为 Colebrook 不动点迭代（20 次，|Δ(1/√f)| < 1e-6 停止），压比为二分法（残差 < 1e-6 停止）。
+唯一改动：温度与分子量原以 connection_graph 的第一个键为火炬节点，这里改为传入的 flare_node。
+计算模块优化后不应再修改本文件，否则正确性校验失去基准。
+"""
+import math
+from collections import defaultdict
+from models.flare_models import Pipe, DischargePoint
+
+def _forward_graph(connection_graph):
+    """前向图：终点 -> 起点列表"""
+    forward_graph = defaultdict(list)
+    for end_node, start_nodes in connection_graph.items():
+        for start_node in start_nodes:
+            forward_graph[end_node].append(start_node)
+    return forward_graph
+
+def create_pipe_objects(connection_graph, default_params=None):
+    """创建管道对象列表"""
+    pipe_list = []
+    default_params = default_params or {}
+
+    for end_node, start_nodes in connection_graph.items():
+        for start_node in start_nodes:
+            name = f"{start_node}->{end_node}"
+            params = default_params.get(name, {})
+
+            pipe_obj = Pipe(
+                name=name,
+                equivalent_length=params.get("equivalent_length"),
+                diameter=params.get("diameter"),
+                outlet_pressure=params.get("outlet_pressure"),
+                roughness=params.get("roughness"),
+                cross_area=params.get("cross_area"),
+                flow_rate=params.get("flow_rate"),
+                avg_temperature=params.get("avg_temperature"),
+                avg_molecular_weight=params.get("avg_molecular_weight"),
+                mach_number=params.get("mach_number"),
+                friction_factor=params.get("friction_factor"),
+                inlet_pressure=params.get("inlet_pressure"),
+                reynolds_number=params.get("reynolds_number")
+            )
+            pipe_list.append(pipe_obj)
+
+    return pipe_list
+
+def create_discharge_objects(discharge_nodes, default_params=None):
+    """创建泄放点对象列表"""
+    discharge_objects = []
+    default_params = default_params or {}
+
+    for node in discharge_nodes:
+        params = default_params.get(node, {})
+        discharge_obj = DischargePoint(
+            node_id=node,
+            flow_rate=params.get("flow_rate"),
+            pressure=params.get("pressure"),
+            temperature=params.get("temperature"),
+            molecular_weight=params.get("molecular_weight"),
+            max_backpressure=params.get("max_backpressure"),
+            viscosity=params.get("viscosity")
+        )
+        discharge_objects.append(discharge_obj)
+
+    return discharge_objects
+
+def calculate_pipe_flow_rates(pipe_list, discharge_objects, connection_graph, flare_node):
+    """计算各段管道流量"""
+    forward_graph = _forward_graph(connection_graph)
+    discharge_flow_map = {point.node_id: point.flow_rate for point in discharge_objects}
+    name_to_pipe = {pipe.name: pipe for pipe in pipe_list}
+
+    # 回溯：计算从该节点向前所有泄放点的累计流量
+    def backtrack_flow(end_node):
+        total_flow = 0
+        if end_node in discharge_flow_map:
+            return discharge_flow_map[end_node]
+
+        for start_node in forward_graph.get(end_node, []):
+            pipe_name = f"{start_node}->{end_node}"
+            sub_flow = backtrack_flow(start_node)
+            total_flow += sub_flow
+            if pipe_name in name_to_pipe:
+                name_to_pipe[pipe_name].flow_rate = sub_flow
+        return total_flow
+
+    backtrack_flow(flare_node)
+    return pipe_list
+
+def calculate_pipe_avg_temperatures(pipe_list, discharge_objects, connection_graph, flare_node):
+    """计算各段管道平均温度"""
+    forward_graph = _forward_graph(connection_graph)
+    discharge_data = {point.node_id: (point.temperature, point.flow_rate)
+                      for point in discharge_objects}
+    name_to_pipe = {pipe.name: pipe for pipe in pipe_list}
+
+    def backtrack_temperature(end_node):
+        if end_node in discharge_data:
+            temp, flow = discharge_data[end_node]
+            return temp * flow, flow
+
+        total_temp_product = 0
+        total_flow = 0
+        for start_node in forward_graph.get(end_node, []):
+            pipe_name = f"{start_node}->{end_node}"
+            sub_temp_product, sub_flow = backtrack_temperature(start_node)
+            total_temp_product += sub_temp_product
+            total_flow += sub_flow
+
+            # 更新该管道的平均温度（保留整数）
+            if pipe_name in name_to_pipe and sub_flow > 0:
+                name_to_pipe[pipe_name].avg_temperature = round(sub_temp_product / sub_flow)
+        return total_temp_product, total_flow
+
+    backtrack_temperature(flare_node)
+    return pipe_list
+
+def calculate_pipe_avg_molecular_weight(pipe_list, discharge_objects, connection_graph, flare_node):
+    """计算各段管道平均分子量"""
+    forward_graph = _forward_graph(connection_graph)
+    discharge_data = {point.node_id: (point.molecular_weight, point.flow_rate)
+                      for point in discharge_objects}
+    name_to_pipe = {pipe.name: pipe for pipe in pipe_list}
+
+    # 回溯：返回 (总泄放量 Σq, Σ(q/M))
+    def backtrack(end_node):
+        total_q = 0
+        total_q_div_M = 0
+
+        for start_node in forward_graph.get(end_node, []):
+            pipe_name = f"{start_node}->{end_node}"
+
+            if start_node in discharge_data:
+                M, q = discharge_data[start_node]
+                if M == 0:
+                    raise ValueError(f"泄放点 {start_node} 分子量不能为0")
+                if pipe_name in name_to_pipe:
+                    name_to_pipe[pipe_name].avg_molecular_weight = round(q / (q / M))
+                total_q += q
+                total_q_div_M += q / M
+            else:
+                sub_q, sub_q_div_M = backtrack(start_node)
+                total_q += sub_q
+                total_q_div_M += sub_q_div_M
+                if pipe_name in name_to_pipe and sub_q_div_M > 0:
+                    name_to_pipe[pipe_name].avg_molecular_weight = round(sub_q / sub_q_div_M)
+
+        return total_q, total_q_div_M
+
+    backtrack(flare_node)
+    return pipe_list
+
+def calculate_pipe_mach_numbers(pipe_list):
+    """计算各段管道末端马赫数"""
+    for pipe in pipe_list:
+        flow_rate = pipe.flow_rate              # kg/h
+        temperature = pipe.avg_temperature      # K
+        mol_weight = pipe.avg_molecular_weight  # g/mol
+        cross_area = pipe.cross_area            # cm²
+
+        if None in (flow_rate, temperature, mol_weight, cross_area) or \
+           mol_weight == 0 or temperature == 0 or cross_area == 0:
+            continue
+
+        q = flow_rate / 3600                          # kg/s
+        A = cross_area / 10000                        # m²
+        a = ((8314 * temperature) / mol_weight)**0.5  # 声速，m/s
+        pipe.mach_number = round((q / (A*100000)) * a, 2)
+
+    return pipe_list
+
+def calculate_pipe_friction_factors(pipe_list, discharge_objects, connection_graph, flare_node):
+    """计算各段管道雷诺数与摩擦系数：逐管道回溯其上游泄放点"""
+    forward_graph = _forward_graph(connection_graph)
+    discharge_data = {point.node_id: point for point in discharge_objects}
+
+    def backtrack_discharge_points(end_node):
+        if end_node in discharge_data:
+            return [discharge_data[end_node]]
+
+        points = []
+        for start_node in forward_graph.get(end_node, []):
+            points += backtrack_discharge_points(start_node)
+        return points
+
+    def calculate_reynolds_number(pipe, related_points):
+        Q = pipe.flow_rate  # kg/h
+        if not Q or Q == 0:
+            return None
+
+        Q_s = Q / 3600
+        numerator = 0
+        denominator = 0
+        for point in related_points:
+            qi = point.flow_rate / 3600
+            Mi = point.molecular_weight
+            mu = point.viscosity
+            if Mi == 0:
+                continue
+            weight = qi / Q_s
+            numerator += weight * mu * math.sqrt(Mi)
+            denominator += weight * math.sqrt(Mi)
+        if denominator == 0:
+            return None
+
+        D = pipe.diameter / 1000  # mm -> m
+        viscosity = numerator / denominator
+        return 4 * Q_s / (math.pi * D * viscosity)
+
+    def calculate_friction_factor(Re, roughness, diameter):
+        if Re is None or Re <= 0:
+            return None
+
+        f = 0.02
+        for _ in range(20):
+            try:
+                left = 1 / math.sqrt(f)
+                right = -2.0 * math.log10((roughness / (3.7 * diameter)) + (2.51 / (Re * math.sqrt(f))))
+                diff = abs(left - right)
+                f = 1 / (right ** 2)
+                if diff < 1e-6:
+                    break
+            except Exception:
+                return None
+        return round(f, 6)
+
+    for pipe in pipe_list:
+        start_node, end_node = pipe.name.split("->")
+        discharge_points = backtrack_discharge_points(start_node)
+
+        Re = calculate_reynolds_number(pipe, discharge_points)
+        pipe.reynolds_number = round(Re, 2) if Re else None
+        pipe.friction_factor = calculate_friction_factor(Re, pipe.roughness, pipe.diameter/1000)
+
+    return pipe_list
+
+def solve_pressure_ratio_bisection(fLD, mach):
+    """二分法求解 x = P2/P1（残差 < 1e-6 或 100 次后停止）"""
+    def equation(x):
+        if x <= 0 or x >= 1:
+            return float('inf')
+        return ((1 - x**2) / (x**2 * mach**2)) + math.log(x**2) - fLD
+
+    low, high = 1e-6, 1 - 1e-6
+    for _ in range(100):
+        mid = (low + high) / 2
+        val = equation(mid)
+        if abs(val) < 1e-6:
+            break
+        elif val > 0:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+def calculate_pipe_inlet_pressures(pipe_list, connection_graph, flare_node):
+    """计算各段管道入口压力：自火炬递归向上游，逐管道二分求解压比"""
+    forward_graph = _forward_graph(connection_graph)
+    pipe_map = {pipe.name: pipe for pipe in pipe_list}
+
+    def backtrack_calculate_pressure(end_node, current_outlet_pressure):
+        for start_node in forward_graph.get(end_node, []):
+            pipe = pipe_map.get(f"{start_node}->{end_node}")
+            if pipe is None:
+                continue
+
+            pipe.outlet_pressure = current_outlet_pressure
+
+            f = pipe.friction_factor
+            L = pipe.equivalent_length
+            D = pipe.diameter
+            M = pipe.mach_number
+            P2 = pipe.outlet_pressure
+
+            if None in (f, L, D, M, P2) or P2 <= 0 or M <= 0:
+                continue
+
+            x = solve_pressure_ratio_bisection((f * L) / D, M)
+            P1 = P2 / x
+            pipe.inlet_pressure = round(P1, 2)
+
+            backtrack_calculate_pressure(start_node, P1)
+
+    flare_pipe = None
+    for pipe in pipe_list:
+        if pipe.name.endswith('->' + flare_node):
+            flare_pipe = pipe
+            break
+
+    if flare_pipe is None or flare_pipe.outlet_pressure is None:
+        raise ValueError("未设置火炬管道出口压力")
+
+    backtrack_calculate_pressure(flare_node, flare_pipe.outlet_pressure)
+    return pipe_list
+
+def check_flare_system_qualification(pipe_list, discharge_objects):
+    """判断火炬系统是否满足要求"""
+    backpressure_map = {point.node_id: point.max_backpressure for point in discharge_objects}
+
+    satisfied = []
+    not_satisfied = []
+
+    for pipe in pipe_list:
+        start_node, _ = pipe.name.split("->")
+        if start_node in backpressure_map:
+            safe_backpressure = backpressure_map[start_node]
+            actual_inlet_pressure = pipe.inlet_pressure
+
+            if actual_inlet_pressure is None:
+                not_satisfied.append((start_node, "未计算入口压力"))
+            elif actual_inlet_pressure <= safe_backpressure:
+                satisfied.append((start_node, actual_inlet_pressure, safe_backpressure))
+            else:
+                not_satisfied.append((start_node, actual_inlet_pressure, safe_backpressure))
+
+    is_qualified = len(not_satisfied) == 0
+    return is_qualified, satisfied, not_satisfied
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+def canonical_request_hash(data, fields=("system_config", "pipes", "discharge_points")):
+    """请求内容的规范化哈希：键排序、紧凑分隔符序列化后取 SHA-256"""
+    payload = {field: data.get(field) for field in fields}
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def raw_body_hash(raw_body):
+    """原始请求体哈希：同一客户端原样重复提交时无需重新序列化即可命中"""
+    return "raw:" + hashlib.sha256(raw_body).hexdigest()
+
+class ResultCache:
+    """计算结果缓存：内存 LRU + TTL，可选 SQLite 磁盘层（进程重启后仍可命中）"""
+
+    def __init__(self, max_entries=256, ttl_seconds=600, disk_path=None, max_disk_entries=10000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()       # 键 -> (写入时间, 结果)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._disk = None
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache ("
+                "cache_key TEXT PRIMARY KEY, created_at REAL NOT NULL, result TEXT NOT NULL)"
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON result_cache (created_at)")
+            self._disk.commit()
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key, count_miss=True):
+        """取缓存结果，未命中或已过期返回 None
+
+        同一请求依次按多个键查找时，除最后一次外传入 count_miss=False，每个请求只计一次命中或未命中。
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT created_at, result FROM result_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[0], now):
+                    result = json.loads(row[1])
+                    self._store_memory(key, row[0], result)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return result
+
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def set(self, key, result, persist=True):
+        """写入缓存，超出容量时淘汰最久未使用的条目；persist=False 时只写内存层"""
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, now, result)
+            if persist and self._disk is not None:
+                self._disk.execute(
+                    "REPLACE INTO result_cache (cache_key, created_at, result) VALUES (?, ?, ?)",
+                    (key, now, json.dumps(result, ensure_ascii=False))
+                )
+                # 磁盘层按写入时间淘汰最旧条目
+                self._disk.execute(
+                    "DELETE FROM result_cache WHERE cache_key IN ("
+                    "SELECT cache_key FROM result_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+                self._disk.commit()
+
+    def _store_memory(self, key, created_at, result):
+        self._entries[key] = (created_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM result_cache")
+                self._disk.commit()
+
+    def stats(self):
+        """命中统计，用于 diagnostics"""
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries)
+        }
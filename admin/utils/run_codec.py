@@ -0,0 +1,49 @@
+import json
+import struct
+import zlib
+import numpy as np
+from utils.result_cache import canonical_request_hash
+
+RUN_FORMAT_VERSION = 1
+
+# 保存的逐管道计算结果字段
+RUN_RESULT_FIELDS = ("flow_rate", "avg_temperature", "avg_molecular_weight", "mach_number",
+                     "reynolds_number", "friction_factor", "outlet_pressure", "inlet_pressure")
+
+def run_hashes(data):
+    """计算结果的索引键：(管网哈希, 工况哈希)，分别由 system_config + pipes 与 discharge_points 得到"""
+    return (canonical_request_hash(data, fields=("system_config", "pipes")),
+            canonical_request_hash(data, fields=("discharge_points",)))
+
+def pack_run(pipe_names, columns, qualification, compress_level=1):
+    """逐管道结果打包为压缩二进制
+
+    格式：zlib( 头部长度(4字节) + 头部 JSON + 各字段 float64 列 )，头部含管道名、字段名与校验结果。
+    结果多为取整值且含大量 NaN，低压缩级别已接近高级别的压缩率，写入开销小得多。
+    """
+    fields = [field for field in RUN_RESULT_FIELDS if field in columns]
+    header = json.dumps({
+        "version": RUN_FORMAT_VERSION,
+        "pipe_names": list(pipe_names),
+        "fields": fields,
+        "qualification": qualification
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    body = [np.ascontiguousarray(columns[field], dtype="<f8").tobytes() for field in fields]
+    return zlib.compress(struct.pack("<I", len(header)) + header + b"".join(body), compress_level)
+
+def unpack_run(blob):
+    """解包 pack_run 的结果，返回 (头部字典, 字段 -> float64 数组)"""
+    raw = zlib.decompress(blob)
+    (header_length,) = struct.unpack_from("<I", raw, 0)
+    header = json.loads(raw[4:4 + header_length].decode("utf-8"))
+    if header.get("version") != RUN_FORMAT_VERSION:
+        raise ValueError(f"不支持的计算结果格式版本: {header.get('version')}")
+
+    count = len(header["pipe_names"])
+    offset = 4 + header_length
+    columns = {}
+    for field in header["fields"]:
+        columns[field] = np.frombuffer(raw, dtype="<f8", count=count, offset=offset)
+        offset += 8 * count
+    return header, columns
@@ -0,0 +1,202 @@
+import numpy as np
+from utils.network_evaluator import ScenarioLoads, aggregate_scenario_loads, idle_discharge_points
+from utils.mixture_properties import mixture_properties
+from utils.vectorized_solver import (round_like_python, solve_mach_numbers, solve_reynolds_numbers,
+                                     solve_friction_factors)
+from utils.pressure_ratio_solver import solve_pressure_ratios
+
+# 时间序列中可逐步给出的泄放点参数
+PROFILE_FIELDS = ("flow_rate", "temperature", "molecular_weight", "viscosity")
+
+def build_time_series_loads(network, base_params, profiles, step_count):
+    """由基础泄放参数（节点 -> 参数字典）与各节点参数曲线（节点 -> 参数 -> 各时间步取值）构建时间步矩阵
+
+    曲线未给出的节点与参数取基础参数，不在管网中的节点忽略。
+    """
+    fields = PROFILE_FIELDS + ("max_backpressure",)
+    column_index = {node: col for col, node in enumerate(network.discharge_nodes)}
+    matrices = {field: np.full((step_count, network.discharge_count), np.nan) for field in fields}
+    for node, params in base_params.items():
+        col = column_index.get(node)
+        if col is None:
+            continue
+        for field in fields:
+            if params.get(field) is not None:
+                matrices[field][:, col] = params[field]
+
+    for node, profile in profiles.items():
+        col = column_index.get(node)
+        if col is None:
+            continue
+        for field in PROFILE_FIELDS:
+            if profile.get(field) is not None:
+                matrices[field][:, col] = np.asarray(profile[field], dtype=float)
+
+    flow_rate = matrices["flow_rate"]
+    flow_rate[np.isnan(flow_rate)] = 0.0
+    return ScenarioLoads(flow_rate, matrices["temperature"], matrices["molecular_weight"],
+                         matrices["viscosity"], matrices["max_backpressure"])
+
+class TimeStepState:
+    """各管道最近一次求解时的累计量、摩擦系数与压比（按管道编号），用于判断输入是否变化及沿用未变化管道的结果"""
+
+    def __init__(self, sums, friction, ratio):
+        self.sums = sums            # (累计量, 管道数)
+        self.friction = friction
+        self.ratio = ratio
+
+def _changed_inputs(sums, reference, tolerance):
+    """逐时间步判断各管道累计量相对其最近一次求解时是否变化超过 tolerance（相对值），形状 (时间步数, 管道数)
+
+    与最近一次求解时而非上一时间步比较，缓慢变化不会无限累积；两者均为 NaN（未到达）视为未变化。
+    reference 为块开始前的参照值，None 时第一个时间步全部求解。返回 (是否变化, 块结束时的参照值)。
+    """
+    step_count = sums.shape[1]
+    changed = np.ones(sums.shape[1:], dtype=bool)
+    with np.errstate(invalid='ignore'):
+        for step in range(step_count):
+            current = sums[:, step]
+            if reference is None:
+                reference = current.copy()
+                continue
+            same = (np.abs(current - reference) <= tolerance * np.abs(reference)) | (np.isnan(current) & np.isnan(reference))
+            changed[step] = ~np.all(same, axis=0)
+            reference[:, changed[step]] = current[:, changed[step]]
+    return changed, reference
+
+def _forward_fill(values, changed, carried):
+    """未变化的元素取同一管道最近一次求解的值（块内更早的时间步，或上一块最后一步 carried）"""
+    step_count, pipe_count = values.shape
+    rows = np.where(changed, np.arange(1, step_count + 1)[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    extended = np.vstack([carried[None, :], values])
+    return extended[rows, np.arange(pipe_count)]
+
+def evaluate_time_steps(network, loads, state=None, tolerance=0.0):
+    """按时间顺序计算一块时间步，返回 (各时间步入口压力 (时间步数, 管道数), 块结束时的状态, 求解统计)
+
+    算式与批量工况（evaluate_scenarios）相同。累计量相对最近一次求解变化不超过 tolerance 的管道
+    沿用当时的摩擦系数与压比（二者只取决于累计量与管道参数）；其余管道与批量工况一样以显式近似为初值
+    求解 Colebrook 与压比方程（块内各时间步在同一矩阵中一次求解）。state 为上一块返回的状态，None 表示第一块。
+    """
+    sums = aggregate_scenario_loads(network, loads)
+    flow = sums[0]
+    step_count, pipe_count = flow.shape
+    if state is None:
+        state = TimeStepState(None, np.full(pipe_count, np.nan), np.full(pipe_count, np.nan))
+    reference = None if state.sums is None else state.sums.copy()
+    changed, reference = _changed_inputs(sums, reference, tolerance)
+    changed &= network.reached
+    steps, pipes = np.nonzero(changed)
+
+    # 只对输入变化的 (时间步, 管道) 计算物性与求解
+    properties = mixture_properties(*sums[:, steps, pipes])
+    mach = round_like_python(solve_mach_numbers(flow[steps, pipes], properties.temperature,
+                                                properties.molecular_weight, network.cross_area[pipes],
+                                                sound_speed=properties.sound_speed), 2)
+    diameter = network.diameter[pipes]
+    reynolds = solve_reynolds_numbers(flow[steps, pipes], diameter, properties.viscosity)
+    friction, friction_iterations = solve_friction_factors(
+        reynolds, network.roughness[pipes], diameter / 1000, return_iterations=True)
+    friction = round_like_python(friction, 6)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fLD = friction * network.equivalent_length[pipes] / diameter
+    ratio, ratio_iterations = solve_pressure_ratios(fLD, mach)
+    ratio = np.where(flow[steps, pipes] == 0, 1.0, ratio)
+
+    solved_friction = np.full(flow.shape, np.nan)
+    solved_ratio = np.full(flow.shape, np.nan)
+    solved_friction[steps, pipes] = friction
+    solved_ratio[steps, pipes] = ratio
+    friction = _forward_fill(solved_friction, changed, state.friction)
+    ratio = _forward_fill(solved_ratio, changed, state.ratio)
+
+    # 自火炬逐层向上游推算入口压力，压比已全部求得，每层只做除法
+    inlet_pressure = np.full(flow.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for level in network.levels:
+            parents = network.pipe_parent[level]
+            P2 = np.where(parents == -1, network.flare_pressure, inlet_pressure[:, parents])
+            inlet_pressure[:, level] = np.where(P2 > 0, P2 / ratio[:, level], np.nan)
+
+    stats = {
+        "pipe_steps": int(np.count_nonzero(network.reached)) * step_count,
+        "solved_pipe_steps": int(len(pipes)),
+        "colebrook_iterations": int(friction_iterations.sum()),
+        "pressure_ratio_iterations": int(ratio_iterations.sum())
+    }
+    return inlet_pressure, TimeStepState(reference, friction[-1], ratio[-1]), stats
+
+def time_series_backpressure(network, loads, inlet_pressure):
+    """各时间步各泄放点背压（保留2位小数）及是否超限，形状 (时间步数, 泄放节点数)
+
+    与批量工况一致：背压高于允许背压或未求得入口压力视为超限，无出口管道的泄放点不计；
+    未泄放的泄放点背压取下游管道入口压力（见 idle_discharge_points）。
+    """
+    has_pipe = network.discharge_pipe_ids != -1
+    backpressure = np.full(loads.flow_rate.shape, np.nan)
+    backpressure[:, has_pipe] = inlet_pressure[:, network.discharge_pipe_ids[has_pipe]]
+    backpressure = round_like_python(backpressure, 2)
+    with np.errstate(invalid='ignore'):
+        exceeded = ~(loads.max_backpressure - backpressure >= 0) & has_pipe
+    return backpressure, exceeded
+
+class ExceedanceTracker:
+    """逐块累计各泄放点的峰值背压与超限时间，超限持续时间按各时间步取值保持至下一时间步计"""
+
+    def __init__(self, times, discharge_count):
+        self.times = np.asarray(times, dtype=float)
+        self.durations = np.append(np.diff(self.times), 0.0)
+        self.peak = np.full(discharge_count, np.nan)
+        self.peak_step = np.full(discharge_count, -1)
+        self.first_step = np.full(discharge_count, -1)
+        self.last_step = np.full(discharge_count, -1)
+        self.exceeded_steps = np.zeros(discharge_count, dtype=int)
+        self.exceeded_duration = np.zeros(discharge_count)
+        self.idle_steps = np.zeros(discharge_count, dtype=int)
+
+    def add(self, start, backpressure, exceeded, idle):
+        """加入第 start 个时间步起的一块结果，idle 为各时间步未泄放的泄放点"""
+        stop = start + len(backpressure)
+        with np.errstate(invalid='ignore'):
+            # 块内峰值（全为 NaN 的列不更新）
+            valid = ~np.all(np.isnan(backpressure), axis=0)
+            chunk_peak = np.full(backpressure.shape[1], np.nan)
+            chunk_step = np.full(backpressure.shape[1], -1)
+            if np.any(valid):
+                chunk_step[valid] = np.nanargmax(backpressure[:, valid], axis=0) + start
+                chunk_peak[valid] = np.nanmax(backpressure[:, valid], axis=0)
+            higher = valid & ~(chunk_peak <= self.peak)
+        self.peak[higher] = chunk_peak[higher]
+        self.peak_step[higher] = chunk_step[higher]
+
+        any_exceeded = exceeded.any(axis=0)
+        first = np.argmax(exceeded, axis=0) + start
+        last = stop - 1 - np.argmax(exceeded[::-1], axis=0)
+        self.first_step = np.where(any_exceeded & (self.first_step == -1), first, self.first_step)
+        self.last_step = np.where(any_exceeded, last, self.last_step)
+        self.exceeded_steps += exceeded.sum(axis=0)
+        self.exceeded_duration += exceeded.T @ self.durations[start:stop]
+        self.idle_steps += idle.sum(axis=0)
+
+    def summary(self, discharge_nodes, max_backpressure):
+        """各泄放点：峰值背压及其时刻、允许背压、是否超限、首次与最后一次超限时刻、超限时间步数与持续时间、未泄放时间步数"""
+        def time_at(step):
+            return float(self.times[step]) if step >= 0 else None
+
+        nodes = {}
+        for col, node in enumerate(discharge_nodes):
+            peak = self.peak[col]
+            limit = max_backpressure[col]
+            nodes[node] = {
+                "peak_backpressure": None if np.isnan(peak) else float(peak),
+                "peak_time": time_at(self.peak_step[col]),
+                "max_backpressure": None if np.isnan(limit) else float(limit),
+                "exceeded": bool(self.exceeded_steps[col] > 0),
+                "first_exceedance_time": time_at(self.first_step[col]),
+                "last_exceedance_time": time_at(self.last_step[col]),
+                "exceedance_steps": int(self.exceeded_steps[col]),
+                "exceedance_duration": round(float(self.exceeded_duration[col]), 6),
+                "idle_steps": int(self.idle_steps[col])
+            }
+        return nodes
@@ -0,0 +1,90 @@
+import numpy as np
+from utils.network_evaluator import ScenarioLoads
+
+# 可设置不确定度的参数：泄放点参数每个泄放节点一个维度，管道粗糙度全管网共用一个维度（同一管材）
+DISCHARGE_UNCERTAIN_FIELDS = ("flow_rate", "temperature", "molecular_weight")
+UNCERTAIN_FIELDS = DISCHARGE_UNCERTAIN_FIELDS + ("roughness",)
+
+def latin_hypercube(sample_count, dimension_count, rng):
+    """拉丁超立方抽样，逐维生成：每一维的 [0, 1) 等分为 sample_count 层，每层恰有一个样本
+
+    依次返回各维的 (样本 (样本数,), 各样本所在层号)；层号即样本在该维中的秩。
+    """
+    for _ in range(dimension_count):
+        strata = rng.permutation(sample_count)
+        yield (strata + rng.random(sample_count)) / sample_count, strata
+
+def sampling_dimensions(network, base_loads, uncertainty):
+    """抽样维度：返回 (各维度 (参数, 泄放节点), 各维度在工况矩阵中的列)，粗糙度维度的泄放节点为 None、列为 -1
+
+    基准值缺失或为0的泄放点参数不扰动，不构成维度。
+    """
+    dimensions = []
+    columns = []
+    for field in DISCHARGE_UNCERTAIN_FIELDS:
+        if not uncertainty.get(field):
+            continue
+        base = getattr(base_loads, field)[0]
+        for col, node in enumerate(network.discharge_nodes):
+            if np.isfinite(base[col]) and base[col] != 0:
+                dimensions.append((field, node))
+                columns.append(col)
+    if uncertainty.get("roughness"):
+        dimensions.append(("roughness", None))
+        columns.append(-1)
+    return dimensions, columns
+
+def build_sampled_loads(network, base_loads, uncertainty, sample_count, seed):
+    """按拉丁超立方抽样生成扰动工况矩阵
+
+    uncertainty 为 参数 -> 相对半宽 u，参数值在 [(1-u)·基准值, (1+u)·基准值] 内均匀分布；
+    维度见 sampling_dimensions。返回 (工况矩阵, 各维度 (参数, 泄放节点), 各维度样本的秩 (样本数, 维数))。
+    """
+    dimensions, columns = sampling_dimensions(network, base_loads, uncertainty)
+    matrices = {field: np.repeat(getattr(base_loads, field), sample_count, axis=0)
+                for field in DISCHARGE_UNCERTAIN_FIELDS + ("viscosity", "max_backpressure")}
+    roughness_scale = None
+    # 秩按维逐列写入（int32），不保留各维样本值，抽样的内存约为 样本数 × 维数 × 4 字节
+    strata = np.empty((sample_count, len(dimensions)), dtype=np.int32)
+    samples = latin_hypercube(sample_count, len(dimensions), np.random.default_rng(seed))
+    for k, ((field, _), col, (sample, sample_strata)) in enumerate(zip(dimensions, columns, samples)):
+        strata[:, k] = sample_strata
+        scale = 1 + uncertainty[field] * (2 * sample - 1)
+        if field == "roughness":
+            roughness_scale = scale
+        else:
+            matrices[field][:, col] *= scale
+
+    loads = ScenarioLoads(matrices["flow_rate"], matrices["temperature"], matrices["molecular_weight"],
+                          matrices["viscosity"], matrices["max_backpressure"], roughness_scale)
+    return loads, dimensions, strata
+
+def _ranks(values):
+    """按列求秩（0 起），常数列为 NaN"""
+    order = np.argsort(values, axis=0, kind="stable")
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, np.arange(len(values), dtype=float)[:, None], axis=0)
+    constant = np.all(values == values[:1], axis=0)
+    ranks[:, constant] = np.nan
+    return ranks
+
+def rank_correlations(input_ranks, outputs):
+    """输入的秩 (样本数, 维数) 与输出 (样本数, 输出数) 的 Spearman 秩相关系数矩阵 (维数, 输出数)
+
+    拉丁超立方样本的秩即其层号，无需排序；输出中的 NaN 视为最差（-inf）。
+    """
+    outputs = np.where(np.isnan(outputs), -np.inf, outputs)
+    y = _ranks(outputs)
+    y -= y.mean(axis=0)
+    y_norm = np.sqrt((y * y).sum(axis=0))
+
+    # 输入按列分块转为浮点，每块的临时矩阵不超过 y
+    dimension_count = input_ranks.shape[1]
+    block = max(1, y.shape[1])
+    correlations = np.empty((dimension_count, y.shape[1]))
+    for start in range(0, dimension_count, block):
+        x = input_ranks[:, start:start + block].astype(float)
+        x -= x.mean(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlations[start:start + block] = (x.T @ y) / np.outer(np.sqrt((x * x).sum(axis=0)), y_norm)
+    return correlations
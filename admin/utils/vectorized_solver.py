@@ -0,0 +1,134 @@
+import numpy as np
+from utils.mixture_properties import sound_speeds
+
+LN10 = np.log(10.0)
+
+def as_float_array(values):
+    """转换为浮点数组，None 转为 NaN"""
+    return np.asarray(values, dtype=float)
+
+def to_optional_list(values, decimals=None):
+    """数组转回 Python 列表（二维数组转为嵌套列表），NaN 转为 None，可选按 Python round 保留小数"""
+    values = np.asarray(values, dtype=float)
+    if values.ndim > 1:
+        return [to_optional_list(row, decimals) for row in values]
+    if decimals is None:
+        return [None if v != v else v for v in values.tolist()]
+    return [None if v != v else round(v, decimals) for v in values.tolist()]
+
+def round_like_python(values, decimals):
+    """向量化保留小数，结果与逐个调用 Python round 完全一致，NaN 保持不变
+
+    np.round 先乘 10^decimals 再取整，乘法舍入误差使接近 .5 的值（以及数值很大、
+    误差可达 1 的值）可能与 Python round 不同，这部分元素改用 Python round 逐个计算。
+    """
+    values = np.asarray(values, dtype=float)
+    scale = 10.0 ** decimals
+    with np.errstate(invalid='ignore', over='ignore'):
+        scaled = values * scale
+        rounded = np.round(values, decimals)
+        tolerance = 1e-6 + np.abs(scaled) * 1e-15
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) < tolerance
+    if np.any(near_half):
+        rounded[near_half] = [round(v, decimals) for v in values[near_half].tolist()]
+    return rounded
+
+def solve_mach_numbers(flow_rate, temperature, molecular_weight, cross_area, sound_speed=None):
+    """批量计算管道末端马赫数（未取整），非法输入为 NaN
+
+    flow_rate: kg/h, temperature: K, molecular_weight: g/mol, cross_area: cm²
+    sound_speed 为已算出的混合物性声速（m/s），其中 NaN 的元素按温度、分子量计算。
+    """
+    flow_rate = as_float_array(flow_rate)
+    temperature = as_float_array(temperature)
+    molecular_weight = as_float_array(molecular_weight)
+    cross_area = as_float_array(cross_area)
+
+    if sound_speed is None:
+        a = sound_speeds(temperature, molecular_weight)  # 声速，m/s
+    else:
+        a = np.array(sound_speed, dtype=float)
+        missing = np.isnan(a)
+        if np.any(missing):
+            a[missing] = sound_speeds(temperature[missing], molecular_weight[missing])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = flow_rate / 3600                                  # kg/s
+        A = cross_area / 10000                                # m²
+        mach = (q / (A * 100000)) * a
+
+    # 与逐管道计算一致：分子量、温度、截面积为0时跳过
+    invalid = (molecular_weight == 0) | (temperature == 0) | (cross_area == 0) | ~np.isfinite(mach)
+    return np.where(invalid, np.nan, mach)
+
+def solve_reynolds_numbers(flow_rate, diameter, viscosity):
+    """批量计算雷诺数，流量为0或黏度非法时为 NaN
+
+    flow_rate: kg/h, diameter: mm, viscosity: Pa·s
+    """
+    flow_rate = as_float_array(flow_rate)
+    diameter = as_float_array(diameter)
+    viscosity = as_float_array(viscosity)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        Q_s = flow_rate / 3600   # kg/s
+        D = diameter / 1000      # mm -> m
+        Re = 4 * Q_s / (np.pi * D * viscosity)
+
+    invalid = (flow_rate == 0) | ~np.isfinite(Re)
+    return np.where(invalid, np.nan, Re)
+
+def solve_friction_factors(reynolds, roughness, diameter, tol=1e-6, max_iter=20, return_iterations=False):
+    """批量求解 Colebrook 摩擦系数（未取整），非法输入为 NaN
+
+    以 Swamee-Jain 显式公式为初值，对 y = 1/√f 做向量化牛顿迭代：
+        F(y) = y + 2·lg(ε/(3.7D) + 2.51·y/Re) = 0
+    收敛判据与逐管道不动点迭代相同（|Δ(1/√f)| < tol）。diameter 单位为 m。
+    return_iterations 为 True 时返回 (f, 各元素收敛所用迭代次数)。
+    """
+    reynolds = as_float_array(reynolds)
+    roughness = as_float_array(roughness)
+    diameter = as_float_array(diameter)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        a = roughness / (3.7 * diameter)
+        b = 2.51 / reynolds
+        valid = (reynolds > 0) & np.isfinite(a) & np.isfinite(b) & (a >= 0)
+
+        # Swamee-Jain 初值，1/√f = -2·lg(ε/(3.7D) + 5.74/Re^0.9)
+        y = -2.0 * np.log10(a + 5.74 / reynolds ** 0.9)
+        y = np.where(valid & (y > 0), y, 1.0)
+        iterations = np.zeros(y.shape, dtype=int)
+        pending = valid.copy()
+
+        for _ in range(max_iter):
+            iterations += pending
+            arg = a + b * y
+            F = y + 2.0 * np.log10(arg)
+            dF = 1.0 + 2.0 * b / (arg * LN10)
+            y_next = y - F / dF
+            # 越出定义域时向零折半（F 单调递增，左侧牛顿迭代单调收敛）
+            y_next = np.where(y_next > 0, y_next, y / 2)
+            step = np.abs(y_next - y)
+            y = np.where(valid, y_next, y)
+            pending &= step >= tol
+            if not np.any(valid & (step >= tol)):
+                break
+
+        f = 1.0 / (y * y)
+
+    f = np.where(valid & np.isfinite(f), f, np.nan)
+    if return_iterations:
+        return f, iterations
+    return f
+
+def solve_pipe_hydraulics(flow_rate, temperature, molecular_weight, cross_area,
+                          diameter, roughness, viscosity):
+    """一次调用计算整个管网的马赫数、雷诺数与摩擦系数（均未取整）
+
+    diameter 单位为 mm，其余单位同上；返回 (mach, reynolds, friction)
+    """
+    mach = solve_mach_numbers(flow_rate, temperature, molecular_weight, cross_area)
+    reynolds = solve_reynolds_numbers(flow_rate, diameter, viscosity)
+    friction = solve_friction_factors(reynolds, roughness, as_float_array(diameter) / 1000)
+    return mach, reynolds, friction
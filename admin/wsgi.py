@@ -0,0 +1,31 @@
+"""生产部署入口
+
+用法：
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn 主进程导入本模块时完成计算模块的导入与预热，再预派生 Web 工作进程（preload_app，写时复制共享）；
+各 Web 工作进程开始处理请求前派生计算进程，CPU 密集的计算接口在计算进程中执行（见 gunicorn.conf.py）。
+"""
+from app import app
+from services.flare_system_service import FlareSystemService
+from services.pipe_sizing_service import PipeSizingService
+from services.uncertainty_service import UncertaintyService
+from utils.network_generator import generate_flare_network
+
+def warm_up():
+    """用小规模合成管网执行一遍各计算接口，完成模块导入与 NumPy 首次调用等初始化
+
+    任一计算失败说明计算模块异常，直接抛出使启动失败。
+    """
+    data = generate_flare_network(8, depth=1, branching=2)
+    results = [
+        FlareSystemService.check_flare_system(data),
+        FlareSystemService.check_batch(dict(data, scenarios=[{}, {}]), workers=1),
+        PipeSizingService.size_pipes(data),
+        UncertaintyService.analyze(dict(data, monte_carlo={"samples": 16, "seed": 0}), workers=1)
+    ]
+    for result in results:
+        if result.get('status') != 200:
+            raise RuntimeError(f"计算模块预热失败: {result.get('message')}")
+
+warm_up()